@@ -3,7 +3,6 @@ import os
 import warnings
 
 #from tag.utils.io_helpers import sort_files
-from tqdm import tqdm
 from utils.param_keys import INPUT_NAME, FILENAME, FOLDER_PATH, PARAMS
 from utils.param_keys import RUN_OPTION, PLOT_TYPE, PLOT_TICS, N_COMPONENTS
 from utils.param_keys import SAVE_RESULTS, LOAD_RESULTS
@@ -1,17 +1,49 @@
 import config
-import pandas as pd
+import importlib
 import warnings
 
+from functools import partial
 from datetime import datetime as dt
-#from shaining.features import EventLogFeatures
-from shaining.benchmark import BenchmarkTest
 #from shaining.plotter import BenchmarkPlotter, FeaturesPlotter, AugmentationPlotter, GenerationPlotter
 from utils.default_argparse import ArgParser
 from utils.param_keys import *
 from utils.param_keys.run_options import *
 warnings.filterwarnings("ignore")
 
-def run(kwargs:dict, model_paramas_list: list, filename_list:list):
+# Pipeline steps as (module, class). A module is only imported once a configuration runs its step,
+# so every step only pays for its own dependencies, e.g. pm4py for benchmark_test.
+PIPELINE_STEPS = {
+    'benchmark_test': ('shaining.benchmark', 'BenchmarkTest'),
+    'shaining_task': ('shaining.shapley', 'ShapleyTask'),
+    'feature_extraction': ('shaining.features', 'EventLogFeatures'),
+    'evaluation_plotter': ('shaining.plotter', 'GenerationPlotter'),
+    }
+
+def get_pipeline_step(name):
+    """
+    Imports and returns the class of the pipeline step `name`.
+    """
+    module, attr = PIPELINE_STEPS[name]
+    return getattr(importlib.import_module(module), attr)
+
+def run_step(model_params, kwargs):
+    """
+    Runs the pipeline step of `model_params`.
+    """
+    import pandas as pd
+    gen = pd.DataFrame(columns=['log'])
+    if model_params.get(PIPELINE_STEP) == 'benchmark_test':
+        benchmark = get_pipeline_step('benchmark_test')(model_params, event_logs=gen['log'])
+        # BenchmarkPlotter(benchmark.features, output_path="output/plots")
+    elif model_params.get(PIPELINE_STEP) == 'shaining_task':
+        shapley = get_pipeline_step('shaining_task')(model_params)
+    elif model_params.get(PIPELINE_STEP) == 'feature_extraction':
+        ft = get_pipeline_step('feature_extraction')(**kwargs, logs=gen['log'], ft_params=model_params)
+        # FeaturesPlotter(ft.feat, model_params)
+    elif model_params.get(PIPELINE_STEP) == "evaluation_plotter":
+        get_pipeline_step('evaluation_plotter')(gen, model_params, output_path=model_params['output_path'], input_path=model_params['input_path'])
+
+def run(kwargs:dict, model_params_list: list, filename_list:list, jobs=None, artifact_path=None):
     """
     This function chooses the running option for the program.
     @param kwargs: dict
@@ -20,27 +52,24 @@ def run(kwargs:dict, model_paramas_list: list, filename_list:list):
         contains a list of model parameters, which are used to analyse this different models.
     @param filename_list: list
         contains the list of the filenames to load multiple event-logs
+    @param jobs: int
+        maximum number of independent steps that run at the same time
+    @param artifact_path: str
+        directory of the artifact cache, or None to run every step
     @return:
     """
+    from shaining.pipeline import run_pipeline, DEFAULT_JOBS
     params = kwargs[PARAMS]
     run_option = 'baseline'
-    gen = pd.DataFrame(columns=['log'])
 
     if run_option == BASELINE:
-        for model_params in model_params_list:
-            if model_params.get(PIPELINE_STEP) == 'benchmark_test':
-                benchmark = BenchmarkTest(model_params, event_logs=gen['log'])
-                # BenchmarkPlotter(benchmark.features, output_path="output/plots")
-            elif model_params.get(PIPELINE_STEP) == 'feature_extraction':
-                ft = EventLogFeatures(**kwargs, logs=gen['log'], ft_params=model_params)
-                FeaturesPlotter(ft.feat, model_params)
-            elif model_params.get(PIPELINE_STEP) == "evaluation_plotter":
-                GenerationPlotter(gen, model_params, output_path=model_params['output_path'], input_path=model_params['input_path'])
+        # Steps run as a DAG of the files they read and write, see shaining/pipeline.py
+        run_pipeline(model_params_list, partial(run_step, kwargs=kwargs), jobs or DEFAULT_JOBS, artifact_path)
 
     elif run_option == COMPARE:
         if params[N_COMPONENTS] != 2:
             raise ValueError(f'The parameter `{N_COMPONENTS}` has to be 2, but it\'s {params[N_COMPONENTS]}.')
-        ft = EventLogFeatures(**kwargs)
+        ft = get_pipeline_step('feature_extraction')(**kwargs)
         FeatureAnalyser(ft, params).compare(model_params_list)
     else:
         raise InvalidRunningOptionError(f'The run_option: `{run_option}` in the (json) configuration '
@@ -54,6 +83,6 @@ if __name__=='__main__':
     args = ArgParser().parse('SHAMPU main')
 
     model_params_list = config.get_model_params_list(args.alg_params_json)
-    run({'params':""}, model_params_list, [])
+    run({'params':""}, model_params_list, [], jobs=args.jobs, artifact_path=None if args.no_cache else args.artifact_path)
 
     print(f'SUCCESS: SHAMPU took {dt.now()-start_tag} sec.')
@@ -0,0 +1,61 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.util.Base64;
+
+/**
+ * Long-lived Split Miner process used by shaining/split_miner.py.
+ *
+ * Loads au.edu.unimelb.services.ServiceProvider from the classpath once and runs it for every
+ * request line read from stdin. A request is the tab-separated argument list of
+ * ServiceProvider.main. For every request one response line is written to stdout:
+ *
+ *     DONE \t discovery time in ms \t ok|error \t base64 of the miner's stdout and stderr
+ *
+ * Runs in source-file mode (Java 11+), so it needs no compilation step:
+ *     java -cp "sm2.jar:lib/*" miners/SplitMinerService.java
+ * The process exits when stdin is closed.
+ */
+public class SplitMinerService {
+    public static void main(String[] args) throws Exception {
+        Method serviceMain = Class.forName("au.edu.unimelb.services.ServiceProvider")
+                .getMethod("main", String[].class);
+        PrintStream out = System.out;
+        PrintStream err = System.err;
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        out.println("READY");
+        out.flush();
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+            String[] request = line.split("\t");
+            ByteArrayOutputStream captured = new ByteArrayOutputStream();
+            PrintStream capture = new PrintStream(captured, true, "UTF-8");
+            String status = "ok";
+            System.setOut(capture);
+            System.setErr(capture);
+            long start = System.nanoTime();
+            try {
+                serviceMain.invoke(null, (Object) request);
+            } catch (Throwable t) {
+                status = "error";
+                Throwable cause = t.getCause() != null ? t.getCause() : t;
+                cause.printStackTrace(capture);
+            } finally {
+                System.setOut(out);
+                System.setErr(err);
+            }
+            long millis = (System.nanoTime() - start) / 1000000;
+            capture.flush();
+            out.println("DONE\t" + millis + "\t" + status + "\t"
+                    + Base64.getEncoder().encodeToString(captured.toByteArray()));
+            out.flush();
+        }
+    }
+}
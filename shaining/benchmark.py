@@ -1,29 +1,90 @@
+import hashlib
+import importlib
 import json
 import multiprocessing
 import os
 import pandas as pd
-import subprocess
 import random
 import numpy as np
+import time
 
+from contextlib import nullcontext
 from datetime import datetime as dt
-from functools import partial, partialmethod
-from pathlib import Path
-from pm4py import read_xes, convert_to_bpmn, read_bpmn, convert_to_petri_net, check_soundness
-from pm4py import discover_petri_net_inductive, discover_petri_net_ilp, discover_petri_net_heuristics
-from pm4py import fitness_alignments, fitness_token_based_replay
-from pm4py import precision_alignments, precision_token_based_replay
-from pm4py.algo.evaluation.generalization import algorithm as generalization_evaluator
-from pm4py.algo.evaluation.simplicity import algorithm as simplicity_evaluator
+from functools import partialmethod
+from pm4py import convert_to_bpmn, read_bpmn, convert_to_petri_net
 from pm4py.objects.bpmn.obj import BPMN
-from pm4py.objects.log.importer.xes import importer as xes_importer
-from shaining.utils.io_helpers import dump_features_json
+from shaining.conformance import compute_conformance, ALIGNMENTS, CONFORMANCE_METHODS, DEFAULT_CONFORMANCE_BUDGET
+from shaining.discovery import get_discovery_context, MINER_ADAPTERS
+from shaining.pipeline import get_benchmark_path, get_benchmark_dump_path
+from shaining.scheduler import load_task_metric, load_task_timings, order_tasks, MemoryEstimator
+from shaining.split_miner import run_split_miner
+from shaining.task_pool import TaskPool, get_available_memory_mb, report_phase, report_work, STATUS_OK, STATUS_FAILED
+from shaining.work_queue import WorkQueue, Heartbeat, get_worker_id, COORDINATOR, WORKER, DEFAULT_LEASE_TIME
+from shaining.work_queue import MAX_ATTEMPTS, QUEUE_FAILED, QUEUE_JOURNAL_MODE, QUEUE_LEASED, QUEUE_PENDING, QUEUE_POLL_INTERVAL
+from shaining.utils.io_helpers import dump_features_json, get_content_dir
+from shaining.utils.log_archive import get_log_hash, get_log_size, is_log_file, list_logs, log_exists, materialize_log
+from shaining.utils.log_archive import strip_suffix, LOG_SUFFIXES
+from shaining.utils.results_store import ResultsStore
+from shaining.utils.alignment_cache import AlignmentCache, ALIGNMENT_CACHE_FILE, DEFAULT_CACHE_SIZE
+from shaining.utils.log_cache import get_log_state, load_event_log
+from shaining.utils.profiling import PhaseTimer, dump_trace, get_peak_rss_mb, profile_task, reset_peak_rss
 from tqdm import tqdm
 from utils.param_keys import INPUT_PATH, OUTPUT_PATH
-from utils.param_keys.benchmark import MINERS
+from utils.param_keys.benchmark import MINERS, LOG_CACHE_PATH, TIMEOUT, MEMORY_LIMIT, INCREMENTAL
+from utils.param_keys.benchmark import SPLIT_MINER_SERVICE, PROFILE_THRESHOLD, MEMORY_BUDGET, MAX_TASKS_PER_CHILD
+from utils.param_keys.benchmark import WORK_QUEUE, LEASE_TIME, ALIGNMENT_CACHE_PATH, ALIGNMENT_CACHE_SIZE
+from utils.param_keys.benchmark import CONFORMANCE, CONFORMANCE_BUDGET
 
 RANDOM_SEED = 10
 random.seed(RANDOM_SEED)
+# Miner parameters that change the results. Part of the task key of incremental runs.
+MINER_CONFIGS = {
+    'imf': {'noise_threshold': 0.2},
+    'sm1': {'eta': '0.1', 'epsilon': '0.4'},
+    'sm2': {'frequency_threshold': '0.05'},
+    }
+# Share of the available memory used as budget if memory_budget is not set
+DEFAULT_MEMORY_SHARE = 0.8
+METRIC_NAMES = ["fitness", "precision", "fscore", "size", "pnsize", "cfc", "time"]
+# Phases timed for every task, stored as {phase}time_{miner} in seconds
+PHASE_NAMES = ["import", "discovery", "conversion", "fitness", "precision", "size"]
+# Conformance method that computed a metric, stored as {metric}method_{miner}
+METHOD_METRICS = ["fitness", "precision"]
+
+# Modules pm4py only imports on first use, e.g. by the ILP miner or the progress bars of alignments.
+# Imported by every worker on startup, so that they are not part of the first task's timings.
+WORKER_IMPORTS = ["pm4py.algo.discovery.ilp.algorithm", "pm4py.objects.petri_net.utils.murata", "tqdm.auto"]
+
+_progress_bars_disabled = False
+
+def disable_progress_bars():
+    """
+    Disables the tqdm progress bars of pm4py in this process, once instead of wrapping tqdm again
+    on every task.
+    """
+    global _progress_bars_disabled
+    if not _progress_bars_disabled:
+        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+        _progress_bars_disabled = True
+
+def init_worker():
+    """
+    Initializer of the benchmark workers: imports the modules of all tasks once per process.
+    """
+    for module in WORKER_IMPORTS:
+        importlib.import_module(module)
+    disable_progress_bars()
+
+def get_failed_results(miner, status):
+    """
+    Result columns of a task that did not finish, with NaN metrics and the reason in status_{miner}.
+    """
+    results = {f"{metric}_{miner}": np.nan for metric in METRIC_NAMES}
+    results.update({f"{phase}time_{miner}": np.nan for phase in PHASE_NAMES})
+    results.update({f"{metric}method_{miner}": None for metric in METHOD_METRICS})
+    results[f"peakrss_{miner}"] = np.nan
+    results[f"status_{miner}"] = status
+    return results
 
 class BenchmarkTest:
     def __init__(self, params=None, event_logs=None):
@@ -32,48 +93,102 @@ class BenchmarkTest:
 
         print(f"INFO: Running with {params}")
 
+        self.log_files = None
         if len(event_logs) == 0:
             log_path = params[INPUT_PATH]
-            if log_path.endswith(".xes"):
+            if is_log_file(log_path):
                 event_logs = [""]
             else:
                 try:
-                    event_logs = sorted([filename for filename in os.listdir(log_path) if filename.endswith(".xes")])
+                    # Members of archives are read in place, without extracting them
+                    self.log_files = self.list_log_files(log_path)
+                    event_logs = list(self.log_files.values())
                 except FileNotFoundError:
                     print(f"        FAILED: Cannot find {params[INPUT_PATH]}" )
                     return
         if params != None:
             self.params = params
 
+        self.root_path = self.params[INPUT_PATH]
+        self.filepath = get_benchmark_path(self.root_path)
+        self.filename = os.path.split(self.filepath)[-1]
+
+        queue_role = self.params.get(WORK_QUEUE)
+        if queue_role == WORKER:
+            # Workers only run tasks claimed from the queue of a coordinator
+            num_tasks = self.run_queue_worker()
+            print(f"SUCCESS: BenchmarkTest worker took {dt.now()-start} sec for {num_tasks} tasks"+\
+                  f" from {self.get_store_path()}.")
+            print("========================= ~ BenchmarkTest =============================")
+            return
+
+        miners = self.params[MINERS]
+        unknown = set(miners) - set(MINER_ADAPTERS) - {'sm1', 'sm2'}
+        if unknown:
+            raise ValueError(f"The miners {sorted(unknown)} are not supported. Available are {list(MINER_ADAPTERS)+['sm1', 'sm2']}.")
+        if self.params.get(CONFORMANCE, ALIGNMENTS) not in CONFORMANCE_METHODS:
+            raise ValueError(f"The conformance method {self.params[CONFORMANCE]} is not supported. Available are {CONFORMANCE_METHODS}.")
+        log_names = [self.get_log_name(event_log, miners) for event_log in event_logs]
+        tasks = [(log_name, miner) for log_name in log_names for miner in miners]
+        log_sizes = {log_name: get_log_size(self.get_log_path(log_name))
+                     for log_name in log_names if isinstance(log_name, str)
+                     and log_exists(self.get_log_path(log_name))}
+        tasks = order_tasks(tasks, log_sizes, load_task_timings(self.filepath))
+
+        # Results are always stored per task, so that a later incremental run can reuse them
+        store = ResultsStore(self.get_store_path(), journal_mode=QUEUE_JOURNAL_MODE if queue_role == COORDINATOR else "WAL")
+        pending = {log_name: {} for log_name in log_names}
+        # Without incremental runs or a queue, workers hash their logs themselves, in parallel
+        task_keys = self.get_task_keys(log_names, miners) if self.has_parent_keys() else {}
+        if self.params.get(INCREMENTAL, False):
+            stored_results = store.get_all()
+            for task in tasks:
+                key, results = stored_results.get(task, (None, {}))
+                if key is not None and key == task_keys.get(task)\
+                        and results.get(f"status_{task[1]}") == STATUS_OK:
+                    pending[task[0]][task[1]] = results
+            tasks = [task for task in tasks if task[1] not in pending[task[0]]]
+            print(f"INFO: Incremental run reuses {len(log_names)*len(miners)-len(tasks)} and computes {len(tasks)} (log, miner) results.")
+            for log_name in log_names:
+                if len(pending[log_name]) == len(miners):
+                    self.dump_results(log_name, miners, pending.pop(log_name))
+
+        num_cores = multiprocessing.cpu_count() if len(
+                   tasks) >= multiprocessing.cpu_count() else len(tasks)
+        memory_estimator = MemoryEstimator(log_sizes, load_task_metric(self.filepath, "peakrss"))
+        with self.get_task_pool(num_cores, memory_estimator) as p:
+            print(f"INFO: Benchmark starting at {start.strftime('%H:%M:%S')} using {num_cores} cores for {len(event_logs)} files"+\
+                  f" and {len(tasks)} tasks within {p.memory_budget or 0:.0f} MB...")
+            random.seed(RANDOM_SEED)
+            if queue_role == COORDINATOR:
+                # Any number of workers on any host share the tasks with this process
+                with WorkQueue(self.get_store_path(), QUEUE_JOURNAL_MODE) as queue:
+                    queue.enqueue(tasks, task_keys)
+                    print(f"INFO: Enqueued {len(tasks)} tasks in {queue.db_path}.")
+                    self.process_queue(queue, store, p)
+                    stored_results = store.get_all()
+                    for (log_name, miner), key in queue.get_tasks(QUEUE_FAILED).items():
+                        if (log_name, miner) not in stored_results:
+                            print(f"        FAILED: {miner} on {log_name} lost its lease {MAX_ATTEMPTS} times")
+                            store.put(log_name, miner, key, get_failed_results(miner, STATUS_FAILED))
+                stored_results = store.get_all()
+                for log_name in pending:
+                    self.dump_results(log_name, miners, {miner: stored_results[(log_name, miner)][1]
+                                                         for miner in miners if (log_name, miner) in stored_results})
+            else:
+                # Assembles per-log result rows from (log, miner) tasks in order of completion
+                for task, status, output in p.imap_unordered(tasks):
+                    key = task_keys.get(task, output[3] if status == STATUS_OK else None)
+                    miner_results = self.save_result(store, task, status, output, key)
+                    pending[task[0]][task[1]] = miner_results
+                    if len(pending[task[0]]) == len(miners):
+                        self.dump_results(task[0], miners, pending.pop(task[0]))
+
+        # Aggregates the results of all tasks into a dataframe in one read
+        benchmark_results = store.to_frame(miners, [log_name for log_name in log_names if isinstance(log_name, str)])
+        store.close()
+        #print(benchmark_results)
 
-        if True:
-             num_cores = multiprocessing.cpu_count() if len(
-                        event_logs) >= multiprocessing.cpu_count() else len(event_logs)
-             #self.benchmark_wrapper(event_logs[0], miners=self.params[MINERS])# TESTING
-             with multiprocessing.Pool(num_cores) as p:
-                 print(f"INFO: Benchmark starting at {start.strftime('%H:%M:%S')} using {num_cores} cores for {len(event_logs)} files...")
-                 random.seed(RANDOM_SEED)
-                 p.map(partial(self.benchmark_wrapper, miners = self.params[MINERS]), event_logs)
-
-             # Aggregates metafeatures in saved Jsons into dataframe
-             self.root_path = self.params[INPUT_PATH]
-             path_to_json = f"output/benchmark/{str(self.root_path).split('/',1)[1]}"
-             if path_to_json.endswith(".xes"):
-                path_to_json = path_to_json.rsplit("/",1)[0]
-             df = pd.DataFrame()
-             # Iterate over the files in the directory
-             for filename in os.listdir(path_to_json):
-                 if filename.endswith('.json'):
-                     i_path = os.path.join(path_to_json, filename)
-                     with open(i_path) as f:
-                         data = json.load(f)
-                         temp_df = pd.DataFrame([data])
-                         df = pd.concat([df, temp_df], ignore_index = True)
-             benchmark_results = df
-             #print(benchmark_results)
-
-        self.filename = os.path.split(self.root_path)[-1].replace(".xes","") + '_benchmark.csv'
-        self.filepath = os.path.join("output", "benchmark", self.filename)
         os.makedirs(os.path.split(self.filepath)[0], exist_ok=True)
         benchmark_results.to_csv(self.filepath, index=False)
 
@@ -82,147 +197,361 @@ class BenchmarkTest:
               f" and {len(benchmark_results)} event-logs. Saved benchmark to {self.filepath}.")
         print("========================= ~ BenchmarkTest =============================")
 
+    def get_dump_path(self, miners):
+        return get_benchmark_dump_path(self.params[INPUT_PATH], self.params[OUTPUT_PATH], miners)
+
+    def has_parent_keys(self):
+        """
+        Whether task keys are computed before the tasks run, as incremental runs need them to pick
+        the tasks to run and the work queue stores them with the tasks. Otherwise every task
+        computes its own key in its worker.
+        """
+        return self.params.get(INCREMENTAL, False) or self.params.get(WORK_QUEUE) is not None
+
+    def get_task_keys(self, log_names, miners):
+        """
+        Hashes the content of every log together with the configuration of every miner.
+        A stored result is only reused while its key stays the same.
+        """
+        task_keys = {}
+        for log_name in log_names:
+            if not isinstance(log_name, str):
+                continue
+            log_hash = get_log_hash(self.get_log_path(log_name))
+            for miner in miners:
+                task_keys[(log_name, miner)] = self.get_task_key(log_hash, miner)
+        return task_keys
+
+    def get_task_key(self, log_hash, miner):
+        conformance = self.params.get(CONFORMANCE, ALIGNMENTS)
+        task_config = {'miner': miner, 'config': MINER_CONFIGS.get(miner, {})}
+        if conformance != ALIGNMENTS:
+            # Keeps the keys of alignment-based results of earlier runs valid
+            task_config['conformance'] = [conformance, self.params.get(CONFORMANCE_BUDGET, DEFAULT_CONFORMANCE_BUDGET)]
+        miner_config = json.dumps(task_config, sort_keys=True)
+        return hashlib.sha1(f"{log_hash}|{miner_config}".encode("utf-8")).hexdigest()
+
+    def get_store_path(self):
+        return os.path.join(get_content_dir(self.get_dump_path(self.params[MINERS]), "benchmark"), "results.db")
+
+    def get_task_pool(self, num_cores, memory_estimator):
+        # Tasks only start while their estimated peak memory fits into the budget
+        memory_budget = self.params.get(MEMORY_BUDGET)
+        if memory_budget is None and get_available_memory_mb() is not None:
+            memory_budget = DEFAULT_MEMORY_SHARE*get_available_memory_mb()
+        return TaskPool(num_cores, self.benchmark_task, initializer=init_worker, timeout=self.params.get(TIMEOUT),
+                        memory_limit=self.params.get(MEMORY_LIMIT), memory_budget=memory_budget,
+                        memory_estimator=memory_estimator,
+                        max_tasks_per_child=self.params.get(MAX_TASKS_PER_CHILD))
+
+    def save_result(self, store, task, status, output, key):
+        """
+        Stores the result columns of one finished (log, miner) task and traces it.
+
+        :return: dict with the result columns of the task, NaN metrics if it failed.
+        """
+        log_name, miner = task
+        if status == STATUS_OK:
+            miner_results = output[2]
+        else:
+            print(f"        FAILED: {miner} on {log_name} with status {status}: {output}")
+            miner_results = get_failed_results(miner, status)
+        if isinstance(log_name, str):
+            store.put(log_name, miner, key, miner_results)
+            self.trace_task(log_name, miner, status, output, miner_results)
+        return miner_results
+
+    def process_queue(self, queue, store, pool):
+        """
+        Claims tasks from the work queue whenever a worker of `pool` is idle and stores their
+        results, until no task is pending or leased by any other process.
+
+        :return: Number of tasks run by this process.
+        """
+        worker_id = get_worker_id()
+        lease_time = self.params.get(LEASE_TIME, DEFAULT_LEASE_TIME)
+        task_keys = {}
+        def claim(num_tasks):
+            tasks = []
+            for log_name, miner, key in queue.claim(worker_id, num_tasks, lease_time):
+                task_keys[(log_name, miner)] = key
+                if log_exists(self.get_log_path(log_name)) and log_name not in pool.memory_estimator.log_sizes:
+                    pool.memory_estimator.log_sizes[log_name] = get_log_size(self.get_log_path(log_name))
+                tasks.append((log_name, miner))
+            return tasks
+
+        num_tasks = 0
+        with Heartbeat(queue.db_path, worker_id, lease_time):
+            while True:
+                for task, status, output in pool.imap_unordered([], more_tasks=claim):
+                    self.save_result(store, task, status, output, task_keys.get(task))
+                    queue.complete(*task, worker_id)
+                    num_tasks += 1
+                counts = queue.counts()
+                if counts[QUEUE_PENDING] + counts[QUEUE_LEASED] == 0:
+                    return num_tasks
+                # Tasks of other processes return to the queue if their leases expire
+                time.sleep(QUEUE_POLL_INTERVAL)
+
+    def run_queue_worker(self):
+        """
+        Runs tasks of the work queue next to results.db until it is empty.
+        """
+        with ResultsStore(self.get_store_path(), journal_mode=QUEUE_JOURNAL_MODE) as store,\
+                WorkQueue(self.get_store_path(), QUEUE_JOURNAL_MODE) as queue:
+            print(f"INFO: Benchmark worker {get_worker_id()} claiming tasks from {queue.db_path}: {queue.counts()}")
+            memory_estimator = MemoryEstimator({}, load_task_metric(self.filepath, "peakrss"))
+            with self.get_task_pool(multiprocessing.cpu_count(), memory_estimator) as p:
+                random.seed(RANDOM_SEED)
+                return self.process_queue(queue, store, p)
+
+    def get_profile_path(self, log_name, miner):
+        return os.path.join(get_content_dir(self.get_dump_path(self.params[MINERS]), "profiles"), f"{log_name}_{miner}.prof")
+
+    def trace_task(self, log_name, miner, status, output, miner_results):
+        """
+        Appends the phase timings and peak memory of one finished task to trace.jsonl next to the
+        results database, so that slow or memory-hungry tasks can be found without rerunning them.
+        """
+        record = {'log': log_name, 'miner': miner, 'status': status, 'finished': dt.now().isoformat()}
+        record['phases'] = {phase: miner_results.get(f"{phase}time_{miner}") for phase in PHASE_NAMES}
+        record['time'] = miner_results.get(f"time_{miner}")
+        record['peak_rss_mb'] = miner_results.get(f"peakrss_{miner}")
+        if status != STATUS_OK:
+            record['error'] = output
+        dump_trace(record, os.path.join(os.path.split(self.get_store_path())[0], "trace.jsonl"))
+
+    def get_log_name(self, event_log, miners):
+        if is_log_file(self.params[INPUT_PATH]):
+            event_log = os.path.split(self.params[INPUT_PATH])[-1]
+        if isinstance(event_log, str):
+            return strip_suffix(os.path.basename(event_log), LOG_SUFFIXES)
+        return event_log
+
     def benchmark_wrapper(self, event_log="test", miners=['inductive'], log_counter=0):
+        """
+        Runs all miners on one event-log sequentially and saves its result row.
+        """
+        log_name = self.get_log_name(event_log, miners)
+        results = {}
+        for miner in miners:
+            results[miner] = self.benchmark_task((log_name, miner))[2]
+        self.dump_results(log_name, miners, results, log_counter)
+
+    def benchmark_task(self, task):
+        """
+        Runs one miner on one event-log.
+
+        :param tuple task: (log_name, miner) where log_name is the .xes file name without extension or an EventLog.
+        :return: Tuple of log_name, miner, a dict with the result columns of this miner and the key
+            of the task, see `get_task_keys`, or None if `has_parent_keys`.
+        """
         random.seed(RANDOM_SEED)
-        dump_path = os.path.join(self.params[OUTPUT_PATH],
-                                 os.path.split(self.params[INPUT_PATH])[-1])
-        dump_path= os.path.join(self.params[OUTPUT_PATH],
-                                os.path.join(*os.path.normpath(self.params[INPUT_PATH]).split(os.path.sep)[1:]))
-        if dump_path.endswith(".xes"):
-            event_log = os.path.split(dump_path)[-1]
-            dump_path = os.path.split(dump_path)[0]
-            if len(miners) == 1:
-                dump_path = dump_path + f"_{miners[0]}"
-        benchmark_results = pd.DataFrame()
-        # TODO: Use iteratevely generated name for log name in dataframe for passed unnamed logs instead of whole log. E.g. gen_el_1, gen_el_2,...
-        if isinstance(event_log, str):
-            log_name = event_log.replace(".xes", "")
+        log_name, miner = task
+        log, log_path = log_name, None
+        timer = PhaseTimer()
+        reset_peak_rss()
+        profile_path = self.get_profile_path(log_name if isinstance(log_name, str) else "gen_el", miner)
+        with profile_task(profile_path, self.params.get(PROFILE_THRESHOLD)):
+            if isinstance(log, str):
+                report_phase("import")
+                log_path = self.get_log_path(log)
+                try:
+                    with timer.phase("import"):
+                        log = load_event_log(log_path, self.params.get(LOG_CACHE_PATH))
+                except FileNotFoundError:
+                    print(f"        FAILED: Cannot find {log_path}" )
+                    return log_name, miner, get_failed_results(miner, STATUS_FAILED), None
+                # Events are counted while loading, the parent only knows the size of the file
+                report_work(len(log.codes))
+
+            benchmark_results =  self.benchmark_discovery(log,  miner, self.params, log_path=log_path, timer=timer)
+        if benchmark_results is None:
+            return log_name, miner, get_failed_results(miner, STATUS_FAILED), None
+        results = {f"status_{miner}": STATUS_OK}
+        results[f"fitness_{miner}"] = benchmark_results[0]
+        results[f"precision_{miner}"] = benchmark_results[1]
+        results[f"fscore_{miner}"] = 2*(benchmark_results[0]*benchmark_results[1]/(benchmark_results[0]+ benchmark_results[1]))
+        results[f"size_{miner}"]=benchmark_results[2]
+        results[f"pnsize_{miner}"]=benchmark_results[4]
+        results[f"cfc_{miner}"]=benchmark_results[3]
+        results[f"time_{miner}"]=benchmark_results[5]
+        results[f"fitnessmethod_{miner}"]=benchmark_results[6]
+        results[f"precisionmethod_{miner}"]=benchmark_results[7]
+        for phase in PHASE_NAMES:
+            results[f"{phase}time_{miner}"] = round(timer.durations.get(phase, 0), 3)
+        results[f"peakrss_{miner}"] = round(get_peak_rss_mb(), 1)
+        key = None
+        if log_path is not None and not self.has_parent_keys():
+            # Hashed once per log in each worker, next to the log in the memory of load_event_log
+            state = get_log_state(log) or {}
+            if 'hash' not in state:
+                state['hash'] = get_log_hash(log_path)
+            key = self.get_task_key(state['hash'], miner)
+        return log_name, miner, results, key
+
+    def dump_results(self, log_name, miners, miner_results, log_counter=0):
+        """
+        Joins the results of all miners for one event-log into a row and saves it as json.
+        """
+        if isinstance(log_name, str):
             results = {'log': log_name}
         else:
+            results = {"log": log_name}
             log_name = "gen_el_"+str(log_counter)
-            results = {"log": event_log}
-            #results = {"log": log_name}
-
         for miner in miners:
-            miner_cols = [f"fitness_{miner}", f"precision_{miner}", f"fscore_{miner}", f"size_{miner}", f"cfc_{miner}", f"pnsize_{miner}"]# f"generalization_{miner}",f"simplicity_{miner}"]
-            start_miner = dt.now()
-            benchmark_results =  self.benchmark_discovery(results['log'],  miner, self.params)
-            results[f"fitness_{miner}"] = benchmark_results[0]
-            results[f"precision_{miner}"] = benchmark_results[1]
-            results[f"fscore_{miner}"] = 2*(benchmark_results[0]*benchmark_results[1]/(benchmark_results[0]+ benchmark_results[1]))
-            results[f"size_{miner}"]=benchmark_results[2]
-            results[f"pnsize_{miner}"]=benchmark_results[4]
-            results[f"cfc_{miner}"]=benchmark_results[3]
-            results[f"time_{miner}"]=benchmark_results[5]
-
-        print(f"    SUCCESS: {len(miners)} miners for {results['log']} took {dt.now()-start_miner} sec.")
-        dump_features_json(results, dump_path, log_name, content_type="benchmark")
-        return
+            results.update(miner_results.get(miner, {}))
+        print(f"    SUCCESS: {len(miners)} miners for {log_name} finished.")
+        dump_features_json(results, self.get_dump_path(miners), log_name, content_type="benchmark")
+
+    def list_log_files(self, input_path):
+        """
+        Maps log names to their paths relative to input_path. Of several files with the same name,
+        e.g. genEL1.xes and genEL1.xes.gz, the first in sorted order is used.
+        """
+        log_files = {}
+        for filename in list_logs(input_path):
+            log_files.setdefault(strip_suffix(os.path.basename(filename), LOG_SUFFIXES), filename)
+        return log_files
+
+    def get_log_path(self, log_name):
+        """
+        Path of a log in input_path, e.g. data/gen_triangle.zip/gen_triangle/genEL1_10_047_nan.xes
+        for a member of an archive.
+        """
+        if is_log_file(self.params[INPUT_PATH]):
+            return self.params[INPUT_PATH]
+        if self.log_files is None:
+            try:
+                self.log_files = self.list_log_files(self.params[INPUT_PATH])
+            except FileNotFoundError:
+                self.log_files = {}
+        return os.path.join(self.params[INPUT_PATH], self.log_files.get(log_name, log_name+".xes"))
 
     def split_miner_wrapper(self, log_path="data/real_event_logs/BPI_Challenges/BPI_Challenge_2012.xes", version=1.0):
+        """
+        Discovers a BPMN model with Split Miner.
+
+        :return: Tuple of the BPMN model and the seconds of the call spent outside of discovery,
+            e.g. for communicating with the JVM or extracting the log, or None if Split Miner failed.
+        """
         random.seed(RANDOM_SEED)
         os.environ["DISPLAY"] = ":99" # For running on github CI
-        filename = os.path.split(log_path)[-1].rsplit(".",1)[0]
+        filename = strip_suffix(os.path.split(log_path)[-1], LOG_SUFFIXES)
         bpmn_path = os.path.join("output", "bpmns_split", filename)
         os.makedirs(os.path.split(bpmn_path)[0], exist_ok=True)
-        if version==2.0:
-            command = [
-                    "java",
-                    "-cp",
-                    f"{os.getcwd()}/miners/split-miner-2.0/sm2.jar:{os.getcwd()}/miners/split-miner-2.0/lib/*",
-                    "au.edu.unimelb.services.ServiceProvider",
-                    "SM2",
-                    f"{os.getcwd()}/{log_path}",
-                    f"{os.getcwd()}/{bpmn_path}",
-                    "0.05"
-                    ]
-        elif version==1.0:
-            command = [
-                "java",
-                "-cp",
-                f"{os.getcwd()}/miners/splitminer/splitminer.jar:{os.getcwd()}/miners/splitminer/lib/*",
-                "au.edu.unimelb.services.ServiceProvider",
-                "SMD",
-                "0.1",
-                "0.4",
-                "false",
-                f"{os.getcwd()}/{log_path}",
-                f"{os.getcwd()}/{bpmn_path}",
-            ]
-
-        print("        COMMAND", " ".join(command))
-        output = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-        )
+        # Logs in archives or .xes.gz are only written to a temporary .xes for the duration of the call
+        extract_start = dt.now()
+        with materialize_log(log_path) as xes_path:
+            extract_time = (dt.now()-extract_start).total_seconds()
+            if version==2.0:
+                args = [
+                        "SM2",
+                        xes_path,
+                        os.path.abspath(bpmn_path),
+                        MINER_CONFIGS['sm2']['frequency_threshold']
+                        ]
+            elif version==1.0:
+                args = [
+                    "SMD",
+                    MINER_CONFIGS['sm1']['eta'],
+                    MINER_CONFIGS['sm1']['epsilon'],
+                    "false",
+                    xes_path,
+                    os.path.abspath(bpmn_path),
+                ]
+
+            print(f"        COMMAND SplitMiner v{version}", " ".join(args))
+            output, discovery_time, wall_time = run_split_miner(args, version,
+                                                               use_service=self.params.get(SPLIT_MINER_SERVICE, True))
         try:
-            if "\nERROR:" in output.stdout:
-                print("FAILED: SplitMiner v{version} could not create BPMN for", log_path)
-                print("     SplitMiner:", output.stderr)
+            if "\nERROR:" in output:
+                print(f"FAILED: SplitMiner v{version} could not create BPMN for", log_path)
+                print("     SplitMiner:", output)
                 return None
-            return read_bpmn(bpmn_path+'.bpmn')
+            return read_bpmn(bpmn_path+'.bpmn'), max(wall_time - discovery_time, 0) + extract_time
         except ValueError:
-            print(output.stdout)
+            print(output)
 
-    def benchmark_discovery(self, log, miner, params=None):
+    def benchmark_discovery(self, log, miner, params=None, log_path=None, timer=None):
         """
         Runs discovery algorithms on a specific log and returns their performance.
 
         :param str/EventLog log: log from pipeline step before or string to .xes file.
         :param str miner: Specifies process discovery miner to be run on log.
         :param Dict params: Params from config file
+        :param str log_path: Path to the .xes file of an already parsed log. Required by the split miners.
+        :param PhaseTimer timer: Collects the duration of each phase. A new one is used if None.
 
         """
         #print("Running benchmark_discovery with", self, log, miner, params)
         random.seed(RANDOM_SEED)
-        NOISE_THRESHOLD = 0.2
-        miner_params=''
-        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+        timer = timer if timer is not None else PhaseTimer()
+        disable_progress_bars()
         start_bench = dt.now()
 
         if type(log) is str:
-            if params[INPUT_PATH].endswith('.xes'):
-                log_path = params[INPUT_PATH]
-            else:
-                log_path = os.path.join(params[INPUT_PATH], log+".xes")
+            log_path = self.get_log_path(log)
             success_msg = f"        SUCCESS: Benchmarking event-log {log} with {miner} took "# {dt.now()-start_bench} sec."
             try:
-                log = xes_importer.apply(f"{log_path}", parameters={"show_progress_bar": False})
+                with timer.phase("import"):
+                    log = load_event_log(log_path, params.get(LOG_CACHE_PATH))
             except FileNotFoundError:
                 print(f"        FAILED: Cannot find {log_path}" )
+        elif log_path is not None:
+            success_msg = f"        SUCCESS: Benchmarking event-log {self.get_log_name(log_path, None)} with {miner} took "
         else:
             log=log
             success_msg = f"        SUCCESS: Benchmarking one event-log with {miner} took "# {dt.now()-start_bench} sec."
+        context = get_discovery_context(log)
+        report_phase("discovery")
+        # Time spent outside of discovery, e.g. talking to the Split Miner JVM or preparing the
+        # shared inputs of the miners, is not part of time_{miner}
+        overhead = 0
         if miner == 'sm1':
-            bpmn_graph = self.split_miner_wrapper(log_path, version=1.0)
-            if bpmn_graph is None:
+            with timer.phase("discovery"):
+                split_miner_result = self.split_miner_wrapper(log_path, version=1.0)
+            if split_miner_result is None:
                 return None
-            '''TESTING
-            from pm4py.visualization.bpmn.visualizer import apply as get_bpmn_fig
-            from pm4py.visualization.bpmn.visualizer import matplotlib_view as view_bpmn_fig
-            bpmn_fig = get_bpmn_fig(bpmn_graph)
-            view_bpmn_fig(bpmn_fig)
-            '''
-            net, im, fm = convert_to_petri_net(bpmn_graph)
+            bpmn_graph, overhead = split_miner_result
+            with timer.phase("conversion"):
+                net, im, fm = convert_to_petri_net(bpmn_graph)
         elif miner == 'sm2':
-            bpmn_graph = self.split_miner_wrapper(log_path, version=2.0)
-            if bpmn_graph is None:
+            with timer.phase("discovery"):
+                split_miner_result = self.split_miner_wrapper(log_path, version=2.0)
+            if split_miner_result is None:
                 return None
-            net, im, fm = convert_to_petri_net(bpmn_graph)
+            bpmn_graph, overhead = split_miner_result
+            with timer.phase("conversion"):
+                net, im, fm = convert_to_petri_net(bpmn_graph)
         else:
-            if miner == 'imf':
-                miner = 'inductive'
-                miner_params = f', noise_threshold={NOISE_THRESHOLD}'
-            net, im, fm = eval(f"discover_petri_net_{miner}(log {miner_params})")
-            bpmn_graph = convert_to_bpmn(net, im, fm)
-        time = round((dt.now()-start_bench).total_seconds(),2)
-        fitness = fitness_alignments(log, net, im, fm)['log_fitness']
-        precision = precision_alignments(log, net, im, fm)
-        pn_size = len(net._PetriNet__places)
-        size = len(bpmn_graph._BPMN__nodes)
-        cfc = sum([isinstance(node, BPMN.ExclusiveGateway) for node in bpmn_graph._BPMN__nodes])
-        #generalization = generalization_evaluator.apply(log, net, im, fm)
-        #simplicity = simplicity_evaluator.apply(net)
-        print(success_msg + f"{dt.now()-start_bench} sec.")
-        return fitness, precision, size, cfc, pn_size, time  #, generalization, simplicity
+            discover, inputs = MINER_ADAPTERS[miner]
+            # Inputs shared with the other miners on this log are prepared outside of time_{miner}
+            with timer.phase("import"):
+                prepare_start = dt.now()
+                context.prepare(inputs)
+                overhead = (dt.now()-prepare_start).total_seconds()
+            with timer.phase("discovery"):
+                net, im, fm = discover(context, **MINER_CONFIGS.get(miner, {}))
+            context.release()
+            with timer.phase("conversion"):
+                bpmn_graph = convert_to_bpmn(net, im, fm)
+        time = round((dt.now()-start_bench).total_seconds()-overhead,2)
+        report_phase("conformance")
+        cache_path = params.get(ALIGNMENT_CACHE_PATH)
+        with AlignmentCache(os.path.join(cache_path, ALIGNMENT_CACHE_FILE), params.get(ALIGNMENT_CACHE_SIZE, DEFAULT_CACHE_SIZE))\
+                if cache_path is not None else nullcontext() as cache:
+            conformance = compute_conformance(log, net, im, fm, params.get(CONFORMANCE, ALIGNMENTS),
+                                              params.get(CONFORMANCE_BUDGET, DEFAULT_CONFORMANCE_BUDGET),
+                                              timer=timer, variant_counts=context.variants, cache=cache)
+        fitness, precision = conformance['fitness'], conformance['precision']
+        with timer.phase("size"):
+            pn_size = len(net._PetriNet__places)
+            size = len(bpmn_graph._BPMN__nodes)
+            cfc = sum([isinstance(node, BPMN.ExclusiveGateway) for node in bpmn_graph._BPMN__nodes])
+        # The metrics are final, phase limits must not discard them while the results are written
+        report_phase("results")
+        print(success_msg + f"{dt.now()-start_bench} sec. Aligned {conformance['alignments']} and replayed {conformance['replays']}"+\
+              f" variants and prefixes (fitness by {conformance['fitness_method']}, precision by {conformance['precision_method']}),"+\
+              f" skipped {conformance['skipped_alignments']} alignments.")
+        return fitness, precision, size, cfc, pn_size, time, conformance['fitness_method'], conformance['precision_method']
@@ -0,0 +1,328 @@
+import signal
+import threading
+
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pm4py.algo.conformance.alignments.petri_net import algorithm as alignments
+from pm4py.algo.evaluation.precision import utils as precision_utils
+from pm4py.algo.evaluation.precision.variants.align_etconformance import align_fake_log_stop_marking
+from pm4py.algo.evaluation.precision.variants.align_etconformance import transform_markings_from_sync_to_original_net
+from pm4py.algo.conformance.tokenreplay.variants import token_replay
+from pm4py.algo.evaluation.replay_fitness.variants.alignment_based import evaluate as evaluate_fitness
+from pm4py.algo.evaluation.replay_fitness.variants.token_replay import evaluate as evaluate_token_fitness
+from pm4py.objects.log.obj import EventLog, Trace, Event
+from pm4py.objects.petri_net.utils import check_soundness
+from pm4py.objects.petri_net.utils.align_utils import get_visible_transitions_eventually_enabled_by_marking
+from pm4py.util import constants
+from pm4py.util.xes_constants import DEFAULT_NAME_KEY
+from shaining.utils.alignment_cache import get_sequence_key, FITNESS, PRECISION
+from shaining.utils.columnar_log import ColumnarLog
+
+ALIGNMENTS = 'alignments'
+TOKEN_REPLAY = 'token_replay'
+AUTO = 'auto'
+CONFORMANCE_METHODS = [ALIGNMENTS, TOKEN_REPLAY, AUTO]
+# Seconds for alignments of fitness and of precision each, before AUTO falls back to token replay
+DEFAULT_CONFORMANCE_BUDGET = 60
+# Part of the message of the exceptions pm4py raises for alignments on nets that are not easy sound
+NOT_EASY_SOUND_MESSAGE = "not a easy sound net"
+
+def get_alignment_params(activity_key=DEFAULT_NAME_KEY):
+    return {constants.PARAMETER_CONSTANT_ACTIVITY_KEY: activity_key,
+            "show_progress_bar": False, "multiprocessing": False}
+
+def get_variant_counts(log, activity_key=DEFAULT_NAME_KEY):
+    """
+    Collapses an event-log into its variants.
+
+    :param EventLog log: Parsed event-log or ColumnarLog.
+    :param str activity_key: Event attribute holding the activity.
+    :return: Counter mapping activity tuples to their number of traces.
+    """
+    if isinstance(log, ColumnarLog):
+        # Variants are read from the activity code arrays, no events are built
+        return log.get_variant_counter()
+    return Counter(tuple(event[activity_key] for event in trace) for trace in log)
+
+def variants_to_log(variants, activity_key=DEFAULT_NAME_KEY):
+    log = EventLog()
+    for variant in variants:
+        log.append(Trace([Event({activity_key: activity}) for activity in variant]))
+    return log
+
+def get_variant_prefixes(variant_counts):
+    """
+    Equivalent of pm4py's `precision_utils.get_log_prefixes` on a variant table: a prefix seen in
+    n traces is counted n times, but stored and aligned once.
+    """
+    prefixes = {}
+    prefix_count = Counter()
+    for variant, count in variant_counts.items():
+        for i in range(1, len(variant)):
+            prefix = constants.DEFAULT_VARIANT_SEP.join(variant[0:i])
+            prefixes.setdefault(prefix, set()).add(variant[i])
+            prefix_count[prefix] += count
+    return prefixes, prefix_count
+
+def align_variants(variants, net, im, fm, activity_key=DEFAULT_NAME_KEY, cache=None, fingerprint=None):
+    """
+    Aligns every variant once, or reads its alignment from the cache.
+
+    :param list variants: Activity tuples.
+    :param AlignmentCache cache: Cache of alignments of nets with `fingerprint`. Disabled if None.
+    :return: Tuple of a list with the cost, best worst cost and fitness of the alignment of every
+        variant, None if it could not be aligned, and the number of computed alignments.
+    """
+    keys = [get_sequence_key(variant) for variant in variants]
+    cached = cache.get_many(fingerprint, FITNESS, keys) if cache is not None else {}
+    missing = [variant for variant, key in zip(variants, keys) if key not in cached]
+    if missing:
+        aligned = alignments.apply(variants_to_log(missing, activity_key), net, im, fm,
+                                   parameters=get_alignment_params(activity_key))
+        computed = {get_sequence_key(variant): None if alignment is None else
+                    {key: alignment[key] for key in ('cost', 'bwc', 'fitness')}
+                    for variant, alignment in zip(missing, aligned)}
+        if cache is not None:
+            cache.put_many(fingerprint, FITNESS, computed)
+        cached.update(computed)
+    return [cached[key] for key in keys], len(missing)
+
+def variant_fitness(variant_counts, net, im, fm, activity_key=DEFAULT_NAME_KEY, cache=None, fingerprint=None):
+    """
+    Alignment-based log fitness, aligning every variant once.
+
+    Matches `pm4py.fitness_alignments(log, net, im, fm)['log_fitness']`, as the variant
+    alignments are weighted by their trace count before `evaluate`.
+
+    :return: Tuple of fitness and number of computed alignments.
+    """
+    variants = list(variant_counts)
+    aligned, num_aligned = align_variants(variants, net, im, fm, activity_key, cache, fingerprint)
+    aligned_traces = []
+    for variant, alignment in zip(variants, aligned):
+        aligned_traces.extend([alignment] * variant_counts[variant])
+    return evaluate_fitness(aligned_traces)['log_fitness'], num_aligned
+
+def get_prefix_activations(prefixes_keys, net, im, fm, activity_key=DEFAULT_NAME_KEY, cache=None, fingerprint=None):
+    """
+    Aligns every prefix to the net and collects the labels of the visible transitions enabled
+    after it, or reads them from the cache.
+
+    :return: Tuple of a dict mapping prefixes to sets of labels, None if a prefix could not be
+        aligned, and the number of computed prefix alignments.
+    """
+    cached = cache.get_many(fingerprint, PRECISION, prefixes_keys) if cache is not None else {}
+    missing = [prefix for prefix in prefixes_keys if prefix not in cached]
+    if missing:
+        fake_log = precision_utils.form_fake_log(missing, activity_key=activity_key)
+        align_stop_marking = align_fake_log_stop_marking(fake_log, net, im, fm, parameters=get_alignment_params(activity_key))
+        all_markings = transform_markings_from_sync_to_original_net(align_stop_marking, net)
+        computed = {}
+        for prefix, markings in zip(missing, all_markings):
+            if markings is None:
+                computed[prefix] = None
+                continue
+            activated_transitions_labels = set()
+            for m in markings:
+                activated_transitions_labels = activated_transitions_labels.union(
+                    x.label for x in get_visible_transitions_eventually_enabled_by_marking(net, m) if
+                    x.label is not None)
+            computed[prefix] = sorted(activated_transitions_labels)
+        if cache is not None:
+            cache.put_many(fingerprint, PRECISION, computed)
+        cached.update(computed)
+    return {prefix: None if cached[prefix] is None else set(cached[prefix]) for prefix in prefixes_keys}, len(missing)
+
+def variant_precision(variant_counts, net, im, fm, activity_key=DEFAULT_NAME_KEY, cache=None, fingerprint=None):
+    """
+    Align-ETConformance precision computed from a variant table.
+
+    Mirrors `pm4py.algo.evaluation.precision.variants.align_etconformance.apply`, but collects
+    the prefixes from the variants instead of scanning every trace of the log.
+
+    :return: Tuple of precision and number of computed prefix alignments.
+    """
+    if not check_soundness.check_easy_soundness_net_in_fin_marking(net, im, fm):
+        raise Exception(f"trying to apply Align-ETConformance on a Petri net that is {NOT_EASY_SOUND_MESSAGE}!!")
+
+    prefixes, prefix_count = get_variant_prefixes(variant_counts)
+    activations, num_aligned = get_prefix_activations(list(prefixes), net, im, fm, activity_key, cache, fingerprint)
+    return escaping_edges_precision(variant_counts, prefixes, prefix_count, activations, net, im), num_aligned
+
+def escaping_edges_precision(variant_counts, prefixes, prefix_count, activations, net, im):
+    """
+    ETConformance precision from the labels enabled after every prefix, by alignments or replay.
+
+    :param dict activations: Maps prefixes to the set of enabled labels, None to skip the prefix.
+    """
+    precision = 1.0
+    sum_ee = 0
+    sum_at = 0
+    for prefix, activated_transitions_labels in activations.items():
+        if activated_transitions_labels is None:
+            continue
+        escaping_edges = activated_transitions_labels.difference(prefixes[prefix])
+        sum_at += len(activated_transitions_labels) * prefix_count[prefix]
+        sum_ee += len(escaping_edges) * prefix_count[prefix]
+
+    start_activities = set(variant[0] for variant in variant_counts if len(variant) > 0)
+    trans_en_ini_marking = set([x.label for x in get_visible_transitions_eventually_enabled_by_marking(net, im)])
+    diff = trans_en_ini_marking.difference(start_activities)
+    num_traces = sum(variant_counts.values())
+    sum_at += num_traces * len(trans_en_ini_marking)
+    sum_ee += num_traces * len(diff)
+
+    if sum_at > 0:
+        precision = 1 - float(sum_ee) / float(sum_at)
+    return precision
+
+def token_replay_fitness(variant_counts, net, im, fm, activity_key=DEFAULT_NAME_KEY):
+    """
+    Token-based replay fitness, replaying every variant once.
+
+    Matches `pm4py.fitness_token_based_replay(log, net, im, fm)['log_fitness']`.
+
+    :return: Tuple of fitness and number of replayed variants.
+    """
+    variants = list(variant_counts)
+    parameters = {token_replay.Parameters.ACTIVITY_KEY: activity_key,
+                  token_replay.Parameters.CONSIDER_REMAINING_IN_FITNESS: True,
+                  token_replay.Parameters.SHOW_PROGRESS_BAR: False}
+    replayed = token_replay.apply(variants_to_log(variants, activity_key), net, im, fm, parameters=parameters)
+    replayed_traces = []
+    for variant, replay in zip(variants, replayed):
+        replayed_traces.extend([replay] * variant_counts[variant])
+    return evaluate_token_fitness(replayed_traces)['log_fitness'], len(variants)
+
+def token_replay_precision(variant_counts, net, im, fm, activity_key=DEFAULT_NAME_KEY):
+    """
+    ETConformance precision with token-based replay of every distinct prefix.
+
+    Matches `pm4py.precision_token_based_replay(log, net, im, fm)`.
+
+    :return: Tuple of precision and number of replayed prefixes.
+    """
+    prefixes, prefix_count = get_variant_prefixes(variant_counts)
+    prefixes_keys = list(prefixes)
+    parameters = {token_replay.Parameters.ACTIVITY_KEY: activity_key,
+                  token_replay.Parameters.CONSIDER_REMAINING_IN_FITNESS: False,
+                  token_replay.Parameters.TRY_TO_REACH_FINAL_MARKING_THROUGH_HIDDEN: False,
+                  token_replay.Parameters.STOP_IMMEDIATELY_UNFIT: True,
+                  token_replay.Parameters.WALK_THROUGH_HIDDEN_TRANS: True,
+                  token_replay.Parameters.SHOW_PROGRESS_BAR: False}
+    fake_log = precision_utils.form_fake_log(prefixes_keys, activity_key=activity_key)
+    replayed = token_replay.apply(fake_log, net, im, fm, parameters=parameters)
+    activations = {prefix: set(x.label for x in replay["enabled_transitions_in_marking"] if x.label is not None)
+                   if replay["trace_is_fit"] else None for prefix, replay in zip(prefixes_keys, replayed)}
+    return escaping_edges_precision(variant_counts, prefixes, prefix_count, activations, net, im), len(prefixes_keys)
+
+class ConformanceTimeout(Exception):
+    pass
+
+@contextmanager
+def time_budget(seconds):
+    """
+    Raises ConformanceTimeout in the block after `seconds`. Without effect if `seconds` is None or
+    outside of the main thread, as it relies on SIGALRM.
+    """
+    if seconds is None or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    def on_alarm(signum, frame):
+        raise ConformanceTimeout(f"Exceeded the conformance budget of {seconds} sec.")
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def compute_metric(name, method, budget, alignment_metric, token_replay_metric):
+    """
+    Computes fitness or precision with `method`. In AUTO mode, alignments run within `budget`
+    seconds and token-based replay is used instead if they take longer or the net is not easy
+    sound.
+
+    :return: Tuple of the metric's value, number of computed alignments or replays and the method used.
+    """
+    if method == TOKEN_REPLAY:
+        return token_replay_metric() + (TOKEN_REPLAY,)
+    if method == ALIGNMENTS:
+        return alignment_metric() + (ALIGNMENTS,)
+    try:
+        with time_budget(budget):
+            return alignment_metric() + (ALIGNMENTS,)
+    except Exception as e:
+        # pm4py raises a plain Exception for nets that are not easy sound, any other error is a bug
+        if not isinstance(e, ConformanceTimeout) and NOT_EASY_SOUND_MESSAGE not in str(e):
+            raise
+        print(f"        INFO: Falling back to token replay for {name}: {str(e)[:100]}")
+        return token_replay_metric() + (TOKEN_REPLAY,)
+
+def compute_conformance(log, net, im, fm, method=ALIGNMENTS, budget=DEFAULT_CONFORMANCE_BUDGET, activity_key=DEFAULT_NAME_KEY,
+                        timer=None, variant_counts=None, cache=None):
+    """
+    Computes fitness and precision of a Petri net on a log with alignments, token-based replay, or
+    alignments within a time budget and token-based replay as fallback.
+
+    :param str method: ALIGNMENTS, TOKEN_REPLAY or AUTO.
+    :param float budget: Seconds for each of fitness and precision with alignments in AUTO mode.
+    :return: dict like `alignment_conformance`, with the method that computed each metric in
+        fitness_method and precision_method and the number of variants and prefixes replayed with
+        token-based replay in replays.
+    """
+    if method not in CONFORMANCE_METHODS:
+        raise ValueError(f"The conformance method {method} is not supported. Available are {CONFORMANCE_METHODS}.")
+    phase = timer.phase if timer is not None else lambda name: nullcontext()
+    with phase("fitness"):
+        if variant_counts is None:
+            variant_counts = get_variant_counts(log, activity_key)
+        fingerprint = cache.get_fingerprint(net, im, fm) if cache is not None and method != TOKEN_REPLAY else None
+        if fingerprint is None:
+            # Another net with the same fingerprint is cached, or the cache is disabled
+            cache = None
+        fitness, num_variants, fitness_method = compute_metric(
+            "fitness", method, budget,
+            lambda: variant_fitness(variant_counts, net, im, fm, activity_key, cache, fingerprint),
+            lambda: token_replay_fitness(variant_counts, net, im, fm, activity_key))
+    with phase("precision"):
+        precision, num_prefixes, precision_method = compute_metric(
+            "precision", method, budget,
+            lambda: variant_precision(variant_counts, net, im, fm, activity_key, cache, fingerprint),
+            lambda: token_replay_precision(variant_counts, net, im, fm, activity_key))
+
+    num_traces = sum(variant_counts.values())
+    num_trace_prefixes = sum(max(len(variant)-1, 0)*count for variant, count in variant_counts.items())
+    # Alignments are only counted, and skipped ones only compared to aligning every trace or
+    # prefix, for the metrics computed with alignments
+    counts = {ALIGNMENTS: 0, TOKEN_REPLAY: 0}
+    skipped = 0
+    for metric_method, computed, total in [(fitness_method, num_variants, num_traces),
+                                           (precision_method, num_prefixes, num_trace_prefixes)]:
+        counts[metric_method] += computed
+        if metric_method == ALIGNMENTS:
+            skipped += total - computed
+    return {"fitness": fitness, "precision": precision, "alignments": counts[ALIGNMENTS],
+            "replays": counts[TOKEN_REPLAY], "skipped_alignments": skipped,
+            "fitness_method": fitness_method, "precision_method": precision_method}
+
+def alignment_conformance(log, net, im, fm, activity_key=DEFAULT_NAME_KEY, timer=None, variant_counts=None, cache=None):
+    """
+    Computes alignment-based fitness and precision of a Petri net on a log in one conformance stage.
+
+    The log is collapsed into its variants once. Every variant is aligned once for fitness and
+    every distinct prefix once for precision, weighted by their number of traces. The results
+    equal `pm4py.fitness_alignments(...)['log_fitness']` and `pm4py.precision_alignments(...)`.
+
+    :param EventLog log: Parsed event-log or ColumnarLog.
+    :param PetriNet net: Discovered Petri net.
+    :param Marking im: Initial marking.
+    :param Marking fm: Final marking.
+    :param PhaseTimer timer: Records the fitness and precision phases if given.
+    :param Counter variant_counts: Variants of the log, e.g. of its DiscoveryContext. Computed if None.
+    :param AlignmentCache cache: Reuses alignments of variants and prefixes on equal nets. Disabled if None.
+    :return: dict with fitness, precision, the number of computed alignments and the number of
+        alignments skipped compared to aligning every trace and every trace prefix.
+    """
+    return compute_conformance(log, net, im, fm, ALIGNMENTS, None, activity_key, timer, variant_counts, cache)
@@ -0,0 +1,179 @@
+import numpy as np
+
+from functools import cached_property
+from pm4py import convert_to_petri_net, discover_petri_net_ilp, discover_petri_net_inductive
+from pm4py.algo.discovery.heuristics.variants import classic as heuristics_miner
+from pm4py.objects.conversion.heuristics_net import converter as heuristics_net_converter
+from pm4py.objects.dfg.obj import DFG
+from pm4py.objects.log.obj import EventLog
+from shaining.utils.columnar_log import ColumnarLog
+from shaining.utils.log_cache import get_log_state
+try:
+    from pm4py.algo.discovery.inductive.dtypes.im_dfg import InductiveDFG
+    from pm4py.algo.discovery.inductive.dtypes.im_ds import IMDataStructureDFG, IMDataStructureUVCL
+    from pm4py.algo.discovery.inductive.variants.im import IMUVCL
+    from pm4py.algo.discovery.inductive.variants.imd import IMD
+    from pm4py.algo.discovery.inductive.variants.imf import IMFUVCL
+except ImportError:
+    # pm4py versions without these classes run the inductive miners on the EventLog
+    IMUVCL = None
+
+class DiscoveryContext:
+    """
+    Discovery inputs of one event-log, shared by all miners that run on it.
+
+    Every input is computed from the ColumnarLog on first use and kept, so the directly-follows
+    graph, start and end activities and variants are scanned from the log once, not once per
+    miner. The pm4py EventLog, which only miners without another input need, is the only input
+    that is not kept beyond `release`.
+
+    :param ColumnarLog/EventLog log: Event-log to discover models from.
+    """
+    # Inputs that are too large to keep between miners
+    TRANSIENT = ['event_log']
+
+    def __init__(self, log):
+        self.log = log
+        self.columnar_log = log if isinstance(log, ColumnarLog) else ColumnarLog.from_event_log(log)
+
+    def prepare(self, inputs):
+        """
+        Computes `inputs` ahead of discovery, e.g. outside of its timing.
+        """
+        for name in inputs:
+            getattr(self, name)
+
+    def release(self):
+        for name in self.TRANSIENT:
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def activity_names(self):
+        return np.array(self.columnar_log.activities, dtype=object)
+
+    @cached_property
+    def trace_positions(self):
+        """
+        Position of every event in its trace.
+        """
+        log = self.columnar_log
+        return np.arange(len(log.codes)) - np.repeat(log.offsets[:-1], log.trace_lengths)
+
+    def count_sequences(self, gaps):
+        """
+        Counts the activity sequences (codes[i-gaps[0]], ..., codes[i]) within traces.
+
+        :param list gaps: Distances of the preceding events, in decreasing order.
+        :return: dict mapping tuples of activity names to their number of occurrences, in order of
+            first occurrence.
+        """
+        codes = self.columnar_log.codes
+        positions = np.flatnonzero(self.trace_positions >= gaps[0])
+        sequences = np.stack([codes[positions-gap] for gap in gaps] + [codes[positions]], axis=1)
+        if len(sequences) == 0:
+            return {}
+        unique, first, counts = np.unique(sequences, axis=0, return_index=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+        names = self.activity_names[unique[order]]
+        return {tuple(sequence): int(count) for sequence, count in zip(names.tolist(), counts[order])}
+
+    def count_activities(self, codes):
+        """
+        :return: dict mapping the activity of `codes` to their number of occurrences, in order of
+            first occurrence.
+        """
+        unique, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+        return dict(zip(self.activity_names[unique[order]].tolist(), counts[order].tolist()))
+
+    @cached_property
+    def dfg(self):
+        return self.count_sequences([1])
+
+    @cached_property
+    def dfg_window_2(self):
+        return self.count_sequences([2])
+
+    @cached_property
+    def freq_triples(self):
+        return self.count_sequences([2, 1])
+
+    @cached_property
+    def activity_occurrences(self):
+        return self.count_activities(self.columnar_log.codes)
+
+    @cached_property
+    def start_activities(self):
+        log = self.columnar_log
+        return self.count_activities(log.codes[log.offsets[:-1][log.trace_lengths > 0]])
+
+    @cached_property
+    def end_activities(self):
+        log = self.columnar_log
+        return self.count_activities(log.codes[log.offsets[1:][log.trace_lengths > 0]-1])
+
+    @cached_property
+    def variants(self):
+        """
+        Counter mapping every variant as a tuple of activity names to its number of traces.
+        """
+        return self.columnar_log.get_variant_counter()
+
+    @cached_property
+    def event_log(self):
+        return self.log if isinstance(self.log, EventLog) else self.columnar_log.to_event_log()
+
+def get_discovery_context(log):
+    """
+    Returns the DiscoveryContext of `log`. Logs returned by `load_event_log` keep their context
+    next to them, so it is shared by all tasks on the same log and evicted together with the log.
+    Other logs get a new context.
+    """
+    state = get_log_state(log)
+    if state is None:
+        return DiscoveryContext(log)
+    if 'discovery_context' not in state:
+        state['discovery_context'] = DiscoveryContext(log)
+    return state['discovery_context']
+
+def discover_heuristics(context, dependency_threshold=0.5, and_threshold=0.65, loop_two_threshold=0.5):
+    parameters = {
+        heuristics_miner.Parameters.DEPENDENCY_THRESH: dependency_threshold,
+        heuristics_miner.Parameters.AND_MEASURE_THRESH: and_threshold,
+        heuristics_miner.Parameters.LOOP_LENGTH_TWO_THRESH: loop_two_threshold,
+        }
+    heu_net = heuristics_miner.apply_heu_dfg(context.dfg, activities=list(context.activity_occurrences),
+                                             activities_occurrences=context.activity_occurrences,
+                                             start_activities=context.start_activities,
+                                             end_activities=context.end_activities,
+                                             dfg_window_2=context.dfg_window_2, freq_triples=context.freq_triples,
+                                             parameters=parameters)
+    return heuristics_net_converter.apply(heu_net, parameters=parameters)
+
+def discover_inductive(context, noise_threshold=0.0):
+    if IMUVCL is None:
+        return discover_petri_net_inductive(context.event_log, noise_threshold=noise_threshold)
+    parameters = {'noise_threshold': noise_threshold, 'multiprocessing': False}
+    miner = IMFUVCL(parameters) if noise_threshold > 0 else IMUVCL(parameters)
+    return convert_to_petri_net(miner.apply(IMDataStructureUVCL(context.variants), parameters))
+
+def discover_inductive_directly_follows(context):
+    if IMUVCL is None:
+        return discover_petri_net_inductive(DFG(context.dfg, context.start_activities, context.end_activities))
+    dfg = InductiveDFG(dfg=DFG(context.dfg, context.start_activities, context.end_activities),
+                       skip=bool((context.columnar_log.trace_lengths == 0).any()))
+    return convert_to_petri_net(IMD({}).apply(IMDataStructureDFG(dfg), {}))
+
+def discover_ilp(context, alpha=1.0):
+    return discover_petri_net_ilp(context.event_log, alpha=alpha)
+
+# Miners as (discovery function, inputs of DiscoveryContext it reads). The function is called with
+# the context and the miner's configuration as keyword arguments.
+MINER_ADAPTERS = {
+    'heuristics': (discover_heuristics, ['dfg', 'dfg_window_2', 'freq_triples', 'activity_occurrences',
+                                         'start_activities', 'end_activities']),
+    'inductive': (discover_inductive, ['variants']),
+    'imf': (discover_inductive, ['variants']),
+    'imd': (discover_inductive_directly_follows, ['dfg', 'start_activities', 'end_activities']),
+    'ilp': (discover_ilp, ['event_log']),
+    }
@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import pandas as pd
+import numpy as np
+
+from datetime import datetime as dt
+from functools import cached_property
+from shaining.pipeline import get_features_path, get_features_dump_path
+from shaining.utils.io_helpers import dump_features_json
+from shaining.utils.columnar_log import ColumnarLog
+from shaining.utils.log_archive import is_log_file, list_logs, strip_suffix, LOG_SUFFIXES
+from shaining.utils.log_cache import load_event_log
+from utils.param_keys import INPUT_PATH, OUTPUT_PATH
+from utils.param_keys.benchmark import LOG_CACHE_PATH
+from utils.param_keys.features import FEATURE_PARAMS, FEATURE_SET
+
+class LogArrays(ColumnarLog):
+    """
+    ColumnarLog with the statistics shared by several features, computed once on first use.
+    """
+    @classmethod
+    def from_xes(cls, log_path):
+        return super().from_xes(log_path, with_timestamps=False)
+
+    @classmethod
+    def from_columnar(cls, log):
+        """
+        Shares the arrays of a ColumnarLog, e.g. one returned by `load_event_log`.
+        """
+        return cls(log.codes, log.offsets, log.activities, log.timestamps, log.case_ids)
+
+    @cached_property
+    def activity_counts(self):
+        counts = np.bincount(self.codes, minlength=len(self.activities))
+        return counts[counts > 0]
+
+    @cached_property
+    def start_activity_counts(self):
+        starts = self.codes[self.offsets[:-1][self.trace_lengths > 0]]
+        counts = np.bincount(starts, minlength=len(self.activities))
+        return counts[counts > 0]
+
+    @cached_property
+    def end_activity_counts(self):
+        ends = self.codes[self.offsets[1:][self.trace_lengths > 0]-1]
+        counts = np.bincount(ends, minlength=len(self.activities))
+        return counts[counts > 0]
+
+def ratio_variants_per_number_of_traces(log):
+    return len(log.variant_counts)/len(log.trace_lengths)
+
+def trace_len_coefficient_variation(log):
+    return np.std(log.trace_lengths)/np.mean(log.trace_lengths)
+
+def mean_variant_occurrence(log):
+    return np.mean(log.variant_counts)
+
+def activities_std(log):
+    return np.std(log.activity_counts)
+
+def start_activities_median(log):
+    return np.median(log.start_activity_counts)
+
+def end_activities_variance(log):
+    return np.var(log.end_activity_counts)
+
+def eventropy_trace(log):
+    """
+    Trace entropy: Entropy in bits of the distribution of traces over variants.
+    """
+    probabilities = log.variant_counts/log.variant_counts.sum()
+    return -np.sum(probabilities*np.log2(probabilities))
+
+def epa_normalized_variant_entropy(log):
+    """
+    Normalized variant entropy of the extended prefix automaton (Vidgof et al., 2023).
+
+    The states S are the distinct prefixes of the variants. A state that does not branch off an
+    existing path continues the partition of its predecessor, otherwise it starts a new one.
+    Returns (|S|ln|S| - sum |C_i|ln|C_i|) / (|S|ln|S|) over the partitions C_i.
+    """
+    children = {(): {}}
+    partition_of = {(): None}
+    partition_sizes = []
+    for variant in log.variants:
+        prefix = ()
+        for activity in variant.tolist():
+            state = prefix + (activity,)
+            if state not in partition_of:
+                if prefix == () or len(children[prefix]) > 0:
+                    partition_sizes.append(0)
+                    partition_of[state] = len(partition_sizes)-1
+                else:
+                    partition_of[state] = partition_of[prefix]
+                partition_sizes[partition_of[state]] += 1
+                children[prefix][activity] = state
+                children[state] = {}
+            prefix = state
+
+    num_states = sum(partition_sizes)
+    if num_states <= 1:
+        return 0.0
+    sizes = np.array(partition_sizes, dtype=float)
+    entropy = num_states*np.log(num_states) - np.sum(sizes*np.log(sizes))
+    return entropy/(num_states*np.log(num_states))
+
+FEATURES = {feature.__name__: feature for feature in [
+    ratio_variants_per_number_of_traces,
+    trace_len_coefficient_variation,
+    mean_variant_occurrence,
+    activities_std,
+    start_activities_median,
+    end_activities_variance,
+    eventropy_trace,
+    epa_normalized_variant_entropy,
+    ]}
+
+def compute_features(log, feature_set=None):
+    """
+    :param LogArrays log: Integer-encoded event-log.
+    :param list feature_set: Names of the features to compute. All features if None.
+    :return: dict mapping feature names to values.
+    """
+    return {feature: float(FEATURES[feature](log)) for feature in (feature_set or FEATURES)}
+
+class EventLogFeatures:
+    """
+    Extracts features of every .xes and .xes.gz file in input_path, a directory or a .zip or .tar
+    archive, in parallel across logs. The features of each log are saved as json and all of them in
+    output/features/<input>_feat.csv.
+
+    Config keys: input_path, output_path and optionally feature_params: {"feature_set": [...]} and
+    log_cache_path, shared with the benchmark.
+    """
+    def __init__(self, params=None, logs=None, ft_params=None):
+        start = dt.now()
+        print("=========================== EventLogFeatures =============================")
+        print(f"INFO: Running with {ft_params}")
+        self.params = ft_params
+        self.feature_set = ft_params.get(FEATURE_PARAMS, {}).get(FEATURE_SET)
+        unknown = set(self.feature_set or []) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"The features {sorted(unknown)} are not implemented. Available are {list(FEATURES)}.")
+
+        self.root_path = ft_params[INPUT_PATH]
+        if is_log_file(self.root_path):
+            self.root_path, event_logs = os.path.split(self.root_path)
+            event_logs = [event_logs]
+        else:
+            try:
+                event_logs = list_logs(self.root_path)
+            except FileNotFoundError:
+                print(f"        FAILED: Cannot find {self.root_path}")
+                return
+        self.filepath = get_features_path(ft_params[INPUT_PATH])
+        self.filename = os.path.split(self.filepath)[-1]
+
+        num_cores = min(multiprocessing.cpu_count(), len(event_logs)) or 1
+        print(f"INFO: Feature extraction starting at {start.strftime('%H:%M:%S')} using {num_cores} cores for {len(event_logs)} files...")
+        with multiprocessing.Pool(num_cores) as p:
+            features = p.map(self.extract_features, event_logs)
+
+        self.feat = pd.DataFrame([feature for feature in features if feature is not None])
+        os.makedirs(os.path.split(self.filepath)[0], exist_ok=True)
+        self.feat.to_csv(self.filepath, index=False)
+        print(f"SUCCESS: EventLogFeatures took {dt.now()-start} sec. for {len(self.feat)} event-logs. Saved features to {self.filepath}.")
+        print("========================= ~ EventLogFeatures =============================")
+
+    def get_dump_path(self):
+        return get_features_dump_path(self.params[INPUT_PATH], self.params[OUTPUT_PATH])
+
+    def extract_features(self, event_log):
+        log_name = strip_suffix(os.path.basename(event_log), LOG_SUFFIXES)
+        try:
+            log = LogArrays.from_columnar(load_event_log(os.path.join(self.root_path, event_log), self.params.get(LOG_CACHE_PATH)))
+        except Exception as e:
+            print(f"        FAILED: Cannot read {event_log}: {e}")
+            return None
+        features = {'log': log_name}
+        features.update(compute_features(log, self.feature_set))
+        dump_features_json(features, self.get_dump_path(), log_name)
+        return features
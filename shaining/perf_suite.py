@@ -0,0 +1,226 @@
+import argparse
+import json
+import numpy as np
+import os
+import platform
+import pm4py
+import sys
+import tempfile
+import time
+import warnings
+
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime as dt
+from io import StringIO
+
+"""
+Run using:
+python -m shaining.perf_suite [--baseline output/perf/baseline.json] [--save-baseline]
+
+"""
+
+from shaining.benchmark import METRIC_NAMES, PHASE_NAMES, init_worker
+from shaining.conformance import compute_conformance, AUTO
+from shaining.discovery import DiscoveryContext, MINER_ADAPTERS
+from shaining.shapley import ShapleyTask
+from shaining.task_pool import STATUS_OK
+from shaining.utils.columnar_log import ColumnarLog
+from shaining.utils.profiling import get_peak_rss_mb, reset_peak_rss
+from shaining.utils.results_store import ResultsStore
+from shaining.utils.synthetic_logs import write_synthetic_xes, RANDOM_SEED
+from utils.param_keys import OUTPUT_PATH
+from utils.param_keys.shain import METRICS_PATH, EVENTLOG_FEATURES, SHAPLEY_METHOD
+
+# (traces, variants) of the synthetic logs
+DEFAULT_LOG_SIZES = [(1000, 50), (10000, 200)]
+DEFAULT_MINERS = ['heuristics', 'inductive', 'imf', 'imd', 'ilp']
+# Numbers of features of the Shapley stage, and logs with all features set per table
+DEFAULT_FEATURES = [4, 8]
+SHAPLEY_LOGS = 50
+# Results stored and aggregated by the aggregation stage, as (logs, miners)
+AGGREGATION_TASKS = (1000, len(DEFAULT_MINERS))
+DEFAULT_REPEATS = 3
+# A stage regresses if it is this share slower than in the baseline, by at least MIN_REGRESSION sec.
+DEFAULT_THRESHOLD = 0.25
+MIN_REGRESSION = 0.05
+DEFAULT_RESULTS_PATH = os.path.join("output", "perf", "perf_results.json")
+
+@contextmanager
+def measure(results, stage, work=None, unit=None):
+    """
+    Records the duration and peak RSS of the enclosed stage under `stage` in `results`, and its
+    throughput if it processed `work` units. Yields the stage's record, e.g. to set its work once
+    it is known.
+    """
+    record = results.setdefault(stage, {'seconds': [], 'peak_rss_mb': 0})
+    if work is not None:
+        record['work'], record['unit'] = work, unit
+    reset_peak_rss()
+    start = time.perf_counter()
+    yield record
+    record['seconds'].append(time.perf_counter() - start)
+    record['peak_rss_mb'] = max(record['peak_rss_mb'], round(get_peak_rss_mb(), 1))
+
+def summarize(results):
+    """
+    Reduces the repeated durations of every stage to their median and adds the throughput.
+    """
+    summary = {}
+    for stage, record in results.items():
+        seconds = float(np.median(record['seconds']))
+        summary[stage] = {'seconds': round(seconds, 4), 'peak_rss_mb': record['peak_rss_mb']}
+        if 'work' in record:
+            summary[stage]['throughput'] = round(record['work']/seconds, 1) if seconds > 0 else None
+            summary[stage]['unit'] = f"{record['unit']}/s"
+        if 'method' in record:
+            summary[stage]['method'] = record['method']
+    return summary
+
+def run_log_stages(results, log_path, log_id, miners):
+    """
+    Times import, discovery inputs, discovery and alignments of every miner on one log.
+    """
+    with measure(results, f"import/{log_id}", os.path.getsize(log_path)/2**20, "MB"):
+        log = ColumnarLog.from_xes(log_path)
+    context = DiscoveryContext(log)
+    inputs = sorted({name for miner in miners for name in MINER_ADAPTERS[miner][1]})
+    with measure(results, f"inputs/{log_id}", len(log.codes), "events"):
+        context.prepare(inputs)
+    for miner in miners:
+        discover, _ = MINER_ADAPTERS[miner]
+        with measure(results, f"discovery_{miner}/{log_id}", len(log), "traces"):
+            net, im, fm = discover(context, **({'noise_threshold': 0.2} if miner == 'imf' else {}))
+        # Nets that are not easy sound, e.g. of the heuristics miner, fall back to token replay
+        with measure(results, f"alignments_{miner}/{log_id}") as record:
+            conformance = compute_conformance(log, net, im, fm, AUTO, None, variant_counts=context.variants)
+            record['work'], record['unit'] = conformance['alignments'] + conformance['replays'], "variants and prefixes"
+            record['method'] = f"{conformance['fitness_method']}/{conformance['precision_method']}"
+    # Released once all miners ran, so that no discovery timing includes rebuilding the EventLog
+    context.release()
+
+def run_aggregation_stage(results, tmp_dir, num_logs, miners):
+    """
+    Times storing one result per (log, miner) task and joining them into the benchmark table.
+    """
+    rng = np.random.default_rng(RANDOM_SEED)
+    db_path = os.path.join(tmp_dir, "results.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    logs = [f"log_{i}" for i in range(num_logs)]
+    with measure(results, "aggregation", num_logs*len(miners), "results"):
+        with ResultsStore(db_path) as store:
+            for log in logs:
+                for miner in miners:
+                    task_results = {f"{metric}_{miner}": float(rng.random()) for metric in METRIC_NAMES}
+                    task_results.update({f"{phase}time_{miner}": float(rng.random()) for phase in PHASE_NAMES})
+                    task_results[f"status_{miner}"] = STATUS_OK
+                    store.put(log, miner, None, task_results)
+            store.to_frame(miners, logs).to_csv(os.path.join(tmp_dir, "aggregation.csv"), index=False)
+
+def write_shapley_table(metrics_path, num_features, num_logs=SHAPLEY_LOGS):
+    """
+    Writes a benchmark table with every coalition of `num_logs` logs with `num_features` features,
+    named like generated logs, e.g. genEL1_101_nan_103.
+    """
+    rng = np.random.default_rng(RANDOM_SEED)
+    masks = np.arange(2**num_features)
+    rows = []
+    for log in range(num_logs):
+        values = [str(101 + log*num_features + feature) for feature in range(num_features)]
+        for mask in masks[1:]:
+            name = "_".join(values[f] if (mask >> f) & 1 else "nan" for f in range(num_features))
+            rows.append(f"genEL{log}_{name}," + ",".join(f"{value:.4f}" for value in rng.random(3)))
+    with open(metrics_path, "w") as f:
+        f.write("log,fitness_inductive,precision_inductive,time_inductive\n" + "\n".join(rows) + "\n")
+    return len(rows)
+
+def run_shapley_stage(results, tmp_dir, num_features):
+    metrics_path = os.path.join(tmp_dir, f"shapley{num_features}_benchmark.csv")
+    num_rows = write_shapley_table(metrics_path, num_features)
+    params = {METRICS_PATH: metrics_path, EVENTLOG_FEATURES: [f"feature{f}" for f in range(num_features)],
+              OUTPUT_PATH: tmp_dir, SHAPLEY_METHOD: 'exact'}
+    with measure(results, f"shapley/{num_features}features", num_rows, "coalitions"), redirect_stdout(StringIO()):
+        ShapleyTask(params)
+
+def run_suite(log_sizes=DEFAULT_LOG_SIZES, miners=DEFAULT_MINERS, features=DEFAULT_FEATURES, repeats=DEFAULT_REPEATS):
+    """
+    Runs every stage `repeats` times on synthetic inputs.
+
+    :return: dict with the environment and, per stage, the median seconds, peak RSS in MB and throughput.
+    """
+    init_worker()
+    warnings.filterwarnings("ignore")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_paths = {}
+        for num_traces, num_variants in log_sizes:
+            log_id = f"{num_traces}traces_{num_variants}variants"
+            log_paths[log_id] = os.path.join(tmp_dir, f"{log_id}.xes")
+            write_synthetic_xes(log_paths[log_id], num_traces, num_variants)
+        for repeat in range(repeats):
+            print(f"INFO: Performance suite run {repeat+1} of {repeats}...")
+            for log_id, log_path in log_paths.items():
+                with redirect_stdout(StringIO()):
+                    run_log_stages(results, log_path, log_id, miners)
+            run_aggregation_stage(results, tmp_dir, AGGREGATION_TASKS[0], miners)
+            for num_features in features:
+                run_shapley_stage(results, tmp_dir, num_features)
+    return {'created': dt.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'pm4py': pm4py.__version__, 'machine': platform.node(), 'cpus': os.cpu_count(),
+            'repeats': repeats, 'stages': summarize(results)}
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    :return: list of (stage, seconds, baseline seconds) of the stages that are more than
+        `threshold` and MIN_REGRESSION seconds slower than in `baseline`. Stages missing in the
+        baseline or computed with another conformance method are not compared.
+    """
+    regressions = []
+    for stage, record in results['stages'].items():
+        if stage not in baseline['stages'] or record.get('method') != baseline['stages'][stage].get('method'):
+            continue
+        seconds, baseline_seconds = record['seconds'], baseline['stages'][stage]['seconds']
+        if seconds > baseline_seconds*(1+threshold) and seconds - baseline_seconds > MIN_REGRESSION:
+            regressions.append((stage, seconds, baseline_seconds))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times the stages of the SHAining pipeline on synthetic event-logs.")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH, help="Path of the json results")
+    parser.add_argument("--baseline", help="json results of an earlier run to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Also saves the results to --baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Share a stage may be slower than in the baseline, e.g. 0.25")
+    parser.add_argument("--traces", type=int, nargs="+", default=[size[0] for size in DEFAULT_LOG_SIZES])
+    parser.add_argument("--variants", type=int, nargs="+", default=[size[1] for size in DEFAULT_LOG_SIZES])
+    parser.add_argument("--miners", nargs="+", default=DEFAULT_MINERS, choices=list(MINER_ADAPTERS))
+    parser.add_argument("--features", type=int, nargs="+", default=DEFAULT_FEATURES)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args()
+    if len(args.traces) != len(args.variants):
+        raise ValueError(f"--traces and --variants need the same number of values, but got {args.traces} and {args.variants}.")
+
+    start = dt.now()
+    print("=========================== PerfSuite =============================")
+    results = run_suite(list(zip(args.traces, args.variants)), args.miners, args.features, args.repeats)
+    for stage, record in results['stages'].items():
+        throughput = f", {record['throughput']} {record['unit']}" if 'throughput' in record else ""
+        print(f"    {stage}: {record['seconds']:.3f} sec, {record['peak_rss_mb']} MB peak RSS{throughput}")
+    os.makedirs(os.path.split(args.output)[0] or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"SUCCESS: Performance suite took {dt.now()-start} sec. Saved results to {args.output}.")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"SUCCESS: Saved baseline to {args.baseline}.")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        for stage, seconds, baseline_seconds in regressions:
+            print(f"FAILED: {stage} took {seconds:.3f} sec, {seconds/baseline_seconds-1:.0%} slower than {baseline_seconds:.3f} sec in {args.baseline}.")
+        if regressions:
+            sys.exit(1)
+        print(f"SUCCESS: No stage is more than {args.threshold:.0%} slower than in {args.baseline}.")
+    print("========================= ~ PerfSuite =============================")
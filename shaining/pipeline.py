@@ -0,0 +1,142 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+from datetime import datetime as dt
+from shaining.utils.artifact_cache import ArtifactCache
+from shaining.utils.io_helpers import get_content_dir
+from shaining.utils.log_archive import is_log_file, strip_suffix, ARCHIVE_SUFFIXES
+from shaining.work_queue import WORKER
+from utils.param_keys import INPUT_PATH, OUTPUT_PATH, PIPELINE_STEP
+from utils.param_keys.benchmark import MINERS, WORK_QUEUE
+from utils.param_keys.shain import METRICS_PATH, FEATURES_PATH
+
+"""
+The steps of a configuration form a DAG. A step depends on every earlier step that writes a file
+it reads or writes, or reads a file it writes, and runs as soon as these finished. Steps without
+declared files, e.g. evaluation_plotter, wait for all earlier steps and all later steps wait for them.
+"""
+
+DEFAULT_JOBS = 4
+DEFAULT_ARTIFACT_PATH = os.path.join("output", "artifacts")
+# Code and packages that compute the outputs of the steps, part of every artifact key
+SOURCE_PATHS = ["shaining", "utils", "miners"]
+SOURCE_PACKAGES = ["pm4py", "numpy", "pandas"]
+
+def get_benchmark_path(input_path):
+    return os.path.join("output", "benchmark", strip_suffix(os.path.split(input_path)[-1]) + '_benchmark.csv')
+
+def get_benchmark_dump_path(input_path, output_path, miners):
+    dump_path = os.path.join(output_path, os.path.join(*os.path.normpath(input_path).split(os.path.sep)[1:]))
+    if is_log_file(dump_path):
+        dump_path = os.path.split(dump_path)[0]
+        if len(miners) == 1:
+            dump_path = dump_path + f"_{miners[0]}"
+    return strip_suffix(dump_path, ARCHIVE_SUFFIXES)
+
+def get_features_path(input_path):
+    return os.path.join("output", "features", strip_suffix(os.path.split(input_path)[-1]) + '_feat.csv')
+
+def get_features_dump_path(input_path, output_path):
+    input_path = os.path.normpath(input_path)
+    if is_log_file(input_path):
+        input_path = os.path.split(input_path)[0]
+    return strip_suffix(os.path.join(output_path, *input_path.split(os.path.sep)[1:]), ARCHIVE_SUFFIXES)
+
+def get_shapley_path(metrics_path, output_path):
+    name = os.path.split(metrics_path)[-1].rsplit(".", 1)[0].replace("_benchmark", "")
+    return os.path.join(get_content_dir(output_path, "shaining"), f"{name}_shap.csv")
+
+# Config keys of the paths a step reads, and the files and directories it writes given its params.
+# Benchmark directories hold the per-log json, results.db and trace.jsonl of incremental runs.
+STEP_INPUTS = {
+    'benchmark_test': [INPUT_PATH],
+    'feature_extraction': [INPUT_PATH],
+    'shaining_task': [METRICS_PATH, FEATURES_PATH],
+    }
+STEP_OUTPUTS = {
+    'benchmark_test': lambda params: [get_benchmark_path(params[INPUT_PATH]), get_content_dir(
+        get_benchmark_dump_path(params[INPUT_PATH], params[OUTPUT_PATH], params.get(MINERS, [])), "benchmark")],
+    'feature_extraction': lambda params: [get_features_path(params[INPUT_PATH]), get_content_dir(
+        get_features_dump_path(params[INPUT_PATH], params[OUTPUT_PATH]), "features")],
+    'shaining_task': lambda params: [get_shapley_path(params[METRICS_PATH], params[OUTPUT_PATH])],
+    }
+# Files in the output directories that are not results: the results store of a benchmark, which
+# incremental runs and work queues keep updating, and its trace. They are never cached or restored.
+UNCACHED_FILES = ("results.db", "results.db-wal", "results.db-shm", "results.db-journal", "trace.jsonl")
+
+def get_step_files(params):
+    """
+    :return: Tuple of the sets of paths the step reads and writes, or None if they are not known,
+        e.g. for work queue workers, which write to the results store of their coordinator.
+    """
+    step = params.get(PIPELINE_STEP)
+    if step not in STEP_OUTPUTS or params.get(WORK_QUEUE) == WORKER:
+        return None
+    inputs = {os.path.normpath(params[key]) for key in STEP_INPUTS[step] if params.get(key)}
+    return inputs, {os.path.normpath(path) for path in STEP_OUTPUTS[step](params)}
+
+def get_dependencies(model_params_list):
+    """
+    :return: list with the set of indices of the earlier steps every step depends on.
+    """
+    files = [get_step_files(params) for params in model_params_list]
+    dependencies = []
+    for i, step_files in enumerate(files):
+        dependencies.append({j for j in range(i) if step_files is None or files[j] is None
+                             or files[j][1] & (step_files[0] | step_files[1]) or files[j][0] & step_files[1]})
+    return dependencies
+
+def run_pipeline(model_params_list, run_step, jobs=DEFAULT_JOBS, artifact_path=DEFAULT_ARTIFACT_PATH):
+    """
+    Runs every step once the steps it depends on finished, at most `jobs` at a time in separate
+    processes. Steps whose params and input files did not change since an earlier run restore their
+    outputs from the artifact cache instead of running.
+
+    :param run_step: Picklable function that runs the step of the params passed to it.
+    :param str artifact_path: Directory of the artifact cache, or None to run every step.
+    """
+    dependencies = get_dependencies(model_params_list)
+    cache = ArtifactCache(artifact_path) if artifact_path else None
+    pending, running, done = list(range(len(model_params_list))), {}, set()
+    keys, starts = {}, {}
+    sources = cache.hash_sources(SOURCE_PATHS, SOURCE_PACKAGES) if cache is not None else None
+
+    def finish(i):
+        done.add(i)
+        params = model_params_list[i]
+        step_files = get_step_files(params)
+        if keys.get(i) is None or step_files is None:
+            return
+        # Steps that failed print so and leave their tables of earlier runs, which are not stored
+        tables = [path for path in step_files[1] if not os.path.isdir(path)]
+        if all(os.path.isfile(path) and os.path.getmtime(path) >= starts[i] for path in tables):
+            cache.put(keys[i], params, sorted(step_files[1]), exclude=UNCACHED_FILES)
+
+    with cache or nullcontext(), ProcessPoolExecutor(jobs) if jobs > 1 and len(pending) > 1 else nullcontext() as executor:
+        while pending or running:
+            for i in [i for i in pending if dependencies[i] <= done]:
+                pending.remove(i)
+                params = model_params_list[i]
+                step_files = get_step_files(params)
+                if cache is not None and step_files is not None:
+                    keys[i] = cache.get_key(params, step_files[0], sources)
+                    restored = cache.restore(keys[i]) if keys[i] is not None else None
+                    if restored is not None:
+                        print(f"INFO: Reusing {len(restored)} files of {params[PIPELINE_STEP]} from {artifact_path},"
+                              f" its params, inputs and code did not change.")
+                        done.add(i)
+                        continue
+                # File times have a coarser resolution than the clock
+                starts[i] = dt.now().timestamp() - 1
+                if executor is None:
+                    run_step(params)
+                    finish(i)
+                else:
+                    running[executor.submit(run_step, params)] = i
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = running.pop(future)
+                    future.result()
+                    finish(i)
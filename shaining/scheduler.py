@@ -0,0 +1,133 @@
+import os
+import pandas as pd
+
+# Relative cost of a miner per byte of event-log, used when no past timings are available.
+DEFAULT_MINER_WEIGHTS = {'ilp': 4.0, 'sm1': 2.0, 'sm2': 2.0}
+
+# Peak RSS of a task in MB per MB of event-log, used until the first task of a miner finished.
+DEFAULT_MEMORY_RATIO = 8.0
+# Peak RSS of a task in MB per million events, used for logs with a known number of events.
+DEFAULT_EVENT_MEMORY_RATIO = 2000.0
+
+def load_task_metric(benchmark_csv, metric):
+    """
+    Reads a past per-(log, miner) metric from a previous benchmark result.
+
+    :param str benchmark_csv: Path to a `*_benchmark.csv` written by BenchmarkTest.
+    :param str metric: Metric name, i.e. the column prefix before `_{miner}`.
+    :return: dict mapping (log, miner) to the metric. Empty if there is no previous run.
+    """
+    if benchmark_csv is None or not os.path.isfile(benchmark_csv):
+        return {}
+    df = pd.read_csv(benchmark_csv)
+    values = {}
+    for col in df.columns:
+        if not col.startswith(f"{metric}_"):
+            continue
+        miner = col[len(f"{metric}_"):]
+        for log, value in zip(df['log'], df[col]):
+            if pd.notna(value):
+                values[(str(log), miner)] = float(value)
+    return values
+
+def load_task_timings(benchmark_csv):
+    """
+    Reads past per-(log, miner) timings in seconds from a previous benchmark result.
+    """
+    return load_task_metric(benchmark_csv, "time")
+
+def estimate_task_costs(tasks, log_sizes, timings=None):
+    """
+    Estimates the cost in seconds of (log, miner) tasks.
+
+    Tasks with a past timing use it directly. Otherwise the cost is the log size times the
+    miner's seconds per byte seen in past runs, or times a default miner weight if the miner
+    has no history.
+
+    :param list tasks: List of (log_name, miner) tuples.
+    :param dict log_sizes: Maps log_name to its size in bytes.
+    :param dict timings: Past timings as returned by `load_task_timings`.
+    :return: dict mapping each task to its estimated cost.
+    """
+    timings = timings or {}
+    miner_time, miner_size = {}, {}
+    for (log, miner), time in timings.items():
+        if log in log_sizes:
+            miner_time[miner] = miner_time.get(miner, 0) + time
+            miner_size[miner] = miner_size.get(miner, 0) + log_sizes[log]
+    total_size = sum(miner_size.values())
+    default_rate = sum(miner_time.values())/total_size if total_size > 0 else 1.0
+
+    costs = {}
+    for log, miner in tasks:
+        if (log, miner) in timings:
+            costs[(log, miner)] = timings[(log, miner)]
+        elif miner_size.get(miner, 0) > 0:
+            costs[(log, miner)] = log_sizes.get(log, 0) * miner_time[miner]/miner_size[miner]
+        else:
+            costs[(log, miner)] = log_sizes.get(log, 0) * default_rate * DEFAULT_MINER_WEIGHTS.get(miner, 1.0)
+    return costs
+
+def order_tasks(tasks, log_sizes, timings=None):
+    """
+    Orders tasks largest-first, so that the most expensive runs start early and
+    stragglers overlap with the remaining short tasks.
+    """
+    costs = estimate_task_costs(tasks, log_sizes, timings)
+    return sorted(tasks, key=lambda task: costs[task], reverse=True)
+
+class MemoryEstimator:
+    """
+    Estimates the peak RSS of (log, miner) tasks for memory-aware admission in TaskPool.
+
+    A task's peak is the RSS of its worker before the task plus the log's number of events times a
+    per-miner ratio. The ratio starts at DEFAULT_EVENT_MEMORY_RATIO and is replaced by the largest
+    ratio observed in finished tasks of that miner. The number of events does not depend on
+    compression or on the size of the attributes of an event, unlike the size of the file. Events
+    are counted by the workers while they load a log, so a log's first task is estimated from the
+    size of its file, with ratios from DEFAULT_MEMORY_RATIO that are learned from all tasks.
+    Peaks recorded by a previous run are used as a lower bound.
+
+    :param dict log_sizes: Maps log_name to its size in bytes.
+    :param dict past_peaks: Maps (log, miner) to peak RSS in MB, e.g. from `load_task_metric(csv, "peakrss")`.
+    :param dict log_events: Maps log_name to its number of events, if known before the tasks run.
+    """
+    def __init__(self, log_sizes, past_peaks=None, log_events=None):
+        self.log_sizes = log_sizes
+        self.past_peaks = past_peaks or {}
+        self.log_events = log_events if log_events is not None else {}
+        self.ratios = {}
+        self.event_ratios = {}
+
+    def get_size_mb(self, task):
+        return self.log_sizes.get(task[0], 0)/2**20
+
+    def get_work(self, task):
+        """
+        :return: Tuple of the ratios of the task's unit, the unit's default ratio and the amount of
+            work, in millions of events or MB of event-log.
+        """
+        if task[0] in self.log_events:
+            return self.event_ratios, DEFAULT_EVENT_MEMORY_RATIO, self.log_events[task[0]]/1e6
+        return self.ratios, DEFAULT_MEMORY_RATIO, self.get_size_mb(task)
+
+    def estimate(self, task, rss_before):
+        ratios, default_ratio, work = self.get_work(task)
+        return max(rss_before + ratios.get(task[1], default_ratio)*work, self.past_peaks.get(task, 0))
+
+    def observe(self, task, rss_before, peak, num_events=None):
+        """
+        Learns the ratios of the task's miner from its measured peak.
+
+        :param int num_events: Number of events of the task's log, as reported by its worker.
+        """
+        if peak is None:
+            return
+        if num_events is not None:
+            self.log_events[task[0]] = num_events
+        # Both units learn from every task, as logs are estimated by size until their events are known
+        for ratios, work in [(self.ratios, self.get_size_mb(task)),
+                             (self.event_ratios, self.log_events.get(task[0], 0)/1e6)]:
+            if work > 0:
+                ratio = max(peak - rss_before, 0)/work
+                ratios[task[1]] = max(ratios.get(task[1], 0), ratio)
@@ -0,0 +1,356 @@
+import os
+import pandas as pd
+import numpy as np
+
+from datetime import datetime as dt
+from math import factorial
+from shaining.pipeline import get_shapley_path
+from utils.param_keys import OUTPUT_PATH
+from utils.param_keys.shain import METRICS_PATH, EVALUATION_METRICS, EVENTLOG_FEATURES, METHODS
+from utils.param_keys.shain import SHAPLEY_METHOD, SAMPLE_BUDGET, TOLERANCE
+
+MISSING_FEATURE = 'nan'
+RANDOM_SEED = 10
+# 'auto' switches from exact to sampled Shapley values above this number of features
+EXACT_MAX_FEATURES = 15
+DEFAULT_SAMPLE_BUDGET = 2000
+DEFAULT_TOLERANCE = 0.01
+# Antithetic permutation pairs sampled per log between two convergence checks
+BATCH_SIZE = 50
+CONFIDENCE_Z = 1.96
+# Coalition values held in memory at once by the exact computation
+MAX_CHUNK_VALUES = 5e7
+# Missing coalitions named in the report
+MISSING_EXAMPLES = 5
+
+def normalize_log_names(logs):
+    """
+    Turns benchmark log names into feature value names, as in notebooks/calculate_shapely.ipynb:
+    'genEL12_713_047_00' becomes '713_047_000'. A trailing '00' becomes '000', so that it stays
+    distinguishable from a '00' value of an earlier feature.
+
+    :param pd.Series logs: Log names of a benchmark table.
+    :return: pd.Series with one '_'-separated value per feature, 'nan' for features not set.
+    """
+    logs = logs.astype(str).str.replace(r'00$', '000', regex=True)
+    logs = logs.str.replace(r'(genELtask)_(\d+)', r'\1\2', regex=True)
+    return logs.str.split('_', n=1).str[1]
+
+def get_subset_weights(num_features):
+    """
+    Weight |S|!(n-|S|-1)!/n! of the marginal contribution to a coalition S of each size |S|.
+    """
+    return np.array([factorial(size)*factorial(num_features-size-1)/factorial(num_features)
+                     for size in range(num_features)])
+
+def get_popcounts(num_features):
+    """
+    Number of features in each coalition, indexed by the coalition's bitmask.
+    """
+    masks = np.arange(2**num_features)
+    return np.array([bin(mask).count("1") for mask in masks])
+
+def exact_shapley_values(coalition_values):
+    """
+    Exact Shapley values with the subset formula.
+
+    Coalitions are indexed by bitmask, bit i being set if feature i is part of the coalition. All
+    leading axes are batched, e.g. logs and metric columns, so one call computes every value.
+
+    :param np.ndarray coalition_values: Array of shape (..., 2**n) with the value of every coalition.
+        The value of the empty coalition (index 0) is the baseline.
+    :return: np.ndarray of shape (..., n) with the Shapley value of each feature.
+    """
+    num_features = int(np.log2(coalition_values.shape[-1]))
+    masks = np.arange(2**num_features)
+    weights = get_subset_weights(num_features)
+    popcounts = get_popcounts(num_features)
+    shapley_values = np.empty(coalition_values.shape[:-1] + (num_features,))
+    for feature in range(num_features):
+        without = masks[(masks >> feature) & 1 == 0]
+        marginal = coalition_values[..., without | (1 << feature)] - coalition_values[..., without]
+        shapley_values[..., feature] = marginal @ weights[popcounts[without]]
+    return shapley_values
+
+def sample_shapley_values(get_values, num_logs, num_features, budget=DEFAULT_SAMPLE_BUDGET,
+                          tolerance=None, scale=None, seed=RANDOM_SEED):
+    """
+    Approximates Shapley values by sampling feature permutations, independently for every log.
+
+    Every permutation is paired with its reverse (antithetic sampling), which lowers the variance
+    for the same number of coalitions. Sampling stops once `budget` permutations per log were
+    drawn, or earlier once the confidence interval of every mean over the logs is narrower than
+    `tolerance` times `scale`.
+
+    :param callable get_values: Maps an int array of coalition bitmasks of shape (logs, ...) to
+        their values, of shape (logs, ..., columns).
+    :param int budget: Maximum number of permutations per log. Has to be even, as permutations are
+        drawn in pairs.
+    :param float tolerance: Target half-width of the 95% confidence intervals, relative to `scale`.
+        None always uses the whole budget.
+    :param np.ndarray scale: Magnitude of each column, shape (columns,).
+    :return: Tuple of the estimates of shape (logs, columns, features), their standard errors of the
+        same shape, and the number of permutations drawn per log.
+    """
+    if budget < 2 or budget % 2:
+        raise ValueError(f"The parameter `{SAMPLE_BUDGET}` has to be an even number of at least 2, but it's {budget}.")
+    rng = np.random.default_rng(seed)
+    total = total_squares = None
+    num_pairs = 0
+    while 2*num_pairs < budget:
+        batch = min(BATCH_SIZE, budget//2 - num_pairs)
+        permutations = rng.permuted(np.tile(np.arange(num_features), (num_logs, batch, 1)), axis=-1)
+        samples = 0
+        for order in (permutations, permutations[..., ::-1]):
+            after = np.bitwise_or.accumulate(1 << order, axis=-1)
+            before = np.concatenate([np.zeros_like(after[..., :1]), after[..., :-1]], axis=-1)
+            marginal = get_values(after) - get_values(before)
+            contributions = np.empty_like(marginal)
+            np.put_along_axis(contributions, order[..., None], marginal, axis=2)
+            samples = samples + contributions/2
+        # samples: (logs, pairs, features, columns)
+        if total is None:
+            total, total_squares = samples.sum(axis=1), (samples**2).sum(axis=1)
+        else:
+            total, total_squares = total + samples.sum(axis=1), total_squares + (samples**2).sum(axis=1)
+        num_pairs += batch
+
+        estimates = total/num_pairs
+        variances = np.maximum(total_squares/num_pairs - estimates**2, 0)*num_pairs/max(num_pairs-1, 1)
+        errors = np.sqrt(variances/num_pairs)
+        if tolerance is not None and num_pairs > 1:
+            mean_errors = np.sqrt((errors**2).sum(axis=0))/num_logs
+            if np.all(CONFIDENCE_Z*mean_errors <= tolerance*scale):
+                break
+    return estimates.transpose(0, 2, 1), errors.transpose(0, 2, 1), 2*num_pairs
+
+class CoalitionIndex:
+    """
+    Index of the coalitions in a benchmark table.
+
+    Every log name is parsed once into a tuple of feature value codes and a bitmask of the
+    features that are set, e.g. genEL1_214_nan_084 into (0, -1, 0) and 0b101. Looking up the
+    coalitions of all logs with every feature set is then one vectorized join instead of a scan
+    of the table per log. Of several rows with the same name, the last one is used.
+
+    :param log_names: Log names of the benchmark table.
+    :param int num_features: Number of feature values encoded in each log name.
+    """
+    def __init__(self, log_names, num_features):
+        self.num_features = num_features
+        names = normalize_log_names(pd.Series(log_names)).fillna('')
+        valid = (names.str.count('_') == num_features-1) & (names != '')
+        self.num_ignored = int((~valid).sum())
+
+        tokens = names[valid].str.split('_', expand=True)
+        rows = np.flatnonzero(valid.to_numpy())
+        codes = np.empty((len(rows), num_features), dtype=np.int64)
+        self.feature_values = []
+        for feature in range(num_features):
+            column = tokens[feature].to_numpy()
+            codes[:, feature], uniques = pd.factorize(column)
+            codes[column == MISSING_FEATURE, feature] = -1
+            self.feature_values.append(np.asarray(uniques, dtype=object))
+        self.radix = [len(uniques)+1 for uniques in self.feature_values]
+
+        keys = self.encode(codes)
+        last = ~pd.Index(keys).duplicated(keep='last')
+        self.keys, self.rows, codes = pd.Index(keys[last]), rows[last], codes[last]
+        self.masks = np.unique(((codes >= 0).astype(np.int64) << np.arange(num_features)).sum(axis=1))
+        full = (codes >= 0).all(axis=1)
+        self.full_rows, self.full_codes = self.rows[full], codes[full]
+
+    def encode(self, codes):
+        """
+        Encodes rows of feature value codes into hashable keys, one int per row if they fit.
+        """
+        if np.prod([float(radix) for radix in self.radix]) < 2**62:
+            multipliers = np.cumprod([1] + self.radix[:-1]).astype(np.int64)
+            return (codes+1) @ multipliers
+        keys = np.empty(len(codes), dtype=object)
+        keys[:] = [tuple(row) for row in codes]
+        return keys
+
+    def __len__(self):
+        return len(self.full_rows)
+
+    def get_names(self):
+        """
+        Returns the feature value names of the logs with every feature set, e.g. '713_047_084'.
+        """
+        return [self.get_coalition_name(i, 2**self.num_features-1) for i in range(len(self))]
+
+    def get_coalition_name(self, log, mask):
+        return '_'.join(self.feature_values[feature][code] if (mask >> feature) & 1 else MISSING_FEATURE
+                        for feature, code in enumerate(self.full_codes[log]))
+
+    def lookup(self, masks, logs=None):
+        """
+        Joins the logs with every feature set to the rows of their coalitions.
+
+        :param np.ndarray masks: Coalition bitmasks of shape (logs, ...), one row per log with every
+            feature set.
+        :param np.ndarray logs: Positions of the logs of the rows of `masks`. All logs if None.
+        :return: Array of the same shape with the table row of every coalition, -1 if it is missing
+            and for the empty coalition.
+        """
+        bits = (masks[..., None] >> np.arange(self.num_features)) & 1
+        full_codes = self.full_codes if logs is None else self.full_codes[logs]
+        full_codes = full_codes.reshape((len(full_codes),) + (1,)*(masks.ndim-1) + (self.num_features,))
+        query = np.where(bits == 1, full_codes, -1).reshape(-1, self.num_features)
+        positions = self.keys.get_indexer(self.encode(query))
+        rows = np.where(positions >= 0, self.rows[positions], -1).reshape(masks.shape)
+        rows[masks == 0] = -1
+        return rows
+
+    def count_missing(self):
+        """
+        Counts the missing non-empty coalitions of every log with every feature set. Only the
+        bitmasks of rows in the table can be present, so not all 2^n coalitions are looked up.
+
+        :return: int64 array with the number of missing coalitions per log.
+        """
+        present = np.zeros(len(self), dtype=np.int64)
+        for mask in self.masks[self.masks > 0]:
+            present += self.lookup(np.full((len(self), 1), mask))[:, 0] >= 0
+        return 2**self.num_features-1 - present
+
+    def find_missing(self, log, chunk=2**16):
+        """
+        Returns the smallest bitmask of a missing coalition of a log, None if none is missing.
+        """
+        for start in range(1, 2**self.num_features, chunk):
+            masks = np.arange(start, min(start+chunk, 2**self.num_features))
+            missing = masks[self.lookup(masks[None], np.array([log]))[0] == -1]
+            if len(missing) > 0:
+                return int(missing[0])
+        return None
+
+class ShapleyTask:
+    """
+    Computes the impact of event-log features on the metrics of a benchmark table with Shapley values.
+
+    Every log name encodes one value per feature, e.g. genEL10_713_047_084 for three features,
+    with 'nan' for features that were not set when generating the log. The players are the
+    features, and the value of a coalition is the metric of the log that has only the coalition's
+    features set to the values of a log with all features set. The Shapley values of all logs
+    with all features set are averaged per metric and miner.
+
+    Config keys: metrics_path, eventlog_features (in the order of the values in the log names),
+    output_path and optionally evaluation_metrics and methods to select columns.
+
+    With shapley_method 'sampling', or 'auto' above EXACT_MAX_FEATURES features, the values are
+    approximated by permutation sampling with at most sample_budget permutations per log. Sampling
+    stops early once every 95% confidence interval is narrower than tolerance times the standard
+    deviation of its column. The standard errors are saved next to the values as {feature}_se.
+    """
+    def __init__(self, params):
+        start = dt.now()
+        print("=========================== ShapleyTask =============================")
+        print(f"INFO: Running with {params}")
+        self.params = params
+        self.feature_names = params[EVENTLOG_FEATURES]
+
+        benchmark = pd.read_csv(params[METRICS_PATH])
+        columns = self.get_metric_columns(benchmark)
+        self.shapley_values, self.standard_errors, self.full_logs = self.compute(benchmark, columns)
+        self.results = pd.DataFrame(np.mean(self.shapley_values, axis=0), columns=self.feature_names)
+        if self.standard_errors is not None:
+            # Standard error of the mean over independently sampled logs
+            mean_errors = np.sqrt((self.standard_errors**2).sum(axis=0))/len(self.full_logs)
+            for i, feature in enumerate(self.feature_names):
+                self.results.insert(2*i+1, f"{feature}_se", mean_errors[:, i])
+        self.results[['metric', 'miner']] = pd.Series(columns).str.split('_', n=1, expand=True)
+
+        self.filepath = self.get_output_path()
+        os.makedirs(os.path.split(self.filepath)[0], exist_ok=True)
+        self.results.to_csv(self.filepath, index=False)
+        print(f"SUCCESS: ShapleyTask took {dt.now()-start} sec. for {len(columns)} metrics, "+\
+              f"{len(self.feature_names)} features and {len(self.full_logs)} logs. Saved Shapley values to {self.filepath}.")
+        print("========================= ~ ShapleyTask =============================")
+
+    def get_output_path(self):
+        return get_shapley_path(self.params[METRICS_PATH], self.params[OUTPUT_PATH])
+
+    def get_metric_columns(self, benchmark):
+        """
+        Returns the numeric metric_miner columns, filtered by evaluation_metrics and methods if given.
+        """
+        columns = []
+        for col in benchmark.select_dtypes(include="number").columns:
+            if '_' not in col:
+                continue
+            metric, miner = col.split('_', 1)
+            if self.params.get(EVALUATION_METRICS) and metric not in self.params[EVALUATION_METRICS]:
+                continue
+            if self.params.get(METHODS) and miner not in self.params[METHODS]:
+                continue
+            columns.append(col)
+        return columns
+
+    def get_method(self):
+        method = self.params.get(SHAPLEY_METHOD, 'exact')
+        if method == 'auto':
+            return 'exact' if len(self.feature_names) <= EXACT_MAX_FEATURES else 'sampling'
+        if method not in ('exact', 'sampling'):
+            raise ValueError(f"The parameter `{SHAPLEY_METHOD}` has to be 'exact', 'sampling' or 'auto', but it's {method}.")
+        return method
+
+    def compute(self, benchmark, columns):
+        """
+        Builds the coalition values of every log with all features set and computes their Shapley
+        values for all columns at once.
+
+        :return: Tuple of an array of shape (logs, columns, features), the standard errors of the
+            same shape or None for exact values, and the names of these logs.
+        """
+        num_features = len(self.feature_names)
+        values = benchmark[columns].replace(-1, np.nan)
+        values = values.fillna(values.mean()).to_numpy(dtype=float)
+
+        index = CoalitionIndex(benchmark['log'], num_features)
+        if index.num_ignored > 0:
+            print(f"INFO: Ignoring {index.num_ignored} logs whose names do not have {num_features} feature values.")
+        def get_values(rows):
+            # The empty and missing coalitions are worth 0
+            return np.where(rows[..., None] >= 0, values[rows], 0)
+
+        if self.get_method() == 'exact':
+            masks = np.arange(2**num_features)
+            coalition_rows = index.lookup(np.tile(masks, (len(index), 1)))
+            is_missing = (coalition_rows == -1) & (masks > 0)
+            examples = [(log, mask) for log, mask in zip(*np.nonzero(is_missing))][:MISSING_EXAMPLES]
+            self.report_missing(index, is_missing.sum(axis=1), examples)
+            # Coalitions are (logs, columns, masks), computed in chunks of logs to bound memory
+            chunk = max(1, int(MAX_CHUNK_VALUES // (len(masks)*max(len(columns), 1))))
+            shapley_values = np.concatenate(
+                [exact_shapley_values(get_values(coalition_rows[i:i+chunk]).transpose(0, 2, 1))
+                 for i in range(0, len(index), chunk)]
+                ) if len(index) > 0 else np.empty((0, len(columns), num_features))
+            return shapley_values, None, index.get_names()
+
+        # Reported before sampling, as the exact mode does, rather than for the sampled coalitions only
+        missing = index.count_missing()
+        self.report_missing(index, missing, [(log, index.find_missing(log))
+                                             for log in np.flatnonzero(missing)[:MISSING_EXAMPLES]])
+        def get_sampled_values(masks):
+            return get_values(index.lookup(masks))
+        scale = np.nan_to_num(np.nanstd(values, axis=0), nan=1.0)
+        shapley_values, errors, num_permutations = sample_shapley_values(
+            get_sampled_values, len(index), num_features, self.params.get(SAMPLE_BUDGET, DEFAULT_SAMPLE_BUDGET),
+            self.params.get(TOLERANCE, DEFAULT_TOLERANCE), np.where(scale > 0, scale, 1.0))
+        print(f"INFO: Sampled {num_permutations} permutations per log.")
+        return shapley_values, errors, index.get_names()
+
+    def report_missing(self, index, missing, examples):
+        """
+        Prints the number of missing coalitions once, with a few examples.
+
+        :param np.ndarray missing: Number of missing non-empty coalitions per log.
+        :param list examples: (log, bitmask) tuples of missing coalitions.
+        """
+        if missing.sum() == 0:
+            return
+        names = list(dict.fromkeys(index.get_coalition_name(log, mask) for log, mask in examples))
+        print(f"INFO: {missing.sum()} coalitions of {np.count_nonzero(missing)} logs are missing in "+\
+              f"{self.params[METRICS_PATH]} and count as 0, e.g. {', '.join(names)}.")
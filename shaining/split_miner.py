@@ -0,0 +1,105 @@
+import base64
+import os
+import subprocess
+import time
+
+from shaining.task_pool import report_service
+
+SERVICE_PROVIDER = "au.edu.unimelb.services.ServiceProvider"
+SERVICE_SOURCE = os.path.join("miners", "SplitMinerService.java")
+
+# One JVM per Split Miner version and worker process, started on first use
+_services = {}
+_unavailable = set()
+
+def get_classpath(version):
+    if version == 2.0:
+        return f"{os.getcwd()}/miners/split-miner-2.0/sm2.jar:{os.getcwd()}/miners/split-miner-2.0/lib/*"
+    return f"{os.getcwd()}/miners/splitminer/splitminer.jar:{os.getcwd()}/miners/splitminer/lib/*"
+
+class SplitMinerService:
+    """
+    Long-lived JVM running miners/SplitMinerService.java, which loads Split Miner once and
+    discovers one model per request, so JVM startup and classpath loading are paid once per worker.
+
+    :param float version: Split Miner version, 1.0 or 2.0.
+    """
+    def __init__(self, version):
+        self.version = version
+        self.process = subprocess.Popen(
+            ["java", "-cp", get_classpath(version), os.path.join(os.getcwd(), SERVICE_SOURCE)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        if self.process.stdout.readline().strip() != "READY":
+            self.close()
+            raise OSError(f"SplitMiner v{version} service did not start")
+        report_service(self.process.pid)
+
+    def run(self, args):
+        """
+        Runs Split Miner with the arguments of ServiceProvider.main.
+
+        :return: Tuple of the miner's output and the discovery time in seconds measured inside the JVM.
+        """
+        self.process.stdin.write("\t".join(args) + "\n")
+        self.process.stdin.flush()
+        response = self.process.stdout.readline()
+        if not response.startswith("DONE\t"):
+            self.close()
+            raise OSError(f"SplitMiner v{self.version} service stopped")
+        _, millis, status, output = response.rstrip("\n").split("\t", 3)
+        output = base64.b64decode(output).decode("utf-8", errors="replace")
+        if status != "ok":
+            output = "\nERROR: " + output
+        return output, int(millis)/1000
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def run_split_miner(args, version=1.0, use_service=True):
+    """
+    Runs Split Miner on one log, through the worker's persistent JVM if possible.
+
+    Falls back to one `java` process per call if the service cannot be started, e.g. without
+    Java 11 or newer, or if it stops while handling a request.
+
+    :param list args: Arguments of ServiceProvider.main, e.g. ["SM2", log_path, bpmn_path, "0.05"].
+    :param float version: Split Miner version, 1.0 or 2.0.
+    :param bool use_service: Use the persistent JVM.
+    :return: Tuple of the miner's output, the discovery time and the wall-clock time of the call in
+        seconds. Without the service, the discovery time includes JVM startup.
+    """
+    start = time.monotonic()
+    if use_service and version not in _unavailable:
+        try:
+            if version not in _services:
+                try:
+                    _services[version] = SplitMinerService(version)
+                except OSError:
+                    _unavailable.add(version)
+                    raise
+            output, discovery_time = _services[version].run(args)
+            return output, discovery_time, time.monotonic()-start
+        except OSError as e:
+            _services.pop(version, None)
+            print(f"        INFO: {e}. Falling back to one java process per log.")
+
+    start = time.monotonic()
+    output = subprocess.run(
+        ["java", "-cp", get_classpath(version), SERVICE_PROVIDER] + args,
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.monotonic()-start
+    return output.stdout + output.stderr, wall_time, wall_time
@@ -0,0 +1,350 @@
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+
+from multiprocessing.connection import wait
+from shaining.utils.profiling import get_peak_rss_mb, reset_peak_rss
+
+STATUS_OK = 'ok'
+STATUS_TIMEOUT = 'timeout'
+STATUS_OOM = 'oom'
+STATUS_FAILED = 'failed'
+
+# Pipe to the parent, only set inside TaskPool workers
+_parent_conn = None
+
+def report_phase(phase):
+    """
+    Tells the TaskPool which phase the current task is in, so that per-phase time limits apply.
+    The phase starts now, not when the parent reads the message. Does nothing outside of a TaskPool worker.
+    """
+    if _parent_conn is not None:
+        # The monotonic clock is shared by all processes of the host
+        _parent_conn.send(("phase", (phase, time.monotonic())))
+
+def report_work(work):
+    """
+    Tells the TaskPool how much work the current task turned out to have, e.g. the number of events
+    of its log, which the memory estimator learns its ratios from.
+    """
+    if _parent_conn is not None:
+        _parent_conn.send(("work", work))
+
+def report_service(pid):
+    """
+    Tells the TaskPool that `pid` is a long-lived child of the current worker, e.g. the Split Miner
+    JVM, whose memory is not counted as memory the worker keeps after its tasks.
+    """
+    if _parent_conn is not None:
+        _parent_conn.send(("service", pid))
+
+def get_descendants(pid):
+    """
+    Returns the pids of all child processes of `pid`, e.g. a JVM started by a miner. Linux only.
+    """
+    descendants = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                for child in f.read().split():
+                    descendants.append(int(child))
+                    descendants.extend(get_descendants(int(child)))
+    except OSError:
+        pass
+    return descendants
+
+def get_rss_mb(pid, exclude=()):
+    """
+    Returns the resident set size of `pid` and its descendants in MB, or None if unknown.
+
+    :param exclude: pids of descendants not to count, together with their own descendants.
+    """
+    excluded = set(exclude).union(*(get_descendants(proc) for proc in exclude))
+    rss_kb = None
+    for proc in [pid] + get_descendants(pid):
+        if proc in excluded:
+            continue
+        try:
+            with open(f"/proc/{proc}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss_kb = (rss_kb or 0) + int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return None if rss_kb is None else rss_kb/1024
+
+def get_available_memory_mb():
+    """
+    Returns the memory available for new processes in MB, or None if unknown. Linux only.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1])/1024
+    except OSError:
+        pass
+    return None
+
+def _worker_loop(conn, func, initializer):
+    global _parent_conn
+    _parent_conn = conn
+    # Only the parent reacts to Ctrl-C and shuts workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        reset_peak_rss()
+        try:
+            result = func(task)
+            conn.send(("peak", get_peak_rss_mb()))
+            conn.send(("done", result))
+        except MemoryError:
+            conn.send(("oom", traceback.format_exc()))
+        except Exception:
+            conn.send(("failed", traceback.format_exc()))
+
+class _Worker:
+    def __init__(self, func, initializer):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_loop, args=(child_conn, func, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.tasks_done = 0
+        self.service_pids = set()
+
+    def get_rss(self, with_services=True):
+        return get_rss_mb(self.process.pid, () if with_services else self.service_pids) or 0
+
+    def submit(self, task, estimate=None):
+        self.task = task
+        self.phase = None
+        self.task_start = self.phase_start = time.monotonic()
+        self.rss_before = self.peak_rss = self.get_rss()
+        if self.tasks_done == 0:
+            self.base_rss = self.rss_before
+        self.reported_peak = self.reported_work = None
+        self.estimate = estimate if estimate is not None else self.rss_before
+        self.conn.send(task)
+
+    def kill(self):
+        for pid in get_descendants(self.process.pid) + [self.process.pid]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+
+class TaskPool:
+    """
+    Process pool with hard per-task limits.
+
+    Unlike multiprocessing.Pool, a worker whose task runs over its wall-clock limit or memory
+    limit is killed together with its child processes and replaced by a fresh worker. The task
+    is reported with status 'timeout' or 'oom' instead of stalling or breaking the whole pool.
+
+    :param int num_workers: Number of worker processes.
+    :param callable func: Function run on each task in the workers.
+    :param callable initializer: Called once in every worker on startup.
+    :param timeout: Wall-clock limit in seconds for a whole task, or a dict of per-phase limits
+        (see `report_phase`) with an optional 'total' key. None disables it.
+    :param float memory_limit: RSS limit in MB for a worker and its children. None disables it.
+    :param float memory_budget: Total RSS in MB of all workers. A task only starts if the
+        estimated peaks of all running tasks and its own fit into the budget, or if no other task
+        runs. None disables admission control.
+    :param memory_estimator: Object with `estimate(task, rss_before)` returning a task's expected
+        peak RSS in MB, and `observe(task, rss_before, peak, work)` called with its measured peak
+        and the work it reported with `report_work`, or None.
+    :param int max_tasks_per_child: Replaces a worker by a fresh one after this many tasks, like
+        multiprocessing.Pool's maxtasksperchild. Workers that grow over their share of the memory
+        budget while idle are replaced as well.
+    """
+    def __init__(self, num_workers, func, initializer=None, timeout=None, memory_limit=None, poll_interval=0.5,
+                 memory_budget=None, memory_estimator=None, max_tasks_per_child=None):
+        self.num_workers = max(1, num_workers)
+        self.func = func
+        self.initializer = initializer
+        if isinstance(timeout, dict):
+            self.timeouts = dict(timeout)
+        else:
+            self.timeouts = {'total': timeout}
+        self.memory_limit = memory_limit
+        self.poll_interval = poll_interval
+        self.memory_budget = memory_budget
+        self.memory_estimator = memory_estimator
+        self.max_tasks_per_child = max_tasks_per_child
+        self.workers = []
+
+    def __enter__(self):
+        self.workers = [self._new_worker() for _ in range(self.num_workers)]
+        return self
+
+    def __exit__(self, *args):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def _new_worker(self):
+        return _Worker(self.func, self.initializer)
+
+    def _replace(self, worker, graceful=False):
+        if graceful:
+            worker.stop()
+        else:
+            worker.kill()
+        self.workers[self.workers.index(worker)] = self._new_worker()
+
+    def _finish(self, worker, reported_peak=None):
+        """
+        Records the measured peak of the worker's task and recycles the worker if it is due.
+        """
+        task, worker.task = worker.task, None
+        worker.tasks_done += 1
+        peak = max(worker.peak_rss, reported_peak or 0)
+        if self.memory_estimator is not None:
+            self.memory_estimator.observe(task, worker.rss_before, peak, worker.reported_work)
+        return task
+
+    def _recycle(self, worker):
+        if self.max_tasks_per_child is not None and worker.tasks_done >= self.max_tasks_per_child:
+            self._replace(worker, graceful=True)
+        elif self.memory_budget is not None and worker.get_rss(with_services=False) > max(self.memory_budget/self.num_workers, 2*worker.base_rss):
+            # Memory a worker keeps after its tasks, e.g. from fragmentation, only returns when it exits.
+            # Services like the Split Miner JVM are meant to live as long as the worker.
+            self._replace(worker, graceful=True)
+
+    def _admit(self, tasks, worker):
+        """
+        Returns the first task in `tasks` whose estimated peak fits into the memory budget next to
+        the running tasks, or None if none fits.
+        """
+        if self.memory_budget is None or self.memory_estimator is None:
+            return tasks[0], None
+        running = [w for w in self.workers if w.task is not None]
+        committed = sum(max(w.get_rss(), w.estimate) if w.task is not None else w.get_rss()
+                        for w in self.workers)
+        rss = worker.get_rss()
+        for task in tasks:
+            estimate = self.memory_estimator.estimate(task, rss)
+            if not running or committed - rss + estimate <= self.memory_budget:
+                return task, estimate
+        return None
+
+    def _drain(self, worker):
+        """
+        Reads all messages the worker sent so far, so that a task is never judged by its limits
+        after it finished.
+
+        :return: Tuple of the final message and its payload if the task finished, otherwise None.
+        :raises EOFError: If the worker died without answering.
+        """
+        while worker.conn.poll():
+            message, payload = worker.conn.recv()
+            if message == "service":
+                worker.service_pids.add(payload)
+            elif message == "phase":
+                worker.phase, worker.phase_start = payload
+            elif message == "peak":
+                worker.reported_peak = payload
+            elif message == "work":
+                worker.reported_work = payload
+            else:
+                return message, payload
+        return None
+
+    def _limit_exceeded(self, worker, now):
+        total_limit = self.timeouts.get('total')
+        phase_limit = self.timeouts.get(worker.phase)
+        if total_limit is not None and now - worker.task_start > total_limit:
+            return STATUS_TIMEOUT
+        if phase_limit is not None and now - worker.phase_start > phase_limit:
+            return STATUS_TIMEOUT
+        if self.memory_limit is not None or self.memory_budget is not None:
+            rss = worker.get_rss()
+            worker.peak_rss = max(worker.peak_rss, rss)
+            if self.memory_limit is not None and rss > self.memory_limit:
+                return STATUS_OOM
+        return None
+
+    def imap_unordered(self, tasks, more_tasks=None):
+        """
+        Runs all tasks and yields (task, status, result) in order of completion.
+        `result` is the return value of `func` for status 'ok', otherwise an error message.
+
+        :param list tasks: Tasks to run.
+        :param callable more_tasks: Called with the number of idle workers whenever there are more
+            idle workers than tasks, returns further tasks to run, e.g. claimed from a WorkQueue.
+        """
+        tasks = list(tasks)
+        while True:
+            idle = sum(worker.task is None for worker in self.workers)
+            if more_tasks is not None and idle > len(tasks):
+                tasks.extend(more_tasks(idle - len(tasks)))
+            if not tasks and idle == len(self.workers):
+                break
+            for worker in list(self.workers):
+                if worker.task is None and tasks:
+                    admitted = self._admit(tasks, worker)
+                    if admitted is None:
+                        # Waits until running tasks free enough memory
+                        break
+                    task, estimate = admitted
+                    tasks.remove(task)
+                    worker.submit(task, estimate)
+
+            wait([worker.conn for worker in self.workers if worker.task is not None], timeout=self.poll_interval)
+            now = time.monotonic()
+            for worker in list(self.workers):
+                if worker.task is None:
+                    continue
+                status = None
+                try:
+                    finished = self._drain(worker)
+                    if finished is None:
+                        status = self._limit_exceeded(worker, now)
+                        if status is not None:
+                            # The task may have finished while its limits were checked
+                            finished = self._drain(worker)
+                            status = self._limit_exceeded(worker, now) if finished is None else None
+                except (EOFError, OSError):
+                    # Worker died without answering
+                    worker.process.join(1)
+                    exitcode = worker.process.exitcode
+                    task = self._finish(worker)
+                    self._replace(worker)
+                    if exitcode == -signal.SIGKILL:
+                        # The pool kills workers itself only after taking their task, so it was the kernel's OOM killer
+                        yield task, STATUS_OOM, f"Worker was killed by SIGKILL, e.g. by the OOM killer, after a peak RSS of {worker.peak_rss:.0f} MB"
+                    else:
+                        yield task, STATUS_FAILED, f"Worker exited with code {exitcode}"
+                    continue
+                if finished is not None:
+                    message, payload = finished
+                    task = self._finish(worker, worker.reported_peak)
+                    self._recycle(worker)
+                    yield task, STATUS_OK if message == "done" else message, payload
+                    continue
+                if status is not None:
+                    task = self._finish(worker)
+                    self._replace(worker)
+                    yield task, status, f"Exceeded {status} limit in phase {worker.phase}"
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import networkx as nx
+import os
+import sqlite3
+import time
+
+# Part of every fingerprint, change it when the cached values or their computation change
+ALIGNMENT_CACHE_VERSION = 3
+DEFAULT_CACHE_SIZE = 1000000
+ALIGNMENT_CACHE_FILE = "alignments.db"
+# Numberings of the nodes of a net compared for its structure, bounds the search on symmetric nets
+MAX_CANONICAL_LEAVES = 64
+# Kinds of cached values
+FITNESS = 'fitness'
+PRECISION = 'precision'
+
+def get_net_graph(net, im, fm):
+    """
+    Labelled graph of an accepting Petri net: places by their tokens in the initial and final
+    marking, transitions by their label, arcs by their weight.
+    """
+    graph = nx.DiGraph()
+    for place in net.places:
+        graph.add_node(('p', id(place)), label=f"p|{im.get(place, 0)}|{fm.get(place, 0)}")
+    for transition in net.transitions:
+        graph.add_node(('t', id(transition)), label=f"t|{'' if transition.label is None else transition.label}")
+    for arc in net.arcs:
+        source = ('p' if arc.source in net.places else 't', id(arc.source))
+        target = ('p' if arc.target in net.places else 't', id(arc.target))
+        graph.add_edge(source, target, weight=str(arc.weight))
+    return graph
+
+def get_net_fingerprint(net, im, fm):
+    """
+    Fingerprint of an accepting Petri net that does not depend on the names or the identity of its
+    places and transitions, so that equal models found by different miners or runs share it.
+
+    Places are labelled by their tokens in the initial and final marking, transitions by their
+    label, arcs by their weight. The fingerprint is the Weisfeiler-Lehman hash of this graph, refined
+    until it is stable, together with the number of places, transitions and arcs.
+
+    :return: str hex digest.
+    """
+    graph = get_net_graph(net, im, fm)
+    wl_hash = nx.weisfeiler_lehman_graph_hash(graph, node_attr='label', edge_attr='weight',
+                                              iterations=max(3, len(graph)))
+    key = f"{ALIGNMENT_CACHE_VERSION}|{wl_hash}|{len(net.places)}|{len(net.transitions)}|{len(net.arcs)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def refine_colors(graph, colors):
+    """
+    Splits node colors by the colors and weights of their neighbours until they are stable. Colors
+    are ranks of sorted signatures, so they never depend on the order or identity of the nodes.
+    """
+    while True:
+        signatures = {node: (colors[node],
+                             tuple(sorted((colors[target], weight) for _, target, weight in graph.out_edges(node, data='weight'))),
+                             tuple(sorted((colors[source], weight) for source, _, weight in graph.in_edges(node, data='weight'))))
+                      for node in graph.nodes}
+        ranks = {signature: i for i, signature in enumerate(sorted(set(signatures.values())))}
+        refined = {node: ranks[signatures[node]] for node in graph.nodes}
+        if len(ranks) == len(set(colors.values())):
+            return refined
+        colors = refined
+
+def get_canonical_form(graph, colors, leaves):
+    """
+    Individualizes each node of the first color shared by several nodes in turn and refines, down
+    to one color per node, and returns the smallest serialization of these numberings. Nodes that
+    stay tied are mostly symmetric, e.g. parallel branches, and give the same serialization, so the
+    search stops after `leaves[0]` numberings.
+
+    :return: Tuple of the node labels and the sorted (source, target, weight) arcs.
+    """
+    cells = {}
+    for node, color in colors.items():
+        cells.setdefault(color, []).append(node)
+    ties = [color for color, nodes in cells.items() if len(nodes) > 1]
+    if not ties:
+        leaves[0] -= 1
+        nodes = sorted(graph.nodes, key=colors.get)
+        return ([graph.nodes[node]['label'] for node in nodes],
+                sorted((colors[source], colors[target], weight) for source, target, weight in graph.edges(data='weight')))
+    best = None
+    tied = min(ties)
+    for node in cells[tied]:
+        # The individualized node keeps a color of its own between its former cell and the next
+        individualized = {other: 2*color + (color == tied and other != node) for other, color in colors.items()}
+        form = get_canonical_form(graph, refine_colors(graph, individualized), leaves)
+        best = form if best is None else min(best, form)
+        if leaves[0] <= 0:
+            break
+    return best
+
+def get_net_structure(net, im, fm):
+    """
+    Serialization that describes an accepting Petri net exactly, stored next to its fingerprint.
+    Weisfeiler-Lehman hashes are no canonical form, so different nets can share a fingerprint, but
+    never a structure. Places and transitions are numbered by their labels, refined by the colors of
+    their neighbours, and ties are broken by individualization, never by the identity of the nodes,
+    so that equal nets of different miners get the same structure.
+
+    :return: str json with the labels of all nodes and the sorted (source, target, weight) arcs.
+    """
+    graph = get_net_graph(net, im, fm)
+    labels = sorted(set(nx.get_node_attributes(graph, 'label').values()))
+    colors = refine_colors(graph, {node: labels.index(graph.nodes[node]['label']) for node in graph.nodes})
+    nodes, arcs = get_canonical_form(graph, colors, [MAX_CANONICAL_LEAVES])
+    return json.dumps({'nodes': nodes, 'arcs': arcs}, ensure_ascii=False)
+
+class AlignmentCache:
+    """
+    Persistent SQLite cache of per-variant alignment results, keyed by net fingerprint.
+
+    Stores the cost, best worst cost and fitness of every aligned variant, and the activated
+    transition labels of every aligned prefix for precision. Holds at most `max_entries` entries
+    and evicts the least recently used ones beyond that.
+
+    :param str db_path: Path to the SQLite database. Created if missing.
+    :param int max_entries: Maximum number of cached alignments.
+    """
+    def __init__(self, db_path, max_entries=DEFAULT_CACHE_SIZE):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        os.makedirs(os.path.split(db_path)[0] or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS alignments (
+                                fingerprint TEXT NOT NULL,
+                                kind TEXT NOT NULL,
+                                sequence TEXT NOT NULL,
+                                value TEXT,
+                                last_used REAL NOT NULL,
+                                PRIMARY KEY (fingerprint, kind, sequence))""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS alignments_last_used ON alignments (last_used)")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS nets (
+                                fingerprint TEXT PRIMARY KEY,
+                                structure TEXT NOT NULL)""")
+        # Running number of alignments, kept by triggers, so that puts never count the table
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL)")
+        self.conn.execute("""CREATE TRIGGER IF NOT EXISTS alignments_insert AFTER INSERT ON alignments
+                             BEGIN UPDATE entries SET count = count + 1; END""")
+        self.conn.execute("""CREATE TRIGGER IF NOT EXISTS alignments_delete AFTER DELETE ON alignments
+                             BEGIN UPDATE entries SET count = count - 1; END""")
+        if self.conn.execute("SELECT 1 FROM entries").fetchone() is None:
+            self.conn.execute("INSERT INTO entries SELECT 0, COUNT(*) FROM alignments")
+        self.conn.commit()
+        self.hits = self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_fingerprint(self, net, im, fm):
+        """
+        Fingerprint of the cached values of an accepting Petri net. The first net with a fingerprint
+        stores its structure, later nets only share its values if their structure is the same.
+
+        :return: str hex digest, or None if another net with the same fingerprint is cached.
+        """
+        fingerprint, structure = get_net_fingerprint(net, im, fm), get_net_structure(net, im, fm)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO nets VALUES (?, ?)", (fingerprint, structure))
+            stored = self.conn.execute("SELECT structure FROM nets WHERE fingerprint = ?", (fingerprint,)).fetchone()[0]
+        return fingerprint if stored == structure else None
+
+    def get_many(self, fingerprint, kind, sequences):
+        """
+        :param list sequences: Variants or prefixes as str keys.
+        :return: dict mapping the cached sequences to their values.
+        """
+        found = {}
+        sequences = list(sequences)
+        # Stays below SQLite's limit of host parameters per statement
+        for start in range(0, len(sequences), 500):
+            chunk = sequences[start:start+500]
+            rows = self.conn.execute(f"""SELECT sequence, value FROM alignments WHERE fingerprint = ? AND kind = ?
+                                         AND sequence IN ({','.join('?'*len(chunk))})""", [fingerprint, kind] + chunk)
+            found.update((sequence, json.loads(value)) for sequence, value in rows)
+        if found:
+            with self.conn:
+                self.conn.executemany("UPDATE alignments SET last_used = ? WHERE fingerprint = ? AND kind = ? AND sequence = ?",
+                                      [(time.time(), fingerprint, kind, sequence) for sequence in found])
+        self.hits += len(found)
+        self.misses += len(sequences) - len(found)
+        return found
+
+    def put_many(self, fingerprint, kind, values):
+        """
+        Stores a dict mapping sequences to json-serializable values, then evicts the least recently
+        used entries over `max_entries`.
+        """
+        now = time.time()
+        with self.conn:
+            # An upsert instead of INSERT OR REPLACE, whose implicit delete would not fire the delete trigger
+            self.conn.executemany("""INSERT INTO alignments VALUES (?, ?, ?, ?, ?) ON CONFLICT (fingerprint, kind, sequence)
+                                     DO UPDATE SET value = excluded.value, last_used = excluded.last_used""",
+                                  [(fingerprint, kind, sequence, json.dumps(value, default=int), now) for sequence, value in values.items()])
+            excess = self.conn.execute("SELECT count FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute("""DELETE FROM alignments WHERE rowid IN
+                                     (SELECT rowid FROM alignments ORDER BY last_used LIMIT ?)""", (excess,))
+
+def get_sequence_key(variant):
+    return json.dumps(list(variant), ensure_ascii=False)
@@ -0,0 +1,166 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+
+from datetime import datetime as dt
+from shaining.utils.io_helpers import dump_json_atomic, get_file_hash
+from shaining.utils.log_archive import get_log_hash, is_archive, list_logs, split_archive_path
+
+# Part of every artifact key, change it when the steps compute their outputs differently
+ARTIFACT_CACHE_VERSION = 1
+FILE_HASHES_FILE = "file_hashes.json"
+# Files of SOURCE_PATHS that are part of the artifact keys
+SOURCE_SUFFIXES = (".py", ".java", ".jar")
+
+class ArtifactCache:
+    """
+    Content-addressed store of the files written by pipeline steps.
+
+    A step's artifact is keyed by a hash of its params, of the content of every file it reads and of
+    the code that computes it. The files it writes, including every file of the directories it
+    writes, are stored once per content under objects/, and artifacts/<key>.json maps
+    their paths to their content hashes. Content hashes of input files are remembered by path,
+    size and modification time, so unchanged event-logs are not read again on the next run.
+
+    :param str root_path: Directory of the cache. Created if missing.
+    """
+    def __init__(self, root_path):
+        self.root_path = root_path
+        os.makedirs(os.path.join(root_path, "artifacts"), exist_ok=True)
+        os.makedirs(os.path.join(root_path, "objects"), exist_ok=True)
+        self.hashes_path = os.path.join(root_path, FILE_HASHES_FILE)
+        try:
+            with open(self.hashes_path) as f:
+                self.file_hashes = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.file_hashes = {}
+
+    def close(self):
+        dump_json_atomic(self.file_hashes, self.hashes_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def hash_file(self, file_path):
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        cached = self.file_hashes.get(key)
+        if cached is None or cached[:2] != [stat.st_size, stat.st_mtime_ns]:
+            cached = self.file_hashes[key] = [stat.st_size, stat.st_mtime_ns, get_file_hash(file_path)]
+        return cached[2]
+
+    def hash_input(self, path):
+        """
+        Content hash of a file, an archive member, or of all event-logs in a directory or archive.
+
+        :return: str hex digest, or None if `path` does not exist.
+        """
+        if os.path.isdir(path) or is_archive(path):
+            logs = hashlib.sha1()
+            for filename in list_logs(path):
+                log_path = os.path.join(path, filename)
+                logs.update(f"{filename}|{self.hash_input(log_path)}\n".encode("utf-8"))
+            return logs.hexdigest()
+        if os.path.isfile(path):
+            return self.hash_file(path)
+        if split_archive_path(path)[0] is not None:
+            try:
+                return get_log_hash(path)
+            except FileNotFoundError:
+                return None
+        return None
+
+    def hash_sources(self, source_paths, packages=()):
+        """
+        Hash of the code in `source_paths` and the versions of `packages`, so that artifacts are
+        recomputed after any change to the code of the steps.
+        """
+        sources = hashlib.sha1()
+        for file_path in sorted(iter_files(source_paths)):
+            if file_path.endswith(SOURCE_SUFFIXES):
+                sources.update(f"{file_path}|{self.hash_file(file_path)}\n".encode("utf-8"))
+        for package in packages:
+            try:
+                version = importlib.metadata.version(package)
+            except importlib.metadata.PackageNotFoundError:
+                version = None
+            sources.update(f"{package}|{version}\n".encode("utf-8"))
+        return sources.hexdigest()
+
+    def get_key(self, params, input_paths, sources=None):
+        """
+        :param str sources: Hash of the code of the step, see `hash_sources`.
+        :return: Key of the artifact of a step with `params` that reads `input_paths`, or None if
+            one of them does not exist.
+        """
+        input_hashes = {path: self.hash_input(path) for path in sorted(input_paths)}
+        if None in input_hashes.values():
+            return None
+        key = json.dumps({'version': ARTIFACT_CACHE_VERSION, 'params': params, 'inputs': input_hashes, 'sources': sources},
+                         sort_keys=True, default=str)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get_manifest_path(self, key):
+        return os.path.join(self.root_path, "artifacts", f"{key}.json")
+
+    def get_object_path(self, content_hash):
+        return os.path.join(self.root_path, "objects", content_hash[:2], content_hash)
+
+    def put(self, key, params, output_paths, exclude=()):
+        """
+        Stores the files a step wrote as the artifact `key`. Directories are stored with all their
+        files, except those whose name is in `exclude`.
+        """
+        outputs = {}
+        for output_path in sorted(iter_files(output_paths)):
+            if os.path.basename(output_path) in exclude:
+                continue
+            content_hash = outputs[output_path] = self.hash_file(output_path)
+            object_path = self.get_object_path(content_hash)
+            if not os.path.exists(object_path):
+                copy_atomic(output_path, object_path)
+        dump_json_atomic({'params': params, 'outputs': outputs, 'created': dt.now().isoformat(timespec='seconds')},
+                         self.get_manifest_path(key), indent=2, default=str)
+
+    def restore(self, key):
+        """
+        Writes the files of the artifact `key` to their paths, unless they already hold them.
+
+        :return: list of the restored paths, or None if the artifact is not cached.
+        """
+        try:
+            with open(self.get_manifest_path(key)) as f:
+                outputs = json.load(f)['outputs']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        if not all(os.path.exists(self.get_object_path(content_hash)) for content_hash in outputs.values()):
+            return None
+        for output_path, content_hash in outputs.items():
+            if not os.path.isfile(output_path) or self.hash_file(output_path) != content_hash:
+                copy_atomic(self.get_object_path(content_hash), output_path)
+        return list(outputs)
+
+def iter_files(paths):
+    """
+    Yields every path of `paths` that is a file and every file in those that are directories.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+        for root, _, filenames in os.walk(path):
+            for filename in filenames:
+                yield os.path.join(root, filename)
+
+def copy_atomic(source_path, target_path):
+    """
+    Copies a file to a temporary file next to the target and renames it.
+    """
+    os.makedirs(os.path.split(target_path)[0] or ".", exist_ok=True)
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    shutil.copyfile(source_path, tmp_path)
+    os.replace(tmp_path, target_path)
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from collections import Counter
+from functools import cached_property
+from shaining.utils.xes_stream import read_xes_columns, NAT
+from shaining.utils.xes_stream import DEFAULT_ACTIVITY_KEY, DEFAULT_TIMESTAMP_KEY, DEFAULT_CASE_KEY
+
+CASE_ID_COLUMN = "case:" + DEFAULT_CASE_KEY
+
+class ColumnarLog:
+    """
+    Compact event-log of NumPy arrays: the dictionary-encoded activity and the timestamp of every
+    event, trace after trace, and the offset of every trace.
+
+    A fraction of the size of a pm4py EventLog, it is what workers keep in memory and cache on
+    disk. `to_dataframe` and `to_event_log` build pm4py inputs on demand only, for the calls that
+    need them, and are not kept.
+
+    :param np.ndarray codes: int32 activity code of every event.
+    :param np.ndarray offsets: int64 array of length traces+1, trace i is codes[offsets[i]:offsets[i+1]].
+    :param list activities: Activity name of every code.
+    :param np.ndarray timestamps: int64 nanoseconds since epoch in UTC per event, NAT if missing.
+    :param list case_ids: Case id of every trace.
+    """
+    def __init__(self, codes, offsets, activities, timestamps=None, case_ids=None):
+        self.codes = codes
+        self.offsets = offsets
+        self.activities = activities
+        self.timestamps = timestamps
+        self.case_ids = case_ids if case_ids is not None else [str(i) for i in range(len(offsets)-1)]
+
+    @classmethod
+    def from_xes(cls, log_path, with_timestamps=True):
+        """
+        Streams an .xes or .xes.gz file into a ColumnarLog.
+        """
+        return cls(**read_xes_columns(log_path, with_timestamps=with_timestamps))
+
+    @classmethod
+    def from_event_log(cls, event_log):
+        """
+        Encodes a pm4py EventLog, e.g. one passed on by an earlier pipeline step.
+        """
+        activity_codes = {}
+        codes, offsets, timestamps, case_ids = [], [0], [], []
+        for trace in event_log:
+            for event in trace:
+                if DEFAULT_ACTIVITY_KEY not in event:
+                    continue
+                codes.append(activity_codes.setdefault(event[DEFAULT_ACTIVITY_KEY], len(activity_codes)))
+                timestamps.append(event.get(DEFAULT_TIMESTAMP_KEY))
+            offsets.append(len(codes))
+            case_ids.append(trace.attributes.get(DEFAULT_CASE_KEY))
+        timestamps = pd.DatetimeIndex(pd.to_datetime(pd.Series(timestamps, dtype=object), utc=True, errors='coerce'))
+        return cls(np.array(codes, dtype=np.int32), np.array(offsets, dtype=np.int64), list(activity_codes),
+                   timestamps.as_unit('ns').asi8, case_ids)
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getstate__(self):
+        # Derived arrays are cheap to recompute, so pickles only hold the columns
+        return {key: self.__dict__[key] for key in ('codes', 'offsets', 'activities', 'timestamps', 'case_ids')}
+
+    @cached_property
+    def trace_lengths(self):
+        return np.diff(self.offsets)
+
+    @cached_property
+    def variant_ids(self):
+        """
+        Variant of every trace, numbered in order of first occurrence.
+        """
+        traces = [self.codes[start:end].tobytes() for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+        return pd.factorize(pd.Series(traces, dtype=object))[0]
+
+    @cached_property
+    def variant_counts(self):
+        return np.bincount(self.variant_ids)
+
+    @cached_property
+    def variants(self):
+        """
+        Activity code sequence of every variant, in order of first occurrence.
+        """
+        _, first = np.unique(self.variant_ids, return_index=True)
+        return [self.codes[self.offsets[i]:self.offsets[i+1]] for i in first]
+
+    def get_variant_counter(self):
+        """
+        Counter mapping every variant as a tuple of activity names to its number of traces.
+        """
+        activities = np.array(self.activities, dtype=object)
+        return Counter({tuple(activities[variant]): int(count)
+                        for variant, count in zip(self.variants, self.variant_counts)})
+
+    def get_case_index(self):
+        """
+        Trace number of every event.
+        """
+        return np.repeat(np.arange(len(self)), self.trace_lengths)
+
+    def to_dataframe(self):
+        """
+        Builds a pm4py-style DataFrame with case:concept:name, concept:name and time:timestamp.
+        """
+        df = pd.DataFrame({
+            CASE_ID_COLUMN: np.array(self.case_ids, dtype=object)[self.get_case_index()],
+            DEFAULT_ACTIVITY_KEY: np.array(self.activities, dtype=object)[self.codes],
+            })
+        if self.timestamps is not None:
+            df[DEFAULT_TIMESTAMP_KEY] = pd.to_datetime(self.timestamps, unit='ns', utc=True)
+        return df
+
+    def to_event_log(self):
+        """
+        Builds a pm4py EventLog with the case id, activity and timestamp of every event.
+        """
+        # pm4py takes longer to import than most logs take to parse, so only its users import it
+        from pm4py.objects.log.obj import EventLog, Trace, Event
+        activities = np.array(self.activities, dtype=object)[self.codes]
+        if self.timestamps is not None:
+            timestamps = pd.to_datetime(self.timestamps, unit='ns', utc=True).to_pydatetime()
+            missing = self.timestamps == NAT
+        log = EventLog()
+        for i, (start, end) in enumerate(zip(self.offsets[:-1], self.offsets[1:])):
+            trace = Trace(attributes={DEFAULT_CASE_KEY: self.case_ids[i]})
+            for j in range(start, end):
+                event = Event({DEFAULT_ACTIVITY_KEY: activities[j]})
+                if self.timestamps is not None and not missing[j]:
+                    event[DEFAULT_TIMESTAMP_KEY] = timestamps[j]
+                trace.append(event)
+            log.append(trace)
+        return log
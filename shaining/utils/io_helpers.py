@@ -1,7 +1,7 @@
 import glob
+import hashlib
 import json
 import os
-import pandas as pd
 import re
 import shutil
 
@@ -19,6 +19,8 @@ def select_instance(source_dir, log_path, destination=os.path.join("output","gen
     return destination, len(os.listdir(destination))
 
 def read_csvs(input_path, ref_feature):
+    # Imported here, so that main.py and the pipeline load configurations without pandas
+    import pandas as pd
     f_dict = defaultdict(pd.DataFrame)
     ref_short_name = get_keys_abbreviation([ref_feature])
     for file in glob.glob(f'{input_path}*.csv'):
@@ -65,18 +67,38 @@ def get_output_key_value_location(obj, output_path, identifier):
     save_path = os.path.join(folder_path, generated_file_name)
     return save_path
 
-def dump_features_json(features: dict, output_path, identifier, objectives=None, content_type="features"):
+def get_file_hash(file_path, chunk_size=1<<20):
+    """
+    Returns the sha1 of a file's content, read in chunks.
+    """
+    file_hash = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+def dump_json_atomic(obj, json_path, **kwargs):
+    """
+    Writes json to a temporary file and renames it, so a crash never leaves a partial file behind.
+    """
+    os.makedirs(os.path.split(json_path)[0] or ".", exist_ok=True)
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as fp:
+        json.dump(obj, fp, **kwargs)
+    os.replace(tmp_path, json_path)
+
+def get_content_dir(output_path, content_type):
     output_parts = PurePath(output_path).parts
-    feature_dir = os.path.join(output_parts[0], content_type,
-                                   *output_parts[1:])
+    return os.path.join(output_parts[0], content_type, *output_parts[1:])
+
+def dump_features_json(features: dict, output_path, identifier, objectives=None, content_type="features"):
+    feature_dir = get_content_dir(output_path, content_type)
     if objectives is not None:
         json_path = get_output_key_value_location(objectives,
                                                 feature_dir, identifier)+".json"
     else:
         json_path = os.path.join(feature_dir, identifier)+".json"
 
-    os.makedirs(os.path.split(json_path)[0], exist_ok=True)
-    with open(json_path, 'w') as fp:
-        #print(len(features), type(features), features)
-        json.dump(features, fp, default=int)
-        print(f"SUCCESS: Saved {len(features)-1} {content_type} in {json_path}")#-1 because 'log' is not a feature
+    #print(len(features), type(features), features)
+    dump_json_atomic(features, json_path, default=int)
+    print(f"SUCCESS: Saved {len(features)-1} {content_type} in {json_path}")#-1 because 'log' is not a feature
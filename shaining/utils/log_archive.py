@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from contextlib import contextmanager
+from shaining.utils.io_helpers import get_file_hash
+
+"""
+Event-logs inside archives are addressed like files in a directory named after the archive, e.g.
+data/gen_triangle.zip/gen_triangle/genEL1_10_047_nan.xes, and read straight from the archive.
+"""
+
+ARCHIVE_SUFFIXES = (".zip", ".tar.gz", ".tgz", ".tar")
+# Members of these can only be reached by decompressing all members before them, once per member read
+COMPRESSED_TAR_SUFFIXES = (".tar.gz", ".tgz")
+LOG_SUFFIXES = (".xes.gz", ".xes")
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+def is_log_file(path):
+    return path.endswith(LOG_SUFFIXES)
+
+def strip_suffix(path, suffixes=LOG_SUFFIXES+ARCHIVE_SUFFIXES):
+    """
+    Removes the first matching suffix, e.g. genEL1.xes.gz becomes genEL1.
+    """
+    for suffix in suffixes:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+def split_archive_path(log_path):
+    """
+    Splits the path of an archive member into the archive and the member name.
+
+    :return: Tuple of archive path and member name, or (None, log_path) for other paths.
+    """
+    parts = os.path.normpath(log_path).split(os.sep)
+    for i in range(1, len(parts)):
+        archive_path = os.sep.join(parts[:i])
+        if is_archive(archive_path):
+            return archive_path, "/".join(parts[i:])
+    return None, log_path
+
+def check_archive(archive_path):
+    """
+    Raises a ValueError for archives whose members cannot be read independently, i.e. compressed
+    tars. Tasks read the logs of an archive in the order of their cost, and every member read from
+    a .tar.gz decompresses the archive up to that member again.
+    """
+    if archive_path.endswith(COMPRESSED_TAR_SUFFIXES):
+        raise ValueError(f"Cannot read event-logs from {archive_path}, as compressed tar archives cannot be read member"
+                         f" by member. Use a .zip or an uncompressed .tar, e.g. `gunzip {archive_path}` for a .tar.gz.")
+
+def list_logs(input_path):
+    """
+    Lists the .xes and .xes.gz files of a directory, or the members of a .zip or .tar archive
+    from its index, without extracting them.
+
+    :return: Sorted paths relative to `input_path`.
+    """
+    if not is_archive(input_path):
+        return sorted(filename for filename in os.listdir(input_path) if is_log_file(filename))
+    check_archive(input_path)
+    if input_path.endswith(".zip"):
+        with zipfile.ZipFile(input_path) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    else:
+        with tarfile.open(input_path, "r:") as archive:
+            names = [member.name for member in archive.getmembers() if member.isfile()]
+    # Skips the resource forks macOS adds to archives
+    return sorted(name for name in names if is_log_file(name) and not os.path.basename(name).startswith("._")
+                  and not name.startswith("__MACOSX/"))
+
+# Archives opened by this process. Never shared with forked workers, as they would share its file offset.
+_archives = {}
+
+def get_archive(archive_path):
+    key = (os.getpid(), archive_path)
+    if key not in _archives:
+        check_archive(archive_path)
+        _archives[key] = zipfile.ZipFile(archive_path) if archive_path.endswith(".zip") else tarfile.open(archive_path, "r:")
+    return _archives[key]
+
+def get_member_info(archive_path, member):
+    archive = get_archive(archive_path)
+    try:
+        return archive.getinfo(member) if isinstance(archive, zipfile.ZipFile) else archive.getmember(member)
+    except KeyError:
+        raise FileNotFoundError(f"{member} is not in {archive_path}")
+
+@contextmanager
+def open_log(log_path, decompress=True):
+    """
+    Opens an event-log file or archive member as a binary stream, decompressing .gz on the fly.
+
+    :param bool decompress: Whether to decompress .xes.gz, otherwise the stream holds the stored bytes.
+    """
+    archive_path, member = split_archive_path(log_path)
+    if archive_path is None:
+        stream = open(log_path, 'rb')
+    else:
+        info = get_member_info(archive_path, member)
+        archive = get_archive(archive_path)
+        stream = archive.open(info) if isinstance(archive, zipfile.ZipFile) else archive.extractfile(info)
+    try:
+        if decompress and log_path.endswith(".gz"):
+            with gzip.GzipFile(fileobj=stream) as gzip_stream:
+                yield gzip_stream
+        else:
+            yield stream
+    finally:
+        stream.close()
+
+def log_exists(log_path):
+    archive_path, member = split_archive_path(log_path)
+    if archive_path is None:
+        return os.path.isfile(log_path)
+    try:
+        get_member_info(archive_path, member)
+        return True
+    except FileNotFoundError:
+        return False
+
+def get_log_size(log_path):
+    """
+    Size of an event-log file in bytes, or the uncompressed size of an archive member.
+    """
+    archive_path, member = split_archive_path(log_path)
+    if archive_path is None:
+        return os.path.getsize(log_path)
+    info = get_member_info(archive_path, member)
+    return info.file_size if isinstance(info, zipfile.ZipInfo) else info.size
+
+def get_log_hash(log_path):
+    """
+    Hash of an event-log's content. Members of a .zip are hashed by the CRC32 and size in its
+    index, members of a .tar by their size and modification time, so no member is read.
+    """
+    archive_path, member = split_archive_path(log_path)
+    if archive_path is None:
+        return get_file_hash(log_path)
+    info = get_member_info(archive_path, member)
+    if isinstance(info, zipfile.ZipInfo):
+        key = f"{member}|{info.CRC}|{info.file_size}"
+    else:
+        key = f"{member}|{info.size}|{info.mtime}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+@contextmanager
+def materialize_log(log_path):
+    """
+    Yields the absolute path of an uncompressed .xes file with the event-log, for external tools
+    like Split Miner. Archive members and .xes.gz files are written to a temporary file, which is
+    removed afterwards; other files are used in place.
+    """
+    if split_archive_path(log_path)[0] is None and not log_path.endswith(".gz"):
+        yield os.path.abspath(log_path)
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix=".xes", prefix=os.path.basename(strip_suffix(log_path)) + "_")
+    try:
+        with os.fdopen(fd, 'wb') as f, open_log(log_path) as stream:
+            shutil.copyfileobj(stream, f, 1 << 20)
+        yield tmp_path
+    finally:
+        os.remove(tmp_path)
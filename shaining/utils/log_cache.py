@@ -0,0 +1,89 @@
+import hashlib
+import os
+import pickle
+
+from collections import OrderedDict
+
+from shaining.utils.columnar_log import ColumnarLog
+from shaining.utils.log_archive import split_archive_path
+
+CACHE_SUFFIX = ".columnar.pkl"
+# Logs kept in memory per process, least recently used first out. Tasks are ordered by cost, so the
+# miners of one log interleave with other logs, but a log is parsed once as long as it stays here.
+MAX_LOADED_LOGS = 4
+MAX_LOADED_EVENTS = 10**7
+
+def get_log_cache_key(log_path):
+    """
+    Returns a key identifying the current version of an event-log file.
+
+    :param str log_path: Path to the .xes or .xes.gz file, or to a member of an archive.
+    :return: sha1 over absolute path, modification time and size of the file, or of the archive
+        for members.
+    """
+    archive_path, _ = split_archive_path(log_path)
+    stat = os.stat(archive_path or log_path)
+    key = f"{os.path.abspath(log_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+# Recently loaded logs of this process and their state, shared by all tasks on the same log
+_loaded_logs = OrderedDict()
+
+def load_event_log(log_path, cache_path=None):
+    """
+    Streams an event-log from disk into a ColumnarLog, optionally through a binary on-disk cache.
+
+    The MAX_LOADED_LOGS most recently used logs stay in memory, at most MAX_LOADED_EVENTS events
+    besides the requested one, so that the miners of a log in one worker do not parse it again.
+    If `cache_path` is given, the parsed log is pickled there under the key of
+    `get_log_cache_key`, so reruns skip XML parsing entirely. A changed file gets a
+    new key, stale entries are simply never read again.
+
+    :param str log_path: Path to the .xes or .xes.gz file, or to a member of an archive.
+    :param str cache_path: Directory of the binary cache. Disabled if None.
+    :return: ColumnarLog
+    """
+    key = get_log_cache_key(log_path)
+    if key in _loaded_logs:
+        _loaded_logs.move_to_end(key)
+        return _loaded_logs[key][0]
+    log = read_event_log(log_path, cache_path, key)
+    _loaded_logs[key] = (log, {})
+    while len(_loaded_logs) > 1 and (len(_loaded_logs) > MAX_LOADED_LOGS
+                                     or sum(len(loaded.codes) for loaded, _ in _loaded_logs.values()) - len(log.codes) > MAX_LOADED_EVENTS):
+        _loaded_logs.popitem(last=False)
+    return log
+
+def get_log_state(log):
+    """
+    Returns a dict for data derived from a log loaded by `load_event_log`, e.g. its discovery
+    inputs. The dict is evicted together with the log, so it never outlives it.
+
+    :param ColumnarLog log: Log as returned by `load_event_log`.
+    :return: dict, or None if `log` is not held in memory.
+    """
+    # Compares the objects held here, which are alive, so a new log never gets the state of an old one
+    for loaded, state in _loaded_logs.values():
+        if loaded is log:
+            return state
+    return None
+
+def read_event_log(log_path, cache_path=None, key=None):
+    if cache_path is None:
+        return ColumnarLog.from_xes(log_path)
+
+    cache_file = os.path.join(cache_path, (key or get_log_cache_key(log_path)) + CACHE_SUFFIX)
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        pass
+
+    log = ColumnarLog.from_xes(log_path)
+    os.makedirs(cache_path, exist_ok=True)
+    # Writes to a temporary file first, so concurrent workers never read a partial pickle
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(log, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+    return log
@@ -0,0 +1,80 @@
+import cProfile
+import json
+import os
+import resource
+import time
+
+from contextlib import contextmanager
+
+class PhaseTimer:
+    """
+    Collects the wall-clock duration of the named phases of one benchmark task,
+    e.g. import, discovery, conversion, fitness, precision and size.
+    """
+    def __init__(self):
+        self.durations = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0) + time.perf_counter() - start
+
+def reset_peak_rss():
+    """
+    Resets the peak RSS of this process, so that `get_peak_rss_mb` measures a single task in a
+    long-lived worker. Needs Linux 4.0 or newer; otherwise the peak covers the worker's lifetime.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def get_peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MB.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])/1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+@contextmanager
+def profile_task(profile_path, threshold=None):
+    """
+    Runs the enclosed code under cProfile and keeps the profile only if it took longer than
+    `threshold` seconds. Does nothing if `threshold` is None.
+
+    :param str profile_path: Path of the .prof file, readable with pstats or snakeviz.
+    :param float threshold: Minimum duration in seconds for a profile to be saved.
+    """
+    if threshold is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        if time.perf_counter() - start > threshold:
+            os.makedirs(os.path.split(profile_path)[0], exist_ok=True)
+            profile.dump_stats(profile_path)
+            print(f"INFO: Saved profile of a task slower than {threshold} sec. to {profile_path}")
+
+def dump_trace(record, trace_path):
+    """
+    Appends one task record as a json line to the structured trace file.
+    """
+    os.makedirs(os.path.split(trace_path)[0] or ".", exist_ok=True)
+    with open(trace_path, 'a') as f:
+        f.write(json.dumps(record, default=str) + "\n")
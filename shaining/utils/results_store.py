@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import pandas as pd
+import sqlite3
+
+"""
+Run using:
+python shaining/utils/results_store.py path_to_results.db [more_results.db ...] output.csv|output.parquet
+
+"""
+
+class ResultsStore:
+    """
+    SQLite table with one row per (log, miner) benchmark result.
+
+    Each result is committed on its own, so a crash never loses or corrupts finished results, and
+    WAL mode lets readers and several writers share the database. Aggregating all results into a
+    table is a single query instead of reading one file per log.
+
+    :param str db_path: Path to the SQLite database. Created if missing.
+    :param str journal_mode: SQLite journal mode. WAL only works for processes on one host.
+    """
+    def __init__(self, db_path, journal_mode="WAL"):
+        self.db_path = db_path
+        os.makedirs(os.path.split(db_path)[0] or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                                log TEXT NOT NULL,
+                                miner TEXT NOT NULL,
+                                key TEXT,
+                                results TEXT NOT NULL,
+                                PRIMARY KEY (log, miner))""")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, log, miner, key, results):
+        """
+        Inserts or replaces the result columns of one (log, miner) task.
+        """
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO results (log, miner, key, results) VALUES (?, ?, ?, ?)",
+                              (log, miner, key, json.dumps(results, default=int)))
+
+    def get_all(self):
+        """
+        Returns a dict mapping (log, miner) to a tuple of task key and result columns.
+        """
+        rows = self.conn.execute("SELECT log, miner, key, results FROM results")
+        return {(log, miner): (key, json.loads(results)) for log, miner, key, results in rows}
+
+    def to_frame(self, miners=None, logs=None):
+        """
+        Joins the stored results into one row per log.
+
+        :param list miners: Miners to include, in column order. All miners if None.
+        :param list logs: Logs to include. All logs if None.
+        :return: DataFrame with a 'log' column followed by the result columns of every miner.
+        """
+        return results_to_frame(self.get_all(), miners, logs)
+
+    def export(self, output_path, miners=None, logs=None):
+        """
+        Writes all results to .csv or .parquet, depending on the extension of `output_path`.
+        """
+        return export_results([self.db_path], output_path, miners, logs)
+
+def results_to_frame(results, miners=None, logs=None):
+    """
+    Joins (log, miner) results, as returned by `ResultsStore.get_all`, into one row per log.
+    """
+    rows = {}
+    # Looked up once per stored result
+    log_set = set(logs) if logs is not None else None
+    for (log, miner), (_, task_results) in results.items():
+        if log_set is not None and log not in log_set:
+            continue
+        rows.setdefault(log, {'log': log})[miner] = task_results
+    miners = miners if miners is not None else sorted({miner for row in rows.values() for miner in row if miner != 'log'})
+
+    records = []
+    for log in (logs if logs is not None else sorted(rows)):
+        if log not in rows:
+            continue
+        record = {'log': log}
+        for miner in miners:
+            record.update(rows[log].get(miner, {}))
+        records.append(record)
+    return pd.DataFrame.from_records(records)
+
+def export_results(db_paths, output_path, miners=None, logs=None):
+    """
+    Joins the results of several stores, e.g. of benchmark runs with one miner each, into one row
+    per log and writes them to .csv or .parquet, depending on the extension of `output_path`.
+    Results are read once per store. Of a (log, miner) result in several stores, the one of the
+    last store is used.
+
+    :param list db_paths: Paths of the results databases.
+    :return: The exported DataFrame.
+    """
+    results = {}
+    for db_path in db_paths:
+        if not os.path.isfile(db_path):
+            raise FileNotFoundError(f"No results store at {db_path}")
+        with ResultsStore(db_path) as store:
+            results.update(store.get_all())
+    df = results_to_frame(results, miners, logs)
+    os.makedirs(os.path.split(output_path)[0] or ".", exist_ok=True)
+    if output_path.endswith(".parquet"):
+        df.to_parquet(output_path, index=False)
+    else:
+        df.to_csv(output_path, index=False)
+    print(f"SUCCESS: Exported {df.shape} results from {len(db_paths)} stores to {output_path}")
+    return df
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export one or several benchmark results databases to a CSV or Parquet file.')
+    parser.add_argument('db_paths', type=str, nargs='+', help='The results databases written by BenchmarkTest, e.g. of one run per miner')
+    parser.add_argument('output_path', type=str, help='The output .csv or .parquet file path')
+    args = parser.parse_args()
+
+    export_results(args.db_paths, args.output_path)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Seconds from starting `python main.py -a <config>` until a step begins. Steps without a target
+# here must start within DEFAULT_STARTUP_TARGET.
+STARTUP_TARGETS = {'benchmark_test': 2.5}
+DEFAULT_STARTUP_TARGET = 1.0
+# Every step prints a line like this when it begins, e.g. "===== BenchmarkTest ====="
+STEP_BANNER = "====="
+
+def time_startup(model_params_list, runs=5):
+    """
+    Median wall-clock seconds of `python main.py -a <config>` with `model_params_list`, in a fresh
+    interpreter, until its first step prints its banner or until main.py exits if no step prints one,
+    e.g. for an empty configuration. The process is killed once the step began.
+    """
+    fd, config_path = tempfile.mkstemp(suffix=".json", prefix="startup_")
+    with os.fdopen(fd, "w") as f:
+        json.dump(model_params_list, f)
+    durations = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            # Unbuffered, so that the banner arrives when it is printed. The artifact cache would skip steps.
+            process = subprocess.Popen([sys.executable, "-u", "main.py", "-a", config_path, "--no-cache", "-j", "1"],
+                                       cwd=ROOT_PATH, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                       text=True, start_new_session=True)
+            for line in process.stdout:
+                if line.startswith(STEP_BANNER) and "~" not in line:
+                    break
+            durations.append(time.perf_counter() - start)
+            if process.poll() is None:
+                # Also stops the workers a step may have started
+                os.killpg(process.pid, signal.SIGKILL)
+            process.stdout.close()
+            process.wait()
+    finally:
+        os.remove(config_path)
+    return statistics.median(durations)
+
+def check_startup(config_path, runs=5, target=None):
+    """
+    Measures the startup of main.py without steps and of every step in `config_path`, run on its
+    own, against its target.
+
+    :param float target: Seconds for all steps, instead of STARTUP_TARGETS.
+    :return: dict mapping 'main.py' and every step to (seconds, target seconds).
+    """
+    with open(config_path) as f:
+        model_params_list = json.load(f)
+    results = {'main.py': (time_startup([], runs), target or DEFAULT_STARTUP_TARGET)}
+    steps = {}
+    for params in model_params_list:
+        steps.setdefault(params.get('pipeline_step'), params)
+    for step, params in steps.items():
+        results[step] = (time_startup([params], runs), target or STARTUP_TARGETS.get(step, DEFAULT_STARTUP_TARGET))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the startup time of `python main.py -a <config>` per pipeline step.")
+    parser.add_argument("config", help="Configuration as passed to main.py -a")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per step, the median is reported")
+    parser.add_argument("--target", type=float, help="Target in seconds for every step")
+    args = parser.parse_args()
+
+    failed = []
+    for name, (seconds, target) in check_startup(args.config, args.runs, args.target).items():
+        print(f"INFO: {name} starts after {seconds:.2f} sec, target {target:.2f} sec.")
+        if seconds > target:
+            failed.append(name)
+    if failed:
+        print(f"FAILED: {failed} start slower than their target.")
+        sys.exit(1)
+    print("SUCCESS: All steps start within their target.")
@@ -0,0 +1,83 @@
+import gzip
+import numpy as np
+
+from datetime import datetime, timedelta
+from xml.sax.saxutils import quoteattr
+
+RANDOM_SEED = 10
+DEFAULT_NUM_ACTIVITIES = 12
+# Share of the trace counts that goes to the most frequent variants, like in real logs
+ZIPF_EXPONENT = 1.1
+XES_HEADER = """<?xml version="1.0" encoding="UTF-8" ?>
+<log xmlns="http://www.xes-standard.org/" xes.version="1849-2016" xes.features="nested-attributes">
+\t<extension name="Concept" prefix="concept" uri="http://www.xes-standard.org/concept.xesext"/>
+\t<extension name="Time" prefix="time" uri="http://www.xes-standard.org/time.xesext"/>
+"""
+
+def get_block_options(first, second, kind):
+    """
+    Behaviours of one block of two activities: an exclusive choice, both in any order, or the
+    first one with an optional second one.
+    """
+    if kind == 0:
+        return [(first,), (second,)]
+    if kind == 1:
+        return [(first, second), (second, first)]
+    return [(first, second), (first,)]
+
+def generate_variants(num_variants, num_activities=DEFAULT_NUM_ACTIVITIES, rng=None):
+    """
+    Generates distinct activity sequences of one block-structured process: a sequence of blocks of
+    two activities, each a choice, concurrency or optional activity. Every variant picks one
+    behaviour per block, so that miners find a sound, structured model of moderate size, like for
+    real processes, and alignments stay tractable.
+
+    :param int num_activities: Activities of the process. Raised to 2*ceil(log2(num_variants)) if
+        the process has too few blocks for `num_variants` distinct variants.
+    :return: list of `num_variants` tuples of activity names.
+    """
+    rng = rng if rng is not None else np.random.default_rng(RANDOM_SEED)
+    num_blocks = max(num_activities//2, int(np.ceil(np.log2(max(num_variants, 2)))))
+    blocks = [get_block_options(f"activity_{2*i}", f"activity_{2*i+1}", i % 3) for i in range(num_blocks)]
+    choices = {}
+    while len(choices) < num_variants:
+        choices[tuple(rng.integers(0, 2, num_blocks).tolist())] = None
+    return [sum((blocks[i][choice] for i, choice in enumerate(variant)), ()) for variant in choices]
+
+def get_trace_counts(num_traces, num_variants, rng=None):
+    """
+    Splits `num_traces` over the variants by a Zipf distribution, with at least one trace each.
+    """
+    rng = rng if rng is not None else np.random.default_rng(RANDOM_SEED)
+    weights = 1/np.arange(1, num_variants+1)**ZIPF_EXPONENT
+    counts = np.ones(num_variants, dtype=int)
+    counts += rng.multinomial(max(num_traces-num_variants, 0), weights/weights.sum())
+    return counts
+
+def write_synthetic_xes(log_path, num_traces, num_variants, num_activities=DEFAULT_NUM_ACTIVITIES, seed=RANDOM_SEED):
+    """
+    Writes an event-log of `num_traces` traces over `num_variants` variants to .xes or .xes.gz,
+    with a case id, activity and timestamp per event. The same arguments always give the same log.
+
+    :return: Tuple of the number of traces, variants and events written.
+    """
+    rng = np.random.default_rng(seed)
+    variants = generate_variants(num_variants, num_activities, rng)
+    counts = get_trace_counts(num_traces, len(variants), rng)
+    trace_variants = rng.permutation(np.repeat(np.arange(len(variants)), counts))
+    start = datetime(2020, 1, 1)
+    num_events = 0
+    with (gzip.open(log_path, "wt", encoding="utf-8") if log_path.endswith(".gz") else open(log_path, "w", encoding="utf-8")) as f:
+        f.write(XES_HEADER)
+        for case_id, variant in enumerate(trace_variants):
+            lines = [f'\t<trace>\n\t\t<string key="concept:name" value="{case_id}"/>\n']
+            timestamp = start + timedelta(minutes=case_id)
+            for activity in variants[variant]:
+                lines.append(f'\t\t<event>\n\t\t\t<string key="concept:name" value={quoteattr(activity)}/>\n'
+                             f'\t\t\t<date key="time:timestamp" value="{timestamp.isoformat()}"/>\n\t\t</event>\n')
+                timestamp += timedelta(minutes=1)
+            lines.append('\t</trace>\n')
+            f.write("".join(lines))
+            num_events += len(variants[variant])
+        f.write("</log>\n")
+    return len(trace_variants), len(variants), num_events
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from array import array
+from shaining.utils.log_archive import open_log
+from xml.etree.ElementTree import iterparse
+
+DEFAULT_ACTIVITY_KEY = "concept:name"
+DEFAULT_TIMESTAMP_KEY = "time:timestamp"
+DEFAULT_CASE_KEY = "concept:name"
+# Timestamps are parsed in batches of this many events, so raw strings never pile up
+TIMESTAMP_BATCH = 100000
+NAT = np.iinfo(np.int64).min
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def open_xes(log_path):
+    """
+    Opens .xes and .xes.gz files, also inside .zip and .tar(.gz) archives, as binary streams.
+    """
+    return open_log(log_path)
+
+def parse_timestamps(values):
+    """
+    Converts XES date strings to int64 nanoseconds since epoch in UTC, NAT if missing or invalid.
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    timestamps = pd.to_datetime(values, utc=True, format='ISO8601', errors='coerce')
+    return timestamps.as_unit('ns').asi8
+
+def read_xes_columns(log_path, activity_key=DEFAULT_ACTIVITY_KEY, timestamp_key=DEFAULT_TIMESTAMP_KEY,
+                     case_key=DEFAULT_CASE_KEY, with_timestamps=True):
+    """
+    Streams an .xes or .xes.gz file into integer-encoded columns, without building pm4py objects
+    or holding the XML tree in memory.
+
+    Events without the activity attribute are skipped. Traces keep their order in the file.
+
+    :param str log_path: Path to the .xes or .xes.gz file.
+    :param str activity_key: Event attribute holding the activity.
+    :param str timestamp_key: Event attribute holding the timestamp.
+    :param str case_key: Trace attribute holding the case id.
+    :param bool with_timestamps: Also read the timestamps, otherwise they are None.
+    :return: dict with
+        codes: int32 array with the activity code of every event, trace after trace,
+        offsets: int64 array of length traces+1, the events of trace i are codes[offsets[i]:offsets[i+1]],
+        activities: list mapping codes to activity names,
+        timestamps: int64 array of nanoseconds since epoch per event, NAT if missing,
+        case_ids: list with the case id of every trace.
+    """
+    codes = array('i')
+    offsets = array('q', [0])
+    timestamps = []
+    pending_timestamps = []
+    activity_codes = {}
+    case_ids = []
+    depth = 0
+    in_event = False
+    root = None
+    trace_depth = case_id = None
+    with open_xes(log_path) as f:
+        for action, element in iterparse(f, events=("start", "end")):
+            if action == "start":
+                root = element if root is None else root
+                depth += 1
+                tag = local_name(element.tag)
+                if tag == "event":
+                    in_event, event_depth = True, depth
+                    activity = timestamp = None
+                elif tag == "trace":
+                    trace_depth, case_id = depth, None
+                continue
+            tag = local_name(element.tag)
+            if in_event and depth == event_depth + 1:
+                if element.get("key") == activity_key:
+                    activity = element.get("value")
+                elif element.get("key") == timestamp_key:
+                    timestamp = element.get("value")
+            elif in_event and tag == "event":
+                in_event = False
+                if activity is not None:
+                    codes.append(activity_codes.setdefault(activity, len(activity_codes)))
+                    if with_timestamps:
+                        pending_timestamps.append(timestamp)
+                        if len(pending_timestamps) >= TIMESTAMP_BATCH:
+                            timestamps.append(parse_timestamps(pending_timestamps))
+                            pending_timestamps = []
+                element.clear()
+            elif tag == "trace":
+                offsets.append(len(codes))
+                case_ids.append(case_id)
+                # Drops the finished trace, so memory does not grow with the file
+                root.clear()
+            elif trace_depth is not None and depth == trace_depth + 1 and element.get("key") == case_key:
+                case_id = element.get("value")
+            depth -= 1
+
+    if with_timestamps:
+        timestamps.append(parse_timestamps(pending_timestamps))
+        timestamps = np.concatenate(timestamps)
+    else:
+        timestamps = None
+    return {'codes': np.frombuffer(codes, dtype=np.int32),
+            'offsets': np.frombuffer(offsets, dtype=np.int64),
+            'activities': list(activity_codes),
+            'timestamps': timestamps,
+            'case_ids': case_ids}
+
+def read_xes_activities(log_path, activity_key=DEFAULT_ACTIVITY_KEY):
+    """
+    Streams only the activities of an .xes or .xes.gz file.
+
+    :return: Tuple of activity codes, case offsets and activity names, see `read_xes_columns`.
+    """
+    columns = read_xes_columns(log_path, activity_key, with_timestamps=False)
+    return columns['codes'], columns['offsets'], columns['activities']
@@ -0,0 +1,204 @@
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+
+"""
+Run using:
+python shaining/work_queue.py path_to_results.db
+
+"""
+
+# Roles of a distributed benchmark run
+COORDINATOR = 'coordinator'
+WORKER = 'worker'
+
+QUEUE_PENDING = 'pending'
+QUEUE_LEASED = 'leased'
+QUEUE_DONE = 'done'
+QUEUE_FAILED = 'failed'
+# Seconds a claimed task stays leased without a heartbeat
+DEFAULT_LEASE_TIME = 120
+# Seconds between checks for requeued tasks while other processes hold the remaining leases
+QUEUE_POLL_INTERVAL = 5
+# Tasks whose lease expired this often, e.g. because they crash their host, are given up
+MAX_ATTEMPTS = 3
+# WAL needs memory shared by all processes, which hosts on a network file system do not have
+QUEUE_JOURNAL_MODE = "DELETE"
+
+def get_worker_id():
+    """
+    Identifies the current process across hosts.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    """
+    SQLite table of (log, miner) benchmark tasks shared by a coordinator and any number of workers.
+
+    Workers claim pending tasks with a lease, which they renew with heartbeats while the tasks run.
+    A task whose lease expires, because its worker died or lost its host, is pending again for
+    the next claim. All changes run in immediate transactions, so two workers never claim the
+    same task.
+
+    :param str db_path: Path to the SQLite database. Created if missing.
+    :param str journal_mode: SQLite journal mode, e.g. QUEUE_JOURNAL_MODE. Unchanged if None.
+    """
+    def __init__(self, db_path, journal_mode=None):
+        self.db_path = db_path
+        os.makedirs(os.path.split(db_path)[0] or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        if journal_mode is not None:
+            self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                                log TEXT NOT NULL,
+                                miner TEXT NOT NULL,
+                                key TEXT,
+                                priority INTEGER NOT NULL,
+                                status TEXT NOT NULL,
+                                worker TEXT,
+                                lease_expires REAL,
+                                attempts INTEGER NOT NULL DEFAULT 0,
+                                PRIMARY KEY (log, miner))""")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def enqueue(self, tasks, task_keys=None):
+        """
+        Replaces the queue by `tasks`, which are claimed in the given order.
+
+        :param list tasks: List of (log_name, miner) tuples.
+        :param dict task_keys: Maps tasks to the key stored with their results.
+        """
+        task_keys = task_keys or {}
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.executemany("INSERT INTO tasks (log, miner, key, priority, status) VALUES (?, ?, ?, ?, ?)",
+                             [(log, miner, task_keys.get((log, miner)), priority, QUEUE_PENDING)
+                              for priority, (log, miner) in enumerate(tasks)])
+
+    def _requeue_expired(self, conn, now):
+        conn.execute("UPDATE tasks SET status = ?, worker = NULL WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                     (QUEUE_FAILED, QUEUE_LEASED, now, MAX_ATTEMPTS))
+        return conn.execute("UPDATE tasks SET status = ?, worker = NULL WHERE status = ? AND lease_expires < ?",
+                            (QUEUE_PENDING, QUEUE_LEASED, now)).rowcount
+
+    def requeue_expired(self):
+        """
+        Makes tasks with expired leases pending again, or failed after MAX_ATTEMPTS leases.
+
+        :return: Number of requeued tasks.
+        """
+        with self.transaction() as conn:
+            return self._requeue_expired(conn, time.time())
+
+    def claim(self, worker_id, num_tasks=1, lease_time=DEFAULT_LEASE_TIME):
+        """
+        Leases up to `num_tasks` pending tasks to `worker_id`.
+
+        :return: List of (log_name, miner, key) tuples. Empty if no task is pending.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            self._requeue_expired(conn, now)
+            rows = conn.execute("SELECT log, miner, key FROM tasks WHERE status = ? ORDER BY priority LIMIT ?",
+                                (QUEUE_PENDING, num_tasks)).fetchall()
+            conn.executemany("""UPDATE tasks SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1
+                                WHERE log = ? AND miner = ?""",
+                             [(QUEUE_LEASED, worker_id, now + lease_time, log, miner) for log, miner, _ in rows])
+        return rows
+
+    def heartbeat(self, worker_id, lease_time=DEFAULT_LEASE_TIME):
+        """
+        Renews the leases of all tasks held by `worker_id`.
+
+        :return: Number of renewed leases.
+        """
+        with self.transaction() as conn:
+            return conn.execute("UPDATE tasks SET lease_expires = ? WHERE status = ? AND worker = ?",
+                                (time.time() + lease_time, QUEUE_LEASED, worker_id)).rowcount
+
+    def complete(self, log, miner, worker_id, status=QUEUE_DONE):
+        """
+        Marks a task held by `worker_id` as finished.
+
+        :return: False if the lease was lost to another worker in the meantime.
+        """
+        with self.transaction() as conn:
+            return conn.execute("UPDATE tasks SET status = ?, worker = NULL WHERE log = ? AND miner = ? AND worker = ?",
+                                (status, log, miner, worker_id)).rowcount > 0
+
+    def get_tasks(self, status):
+        """
+        Returns a dict mapping the (log, miner) tasks with `status` to their keys.
+        """
+        rows = self.conn.execute("SELECT log, miner, key FROM tasks WHERE status = ?", (status,))
+        return {(log, miner): key for log, miner, key in rows}
+
+    def counts(self):
+        """
+        Returns a dict mapping every status to its number of tasks.
+        """
+        counts = {status: 0 for status in [QUEUE_PENDING, QUEUE_LEASED, QUEUE_DONE, QUEUE_FAILED]}
+        counts.update(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        return counts
+
+class Heartbeat:
+    """
+    Background thread renewing the leases of a worker every third of the lease time, with its
+    own connection to the queue.
+    """
+    def __init__(self, db_path, worker_id, lease_time=DEFAULT_LEASE_TIME):
+        self.db_path = db_path
+        self.worker_id = worker_id
+        self.lease_time = lease_time
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        with WorkQueue(self.db_path) as queue:
+            while not self.stopped.wait(self.lease_time/3):
+                try:
+                    queue.heartbeat(self.worker_id, self.lease_time)
+                except sqlite3.OperationalError as e:
+                    print(f"        FAILED: Heartbeat of {self.worker_id}: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stopped.set()
+        self.thread.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show the state of a distributed benchmark queue.')
+    parser.add_argument('db_path', type=str, help='The results database written by BenchmarkTest')
+    parser.add_argument('--requeue', action='store_true', help='Requeue tasks with expired leases')
+    args = parser.parse_args()
+
+    with WorkQueue(args.db_path) as queue:
+        if args.requeue:
+            print(f"INFO: Requeued {queue.requeue_expired()} tasks with expired leases.")
+        print(f"INFO: {queue.counts()}")
@@ -0,0 +1,102 @@
+import os
+import random
+
+from collections import Counter
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+from pm4py.objects.petri_net.utils.petri_utils import add_arc_from_to
+from shaining.conformance import compute_conformance, ALIGNMENTS
+from shaining.utils.alignment_cache import AlignmentCache, get_net_fingerprint, get_net_structure, FITNESS
+
+VARIANTS = Counter({("a", "b"): 3, ("a",): 1, ("b", "a"): 1})
+
+def make_sequence_net(labels, prefix="p"):
+    """
+    Petri net that fires `labels` in order, with places named after `prefix`.
+    """
+    net = PetriNet(f"{prefix}_net")
+    places = [PetriNet.Place(f"{prefix}_{i}") for i in range(len(labels)+1)]
+    for place in places:
+        net.places.add(place)
+    for i, label in enumerate(labels):
+        transition = PetriNet.Transition(f"{prefix}_t{i}", label)
+        net.transitions.add(transition)
+        add_arc_from_to(places[i], transition, net)
+        add_arc_from_to(transition, places[i+1], net)
+    return net, Marking({places[0]: 1}), Marking({places[-1]: 1})
+
+def make_parallel_net(branches, seed):
+    """
+    Petri net that runs `branches` equal silent branches in parallel between a split and a join,
+    with its nodes created in a random order.
+    """
+    net = PetriNet("parallel_net")
+    start, end = PetriNet.Place("start"), PetriNet.Place("end")
+    split, join = PetriNet.Transition("split", None), PetriNet.Transition("join", None)
+    nodes = [(f"b{i}_{j}", j) for i in range(branches) for j in range(3)]
+    random.Random(seed).shuffle(nodes)
+    created = {name: PetriNet.Place(name) if kind != 1 else PetriNet.Transition(name, None) for name, kind in nodes}
+    net.places.update([start, end] + [node for node in created.values() if isinstance(node, PetriNet.Place)])
+    net.transitions.update([split, join] + [node for node in created.values() if isinstance(node, PetriNet.Transition)])
+    add_arc_from_to(start, split, net)
+    add_arc_from_to(join, end, net)
+    for i in range(branches):
+        add_arc_from_to(split, created[f"b{i}_0"], net)
+        add_arc_from_to(created[f"b{i}_0"], created[f"b{i}_1"], net)
+        add_arc_from_to(created[f"b{i}_1"], created[f"b{i}_2"], net)
+        add_arc_from_to(created[f"b{i}_2"], join, net)
+    return net, Marking({start: 1}), Marking({end: 1})
+
+def test_structure_of_symmetric_nets_does_not_depend_on_node_identity():
+    for branches in [2, 5]:
+        structures = {get_net_structure(*make_parallel_net(branches, seed)) for seed in range(10)}
+        assert len(structures) == 1
+    assert get_net_structure(*make_parallel_net(2, 0)) != get_net_structure(*make_parallel_net(3, 0))
+
+def test_fingerprint_ignores_names_but_not_labels():
+    fingerprint = get_net_fingerprint(*make_sequence_net(["a", "b"], "x"))
+    assert get_net_fingerprint(*make_sequence_net(["a", "b"], "y")) == fingerprint
+    assert get_net_fingerprint(*make_sequence_net(["b", "a"], "x")) != fingerprint
+
+def test_second_run_reads_alignments_from_cache(tmp_path):
+    db_path = os.path.join(tmp_path, "alignments.db")
+    with AlignmentCache(db_path) as cache:
+        first = compute_conformance(None, *make_sequence_net(["a", "b"], "x"), ALIGNMENTS, None,
+                                    variant_counts=VARIANTS, cache=cache)
+        assert cache.hits == 0 and cache.misses > 0
+    # Another run on an equal net of another miner
+    with AlignmentCache(db_path) as cache:
+        second = compute_conformance(None, *make_sequence_net(["a", "b"], "y"), ALIGNMENTS, None,
+                                     variant_counts=VARIANTS, cache=cache)
+        assert cache.misses == 0 and cache.hits > 0
+    assert (second['fitness'], second['precision']) == (first['fitness'], first['precision'])
+
+def test_net_with_colliding_fingerprint_bypasses_cache(tmp_path):
+    with AlignmentCache(os.path.join(tmp_path, "alignments.db")) as cache:
+        net = make_sequence_net(["a", "b"])
+        fingerprint = cache.get_fingerprint(*net)
+        assert fingerprint is not None
+        # Simulates a different net whose Weisfeiler-Lehman hash collides with this one
+        cache.conn.execute("UPDATE nets SET structure = ? WHERE fingerprint = ?", ("{}", fingerprint))
+        assert cache.get_fingerprint(*net) is None
+        cache.put_many(fingerprint, FITNESS, {'["a"]': 0.5})
+        result = compute_conformance(None, *net, ALIGNMENTS, None, variant_counts=VARIANTS, cache=cache)
+        assert cache.hits == 0 and result['alignments'] > 0
+
+def test_evicts_least_recently_used(tmp_path):
+    with AlignmentCache(os.path.join(tmp_path, "alignments.db"), max_entries=2) as cache:
+        cache.put_many("net", FITNESS, {"old": 1})
+        cache.put_many("net", FITNESS, {"used": 2})
+        assert cache.get_many("net", FITNESS, ["used"]) == {"used": 2}
+        cache.put_many("net", FITNESS, {"new": 3})
+        assert cache.get_many("net", FITNESS, ["old", "used", "new"]) == {"used": 2, "new": 3}
+
+def test_keeps_count_of_entries(tmp_path):
+    db_path = os.path.join(tmp_path, "alignments.db")
+    with AlignmentCache(db_path, max_entries=3) as cache:
+        cache.put_many("net", FITNESS, {"a": 1, "b": 2})
+        cache.put_many("net", FITNESS, {"b": 3, "c": 4, "d": 5})
+        count = lambda: cache.conn.execute("SELECT count FROM entries").fetchone()[0]
+        assert count() == cache.conn.execute("SELECT COUNT(*) FROM alignments").fetchone()[0] == 3
+        assert cache.get_many("net", FITNESS, ["b"]) == {"b": 3}
+    with AlignmentCache(db_path, max_entries=3) as cache:
+        assert cache.conn.execute("SELECT count FROM entries").fetchone()[0] == 3
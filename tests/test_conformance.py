@@ -0,0 +1,51 @@
+import pytest
+import time
+
+from collections import Counter
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+from pm4py.objects.petri_net.utils.petri_utils import add_arc_from_to
+from shaining.conformance import compute_conformance, compute_metric, ALIGNMENTS, AUTO, TOKEN_REPLAY
+
+VARIANTS = Counter({("a", "b"): 3, ("a",): 1})
+
+def make_sequence_net(labels, sound=True):
+    """
+    Petri net that fires `labels` in order. Unless `sound`, its final marking is an unreachable place.
+    """
+    net = PetriNet("net")
+    places = [PetriNet.Place(f"p_{i}") for i in range(len(labels)+2)]
+    for place in places:
+        net.places.add(place)
+    for i, label in enumerate(labels):
+        transition = PetriNet.Transition(f"t_{i}", label)
+        net.transitions.add(transition)
+        add_arc_from_to(places[i], transition, net)
+        add_arc_from_to(transition, places[i+1], net)
+    return net, Marking({places[0]: 1}), Marking({places[len(labels) if sound else -1]: 1})
+
+def test_auto_counts_alignments_on_sound_nets():
+    result = compute_conformance(None, *make_sequence_net(["a", "b"]), AUTO, 60, variant_counts=VARIANTS)
+    assert (result['fitness_method'], result['precision_method']) == (ALIGNMENTS, ALIGNMENTS)
+    # 2 variants and 1 distinct prefix instead of 4 traces and their 3 prefixes
+    assert (result['alignments'], result['replays'], result['skipped_alignments']) == (3, 0, 4)
+
+def test_auto_counts_replays_apart_from_alignments():
+    result = compute_conformance(None, *make_sequence_net(["a", "b"], sound=False), AUTO, 60, variant_counts=VARIANTS)
+    assert (result['fitness_method'], result['precision_method']) == (TOKEN_REPLAY, TOKEN_REPLAY)
+    assert (result['alignments'], result['replays'], result['skipped_alignments']) == (0, 3, 0)
+
+def test_alignments_fail_on_nets_that_are_not_easy_sound():
+    with pytest.raises(Exception, match="easy sound"):
+        compute_conformance(None, *make_sequence_net(["a", "b"], sound=False), ALIGNMENTS, None, variant_counts=VARIANTS)
+
+def test_auto_falls_back_after_its_budget():
+    def slow_alignments():
+        time.sleep(5)
+        return 1.0, 1
+    assert compute_metric("fitness", AUTO, 0.1, slow_alignments, lambda: (0.5, 2)) == (0.5, 2, TOKEN_REPLAY)
+
+def test_auto_raises_other_errors():
+    def broken_alignments():
+        raise KeyError("bug")
+    with pytest.raises(KeyError):
+        compute_metric("fitness", AUTO, 60, broken_alignments, lambda: (0.5, 2))
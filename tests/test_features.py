@@ -0,0 +1,88 @@
+import gzip
+import math
+import numpy as np
+import os
+import pm4py
+import pytest
+import zipfile
+
+from pm4py.statistics.end_activities.log import get as end_activities
+from pm4py.statistics.start_activities.log import get as start_activities
+from shaining.features import compute_features, EventLogFeatures, LogArrays, FEATURES
+from shaining.utils.log_archive import materialize_log
+from shaining.utils.log_cache import load_event_log
+from utils.param_keys import INPUT_PATH, OUTPUT_PATH
+
+TRACES = [["a", "b", "c"], ["a", "b", "c"], ["a", "c"], ["b", "b"]]
+# Computed by hand from the definitions: 3 variants of 4 traces with lengths 3, 3, 2, 2, activity
+# counts a: 3, b: 4, c: 3, start counts a: 3, b: 1, end counts c: 3, b: 1 and variant
+# probabilities 1/2, 1/4, 1/4. The prefix automaton of abc, ac, bb has the partitions
+# {a, ab, abc}, {ac} and {b, bb} of its 6 states.
+REFERENCE = {
+    'ratio_variants_per_number_of_traces': 0.75,
+    'trace_len_coefficient_variation': 0.2,
+    'mean_variant_occurrence': 4/3,
+    'activities_std': math.sqrt(2/9),
+    'start_activities_median': 2.0,
+    'end_activities_variance': 1.0,
+    'eventropy_trace': 1.5,
+    'epa_normalized_variant_entropy': (6*math.log(6) - 3*math.log(3) - 2*math.log(2))/(6*math.log(6)),
+    }
+
+def get_xes(traces):
+    events = lambda trace: "".join(f'<event><string key="concept:name" value="{activity}"/></event>' for activity in trace)
+    return ('<?xml version="1.0" encoding="UTF-8"?><log xes.version="1.0">'
+            + "".join(f'<trace><string key="concept:name" value="{i}"/>{events(trace)}</trace>' for i, trace in enumerate(traces))
+            + '</log>')
+
+def read_features(path):
+    with open(path) as f:
+        lines = f.read().splitlines()
+    return [dict(zip(lines[0].split(","), line.split(","))) for line in lines[1:]]
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = os.path.join(tmp_path, "log_1.xes")
+    with open(path, "w") as f:
+        f.write(get_xes(TRACES))
+    return path
+
+def test_features_match_reference_values(log_path):
+    assert set(REFERENCE) == set(FEATURES)
+    features = compute_features(LogArrays.from_columnar(load_event_log(log_path)))
+    assert features == pytest.approx(REFERENCE)
+
+def test_count_features_match_pm4py():
+    log_path = os.path.join("data", "gen_triangle.zip", "gen_triangle", "genEL1_10_047_nan.xes")
+    with materialize_log(log_path) as path:
+        event_log = pm4py.read_xes(path, return_legacy_log_object=True)
+    variant_counts = np.array([len(traces) for traces in pm4py.get_variants(event_log).values()])
+    lengths = np.array([len(trace) for trace in event_log])
+    activity_counts = np.array(list(pm4py.get_event_attribute_values(event_log, "concept:name").values()))
+    probabilities = variant_counts/variant_counts.sum()
+    features = compute_features(LogArrays.from_columnar(load_event_log(log_path)))
+    assert features == pytest.approx({
+        'ratio_variants_per_number_of_traces': len(variant_counts)/len(event_log),
+        'trace_len_coefficient_variation': np.std(lengths)/np.mean(lengths),
+        'mean_variant_occurrence': np.mean(variant_counts),
+        'activities_std': np.std(activity_counts),
+        'start_activities_median': np.median(list(start_activities.get_start_activities(event_log).values())),
+        'end_activities_variance': np.var(list(end_activities.get_end_activities(event_log).values())),
+        'eventropy_trace': -np.sum(probabilities*np.log2(probabilities)),
+        'epa_normalized_variant_entropy': features['epa_normalized_variant_entropy'],
+        })
+
+def test_reads_compressed_logs_and_archives(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    with gzip.open(os.path.join("data", "log_1.xes.gz"), "wt") as f:
+        f.write(get_xes(TRACES))
+    with zipfile.ZipFile(os.path.join("data", "logs.zip"), "w") as archive:
+        archive.writestr("logs/log_2.xes", get_xes(TRACES))
+
+    for input_path, log_name, csv_name in [(os.path.join("data", "log_1.xes.gz"), "log_1", "log_1_feat.csv"),
+                                           (os.path.join("data", "logs.zip"), "log_2", "logs_feat.csv")]:
+        EventLogFeatures(ft_params={INPUT_PATH: input_path, OUTPUT_PATH: "output"})
+        rows = read_features(os.path.join("output", "features", csv_name))
+        assert [row['log'] for row in rows] == [log_name]
+        assert {feature: float(rows[0][feature]) for feature in FEATURES} == pytest.approx(REFERENCE)
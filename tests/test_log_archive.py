@@ -0,0 +1,42 @@
+import io
+import os
+import pytest
+import tarfile
+import zipfile
+
+from shaining.utils.log_archive import get_log_hash, get_log_size, list_logs, open_log
+
+LOGS = {"logs/log_1.xes": b"<log>1</log>", "logs/log_2.xes": b"<log>22</log>", "readme.txt": b"-"}
+
+def write_zip(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in LOGS.items():
+            archive.writestr(name, content)
+
+def write_tar(path, mode="w"):
+    with tarfile.open(path, mode) as archive:
+        for name, content in LOGS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+@pytest.mark.parametrize("filename, write", [("logs.zip", write_zip), ("logs.tar", write_tar)])
+def test_reads_members_of_archives(tmp_path, filename, write):
+    archive_path = os.path.join(tmp_path, filename)
+    write(archive_path)
+    assert list_logs(archive_path) == ["logs/log_1.xes", "logs/log_2.xes"]
+    log_path = os.path.join(archive_path, "logs", "log_2.xes")
+    with open_log(log_path) as f:
+        assert f.read() == b"<log>22</log>"
+    assert get_log_size(log_path) == 13
+    assert get_log_hash(log_path) != get_log_hash(os.path.join(archive_path, "logs", "log_1.xes"))
+
+@pytest.mark.parametrize("filename", ["logs.tar.gz", "logs.tgz"])
+def test_rejects_compressed_tars(tmp_path, filename):
+    archive_path = os.path.join(tmp_path, filename)
+    write_tar(archive_path, "w:gz")
+    with pytest.raises(ValueError, match="gunzip"):
+        list_logs(archive_path)
+    with pytest.raises(ValueError):
+        with open_log(os.path.join(archive_path, "logs", "log_1.xes")):
+            pass
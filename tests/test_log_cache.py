@@ -0,0 +1,46 @@
+import os
+import pytest
+
+from shaining.discovery import get_discovery_context
+from shaining.utils import log_cache
+from shaining.utils.log_cache import get_log_state, load_event_log, MAX_LOADED_LOGS
+
+def write_log(path, traces):
+    events = lambda trace: "".join(f'<event><string key="concept:name" value="{activity}"/></event>' for activity in trace)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?><log xes.version="1.0">'
+                + "".join(f'<trace><string key="concept:name" value="{i}"/>{events(trace)}</trace>' for i, trace in enumerate(traces))
+                + '</log>')
+
+@pytest.fixture
+def log_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_cache, "_loaded_logs", log_cache.OrderedDict())
+    paths = []
+    for i in range(MAX_LOADED_LOGS + 1):
+        paths.append(os.path.join(tmp_path, f"log_{i}.xes"))
+        write_log(paths[-1], [["a", "b"], ["a", "c"]][:i % 2 + 1])
+    return paths
+
+def test_loaded_log_is_parsed_once_and_shares_its_context(log_paths):
+    log = load_event_log(log_paths[0])
+    context = get_discovery_context(log)
+    assert context.variants == {("a", "b"): 1}
+    assert load_event_log(log_paths[0]) is log
+    assert get_discovery_context(log) is context
+
+def test_context_is_evicted_with_its_log(log_paths):
+    first = load_event_log(log_paths[0])
+    get_discovery_context(first).variants
+    for path in log_paths[1:]:
+        get_discovery_context(load_event_log(path))
+    assert get_log_state(first) is None
+    assert len(log_cache._loaded_logs) == MAX_LOADED_LOGS
+    # A reloaded log gets a new context instead of the one of the evicted log
+    reloaded = load_event_log(log_paths[0])
+    assert reloaded is not first
+    assert 'discovery_context' not in get_log_state(reloaded)
+
+def test_logs_not_loaded_from_disk_get_a_new_context(log_paths):
+    log = log_cache.read_event_log(log_paths[1])
+    assert get_log_state(log) is None
+    assert get_discovery_context(log) is not get_discovery_context(log)
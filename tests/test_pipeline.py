@@ -0,0 +1,101 @@
+import os
+import pytest
+
+from shaining.pipeline import get_dependencies, run_pipeline, STEP_INPUTS, STEP_OUTPUTS
+from shaining.work_queue import WORKER
+from utils.param_keys import INPUT_PATH, OUTPUT_PATH, PIPELINE_STEP
+from utils.param_keys.benchmark import MINERS, WORK_QUEUE
+from utils.param_keys.shain import METRICS_PATH, FEATURES_PATH
+
+BENCHMARK = {PIPELINE_STEP: 'benchmark_test', INPUT_PATH: os.path.join("data", "pipe"), OUTPUT_PATH: "output",
+             MINERS: ["inductive"]}
+FEATURES = {PIPELINE_STEP: 'feature_extraction', INPUT_PATH: os.path.join("data", "pipe"), OUTPUT_PATH: "output"}
+SHAPLEY = {PIPELINE_STEP: 'shaining_task', METRICS_PATH: os.path.join("output", "benchmark", "pipe_benchmark.csv"),
+           FEATURES_PATH: os.path.join("output", "features", "pipe_feat.csv"), OUTPUT_PATH: "output"}
+PLOTTER = {PIPELINE_STEP: 'evaluation_plotter'}
+
+calls = []
+
+def fake_step(params):
+    """
+    Writes every output of a step with the content of its inputs, so that changes propagate.
+    """
+    step = params[PIPELINE_STEP]
+    calls.append(step)
+    content = step
+    for key in STEP_INPUTS[step]:
+        path = params[key]
+        for file_path in [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]:
+            content += read(file_path)
+    for path in STEP_OUTPUTS[step](params):
+        if not path.endswith(".csv"):
+            write(os.path.join(path, "results.db"), step)
+            path = os.path.join(path, "log_1.json")
+        write(path, content)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "pipe"))
+    write(os.path.join("data", "pipe", "log_1.xes"), "<log/>")
+    calls.clear()
+    return tmp_path
+
+def write(path, content):
+    os.makedirs(os.path.split(path)[0] or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+def run(steps):
+    calls.clear()
+    run_pipeline(steps, fake_step, jobs=1, artifact_path=os.path.join("output", "artifacts"))
+    return list(calls)
+
+def test_steps_depend_on_the_steps_writing_their_inputs():
+    features_again = dict(FEATURES)
+    assert get_dependencies([BENCHMARK, FEATURES, SHAPLEY, PLOTTER, features_again]) ==\
+        [set(), set(), {0, 1}, {0, 1, 2}, {1, 2, 3}]
+
+def test_queue_workers_depend_on_all_earlier_steps():
+    worker = dict(BENCHMARK, **{WORK_QUEUE: WORKER})
+    assert get_dependencies([FEATURES, worker, SHAPLEY]) == [set(), {0}, {0, 1}]
+
+def test_unchanged_steps_restore_all_outputs(workdir):
+    steps = [BENCHMARK, FEATURES, SHAPLEY]
+    assert run(steps) == ['benchmark_test', 'feature_extraction', 'shaining_task']
+    shapley = read(os.path.join("output", "shaining", "pipe_shap.csv"))
+    os.remove(os.path.join("output", "shaining", "pipe_shap.csv"))
+    os.remove(os.path.join("output", "benchmark", "pipe", "log_1.json"))
+
+    assert run(steps) == []
+    assert read(os.path.join("output", "shaining", "pipe_shap.csv")) == shapley
+    assert read(os.path.join("output", "benchmark", "pipe", "log_1.json")) == "benchmark_test<log/>"
+
+def test_changed_input_reruns_dependent_steps(workdir):
+    steps = [BENCHMARK, FEATURES, SHAPLEY]
+    run(steps)
+    write(os.path.join("data", "pipe", "log_1.xes"), "<log><trace/></log>")
+    assert run(steps) == ['benchmark_test', 'feature_extraction', 'shaining_task']
+    assert "<trace/>" in read(os.path.join("output", "shaining", "pipe_shap.csv"))
+
+def test_changed_params_rerun_their_step(workdir):
+    run([BENCHMARK, FEATURES])
+    assert run([dict(BENCHMARK, **{MINERS: ["ilp"]}), FEATURES]) == ['benchmark_test']
+
+def test_changed_code_reruns_all_steps(workdir):
+    run([BENCHMARK, FEATURES])
+    write(os.path.join("shaining", "benchmark.py"), "CHANGED = True\n")
+    assert run([BENCHMARK, FEATURES]) == ['benchmark_test', 'feature_extraction']
+
+def test_results_store_is_not_cached(workdir):
+    steps = [BENCHMARK, FEATURES]
+    run(steps)
+    os.remove(os.path.join("output", "benchmark", "pipe", "results.db"))
+    os.remove(os.path.join("output", "benchmark", "pipe", "log_1.json"))
+    assert run(steps) == []
+    assert os.path.exists(os.path.join("output", "benchmark", "pipe", "log_1.json"))
+    assert not os.path.exists(os.path.join("output", "benchmark", "pipe", "results.db"))
@@ -0,0 +1,36 @@
+import os
+import pandas as pd
+import pytest
+
+from shaining.utils.results_store import ResultsStore, export_results
+
+def make_store(path, miner, logs):
+    with ResultsStore(path) as store:
+        for i, log in enumerate(logs):
+            store.put(log, miner, None, {f"fitness_{miner}": i/10, f"status_{miner}": "ok"})
+
+def test_to_frame_joins_miners_per_log(tmp_path):
+    db_path = os.path.join(tmp_path, "results.db")
+    make_store(db_path, "ilp", ["log_1", "log_2"])
+    make_store(db_path, "heuristics", ["log_2"])
+    with ResultsStore(db_path) as store:
+        df = store.to_frame(["heuristics", "ilp"], ["log_2", "log_1", "log_3"])
+    assert list(df['log']) == ["log_2", "log_1"]
+    assert list(df.columns) == ['log', 'fitness_heuristics', 'status_heuristics', 'fitness_ilp', 'status_ilp']
+    assert df['fitness_heuristics'].isna().tolist() == [False, True]
+
+def test_export_joins_stores_of_per_miner_runs(tmp_path):
+    heu_path, ilp_path = os.path.join(tmp_path, "bpics_heu", "results.db"), os.path.join(tmp_path, "bpics_ilp", "results.db")
+    make_store(heu_path, "heuristics", ["log_1", "log_2"])
+    make_store(ilp_path, "ilp", ["log_2", "log_3"])
+    output_path = os.path.join(tmp_path, "bpics.csv")
+    export_results([heu_path, ilp_path], output_path)
+
+    df = pd.read_csv(output_path)
+    assert list(df['log']) == ["log_1", "log_2", "log_3"]
+    assert df.set_index('log').loc["log_2", ["fitness_heuristics", "fitness_ilp"]].tolist() == [0.1, 0.0]
+
+def test_export_fails_on_missing_store(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        export_results([os.path.join(tmp_path, "missing.db")], os.path.join(tmp_path, "out.csv"))
+    assert not os.path.exists(os.path.join(tmp_path, "missing.db"))
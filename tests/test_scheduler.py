@@ -0,0 +1,20 @@
+from shaining.scheduler import MemoryEstimator, DEFAULT_MEMORY_RATIO
+
+def test_first_task_of_a_log_is_estimated_by_file_size():
+    estimator = MemoryEstimator({"log_1": 10*2**20})
+    assert estimator.estimate(("log_1", "ilp"), 100) == 100 + 10*DEFAULT_MEMORY_RATIO
+
+def test_reported_events_estimate_later_tasks_of_the_log():
+    estimator = MemoryEstimator({"log_1": 10*2**20, "log_2": 10*2**20})
+    # 400 MB over the worker's RSS for one million events
+    estimator.observe(("log_1", "ilp"), 100, 500, num_events=10**6)
+    assert estimator.log_events == {"log_1": 10**6}
+    assert estimator.estimate(("log_1", "ilp"), 100) == 500
+    # Another log of the same size is estimated by the ratio learned per MB of file
+    assert estimator.estimate(("log_2", "ilp"), 100) == 500
+    estimator.observe(("log_2", "ilp"), 100, 200, num_events=2*10**6)
+    assert estimator.estimate(("log_2", "ilp"), 100) == 100 + 400*2
+
+def test_past_peaks_are_a_lower_bound():
+    estimator = MemoryEstimator({"log_1": 2**20}, {("log_1", "ilp"): 1000})
+    assert estimator.estimate(("log_1", "ilp"), 100) == 1000
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from shaining.shapley import CoalitionIndex, ShapleyTask
+from utils.param_keys.shain import METRICS_PATH, SHAPLEY_METHOD
+
+# Two logs with all 3 features set. Of the coalitions of 1_2_3, nan_2_nan and 1_2_nan are
+# missing, of 4_5_6 every coalition but the full one is.
+LOGS = ["genEL1_1_2_3", "genEL2_1_nan_nan", "genEL3_nan_nan_3", "genEL4_1_nan_3", "genEL5_nan_2_3", "genEL6_4_5_6"]
+BENCHMARK = pd.DataFrame({'log': LOGS, 'fitness_inductive': np.linspace(0.1, 0.6, len(LOGS))})
+
+def get_task(method):
+    task = ShapleyTask.__new__(ShapleyTask)
+    task.params = {METRICS_PATH: "benchmark.csv", SHAPLEY_METHOD: method}
+    task.feature_names = ["a", "b", "c"]
+    return task
+
+def test_missing_coalitions_are_counted_without_enumerating_them():
+    index = CoalitionIndex(LOGS, 3)
+    masks = np.tile(np.arange(1, 8), (len(index), 1))
+    assert index.count_missing().tolist() == (index.lookup(masks) == -1).sum(axis=1).tolist() == [2, 6]
+    assert [index.get_coalition_name(log, index.find_missing(log)) for log in range(len(index))] == ["nan_2_nan", "4_nan_nan"]
+
+def test_sampling_reports_missing_coalitions_before_sampling(capsys):
+    get_task('exact').compute(BENCHMARK, ['fitness_inductive'])
+    exact = capsys.readouterr().out.splitlines()
+    get_task('sampling').compute(BENCHMARK, ['fitness_inductive'])
+    sampling = capsys.readouterr().out.splitlines()
+    assert sampling[0].startswith("INFO: 8 coalitions of 2 logs are missing in benchmark.csv")
+    assert sampling[1].startswith("INFO: Sampled")
+    assert exact[0].startswith("INFO: 8 coalitions of 2 logs are missing in benchmark.csv")
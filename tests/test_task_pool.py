@@ -0,0 +1,101 @@
+import os
+import signal
+import time
+
+from shaining.task_pool import TaskPool, report_phase, report_work, STATUS_FAILED, STATUS_OK, STATUS_OOM, STATUS_TIMEOUT
+
+def run_task(task):
+    kind, value = task
+    if kind == "sleep":
+        time.sleep(value)
+    elif kind == "phase":
+        report_phase("slow")
+        time.sleep(value)
+    elif kind == "allocate":
+        # Touches every page, so that the memory counts towards the RSS
+        block = bytearray(b"\x01")*(value*2**20)
+        time.sleep(30)
+        return len(block)
+    elif kind == "memory_error":
+        raise MemoryError()
+    elif kind == "work":
+        report_work(value)
+    elif kind == "signal":
+        # Dies like a worker the kernel's OOM killer picked
+        os.kill(os.getpid(), value)
+    elif kind == "exit":
+        os._exit(value)
+    return value
+
+def run_all(pool, tasks):
+    return {task: (status, output) for task, status, output in pool.imap_unordered(tasks)}
+
+def pool_rss_mb():
+    with TaskPool(1, run_task) as pool:
+        return pool.workers[0].get_rss()
+
+def test_task_over_timeout_is_killed_and_worker_replaced():
+    with TaskPool(1, run_task, timeout=0.5, poll_interval=0.05) as pool:
+        worker = pool.workers[0]
+        results = run_all(pool, [("sleep", 30), ("done", 1)])
+        assert results[("sleep", 30)][0] == STATUS_TIMEOUT
+        assert results[("done", 1)] == (STATUS_OK, 1)
+        assert pool.workers[0] is not worker
+        assert not worker.process.is_alive()
+
+def test_phase_timeout_only_applies_to_its_phase():
+    with TaskPool(1, run_task, timeout={'slow': 0.5}, poll_interval=0.05) as pool:
+        results = run_all(pool, [("sleep", 1), ("phase", 30)])
+        assert results[("sleep", 1)] == (STATUS_OK, 1)
+        status, message = results[("phase", 30)]
+        assert status == STATUS_TIMEOUT
+        assert "phase slow" in message
+
+def test_task_over_memory_limit_is_killed_as_oom():
+    with TaskPool(1, run_task, memory_limit=pool_rss_mb() + 200, poll_interval=0.05) as pool:
+        start = time.monotonic()
+        results = run_all(pool, [("allocate", 400), ("done", 1)])
+        assert results[("allocate", 400)][0] == STATUS_OOM
+        assert results[("done", 1)] == (STATUS_OK, 1)
+        assert time.monotonic() - start < 30
+
+def test_worker_killed_by_sigkill_is_reported_as_oom():
+    with TaskPool(1, run_task, poll_interval=0.05) as pool:
+        results = run_all(pool, [("signal", signal.SIGKILL), ("done", 1)])
+        status, message = results[("signal", signal.SIGKILL)]
+        assert status == STATUS_OOM
+        assert "SIGKILL" in message
+        assert results[("done", 1)] == (STATUS_OK, 1)
+
+def test_worker_exiting_otherwise_is_reported_as_failed():
+    with TaskPool(1, run_task, poll_interval=0.05) as pool:
+        results = run_all(pool, [("signal", signal.SIGTERM), ("exit", 3), ("done", 1)])
+        assert results[("signal", signal.SIGTERM)] == (STATUS_FAILED, f"Worker exited with code {-signal.SIGTERM}")
+        assert results[("exit", 3)] == (STATUS_FAILED, "Worker exited with code 3")
+        assert results[("done", 1)] == (STATUS_OK, 1)
+
+def test_memory_error_in_task_is_reported_as_oom():
+    with TaskPool(1, run_task, poll_interval=0.05) as pool:
+        results = run_all(pool, [("memory_error", None), ("done", 1)])
+        status, message = results[("memory_error", None)]
+        assert status == STATUS_OOM
+        assert "MemoryError" in message
+        assert results[("done", 1)] == (STATUS_OK, 1)
+
+class RecordingEstimator:
+    def __init__(self):
+        self.observed = {}
+
+    def estimate(self, task, rss_before):
+        return rss_before
+
+    def observe(self, task, rss_before, peak, work):
+        self.observed[task] = (peak, work)
+
+def test_reported_work_reaches_the_memory_estimator():
+    estimator = RecordingEstimator()
+    with TaskPool(1, run_task, poll_interval=0.05, memory_budget=10**6, memory_estimator=estimator) as pool:
+        run_all(pool, [("work", 1234), ("done", 1)])
+    peak, work = estimator.observed[("work", 1234)]
+    assert work == 1234 and peak > 0
+    assert estimator.observed[("done", 1)][1] is None
@@ -0,0 +1,47 @@
+import os
+import time
+
+from shaining.work_queue import WorkQueue, MAX_ATTEMPTS, QUEUE_DONE, QUEUE_FAILED, QUEUE_LEASED, QUEUE_PENDING
+
+TASKS = [("log_1", "ilp"), ("log_1", "inductive"), ("log_2", "ilp")]
+
+def make_queue(tmp_path):
+    queue = WorkQueue(os.path.join(tmp_path, "queue.db"))
+    queue.enqueue(TASKS, {task: f"key_{i}" for i, task in enumerate(TASKS)})
+    return queue
+
+def test_claims_tasks_in_order_once(tmp_path):
+    with make_queue(tmp_path) as queue:
+        assert queue.claim("a", 2) == [("log_1", "ilp", "key_0"), ("log_1", "inductive", "key_1")]
+        assert queue.claim("b", 2) == [("log_2", "ilp", "key_2")]
+        assert queue.claim("b", 2) == []
+        assert queue.counts()[QUEUE_LEASED] == 3
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    with make_queue(tmp_path) as queue:
+        queue.claim("a", 1, lease_time=0.1)
+        queue.claim("b", 1, lease_time=60)
+        time.sleep(0.2)
+        # Worker a lost its task to worker c, b keeps its lease
+        assert queue.claim("c", 3) == [("log_1", "ilp", "key_0"), ("log_2", "ilp", "key_2")]
+        assert not queue.complete("log_1", "ilp", "a")
+        assert queue.complete("log_1", "ilp", "c")
+        assert queue.get_tasks(QUEUE_DONE) == {("log_1", "ilp"): "key_0"}
+
+def test_heartbeat_renews_lease(tmp_path):
+    with make_queue(tmp_path) as queue:
+        queue.claim("a", 1, lease_time=0.3)
+        time.sleep(0.2)
+        assert queue.heartbeat("a", lease_time=60) == 1
+        time.sleep(0.2)
+        assert queue.requeue_expired() == 0
+        assert queue.complete("log_1", "ilp", "a")
+
+def test_task_fails_after_max_attempts(tmp_path):
+    with make_queue(tmp_path) as queue:
+        for attempt in range(MAX_ATTEMPTS):
+            assert queue.claim(f"worker_{attempt}", 1, lease_time=0.05)[0][:2] == ("log_1", "ilp")
+            time.sleep(0.1)
+        assert queue.requeue_expired() == 0
+        assert queue.get_tasks(QUEUE_FAILED) == {("log_1", "ilp"): "key_0"}
+        assert queue.counts()[QUEUE_PENDING] == 2
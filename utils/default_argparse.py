@@ -1,4 +1,5 @@
 import argparse
+import os
 
 
 class ArgParser(object):
@@ -11,4 +12,20 @@ class ArgParser(object):
             dest='alg_params_json',
             help='a path to the configurations of the algorithms'
         )
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            type=int,
+            help='maximum number of independent pipeline steps that run at the same time, default 4'
+        )
+        parser.add_argument(
+            '--artifact-path',
+            default=os.path.join('output', 'artifacts'),
+            help='directory of the cache of step outputs, reused while params and inputs stay the same'
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='runs every step, without reading or writing the artifact cache'
+        )
         return parser.parse_args()
\ No newline at end of file
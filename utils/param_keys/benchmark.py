@@ -1,2 +1,16 @@
 # Benchmark params
 MINERS = 'miners'
+LOG_CACHE_PATH = 'log_cache_path'
+TIMEOUT = 'timeout'
+MEMORY_LIMIT = 'memory_limit'
+INCREMENTAL = 'incremental'
+SPLIT_MINER_SERVICE = 'split_miner_service'
+PROFILE_THRESHOLD = 'profile_threshold'
+MEMORY_BUDGET = 'memory_budget'
+MAX_TASKS_PER_CHILD = 'max_tasks_per_child'
+WORK_QUEUE = 'work_queue'
+LEASE_TIME = 'lease_time'
+ALIGNMENT_CACHE_PATH = 'alignment_cache_path'
+ALIGNMENT_CACHE_SIZE = 'alignment_cache_size'
+CONFORMANCE = 'conformance'
+CONFORMANCE_BUDGET = 'conformance_budget'
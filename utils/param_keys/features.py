@@ -0,0 +1,3 @@
+# Feature extraction params
+FEATURE_PARAMS = 'feature_params'
+FEATURE_SET = 'feature_set'
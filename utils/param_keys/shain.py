@@ -5,3 +5,7 @@ EVENTLOG_FEATURES='eventlog_features'
 METHODS = 'methods'
 MODEL = 'model'
 AGGREGATION = 'aggregation'
+
+SHAPLEY_METHOD = 'shapley_method'
+SAMPLE_BUDGET = 'sample_budget'
+TOLERANCE = 'tolerance'